@@ -0,0 +1,134 @@
+"""
+Response cache for the ATLAS GraphQL endpoint
+
+Keys are derived from the normalized query, the variables, the operation name
+and the md5 of the ATLAS database, so deploying a new database invalidates every
+cached response at once.
+
+Responses are stored in the `SV_ATLAS_GRAPHQL_CACHE_ALIAS` cache; the default
+configuration is a local-memory cache bounded by both its number of entries and
+its size in bytes (see `BoundedLocMemCache`), that evicts the least recently
+used entries.
+"""
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from graphql import print_ast
+from graphql.utils.get_operation_ast import get_operation_ast
+
+from ..atlas_db import get_database_md5
+from .persisted import get_persisted_queries
+
+
+KEY_PREFIX = "graphql-response"
+
+
+def get_cache_key(document, variables, operation_name):
+    """
+    Returns the cache key for a query operation of a parsed `GraphQLDocument`,
+    or None if the request should not be cached (unparsed documents or
+    mutations).
+
+    The query is reprinted from its AST, so that whitespace, comments and
+    formatting do not affect the key.
+    """
+    if document is None:
+        return None
+    persisted_query = get_persisted_queries().get_for_query(document.document_string)
+    if persisted_query:
+        normalized_query = persisted_query.normalized_query
+    else:
+        normalized_query = print_ast(document.document_ast)
+    operation = get_operation_ast(document.document_ast, operation_name)
+    if operation is None or operation.operation != "query":
+        return None
+
+    payload = json.dumps(
+        [normalized_query, variables or {}, operation_name],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{KEY_PREFIX}:{get_database_md5()}:{digest}"
+
+
+class CacheStats:
+    """
+    Per-process hit / miss counters for the response cache
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.stores = 0
+            self.skipped = 0
+
+    def increment(self, attr):
+        with self.lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def as_dict(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                hit_rate=round(self.hits / lookups, 4) if lookups else None,
+                stores=self.stores,
+                skipped=self.skipped,
+            )
+
+
+stats = CacheStats()
+
+
+class BoundedLocMemCache(LocMemCache):
+    """
+    A LocMemCache that also evicts its least recently used entries once their
+    (pickled) size exceeds the MAX_SIZE option, in bytes
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self._max_size = params.get("OPTIONS", {}).get("MAX_SIZE")
+
+    def _set(self, key, value, timeout=None):
+        super()._set(key, value, timeout)
+        if not self._max_size:
+            return
+        size = sum(len(pickled) for pickled in self._cache.values())
+        # NOTE: Entries are ordered from most to least recently used
+        while size > self._max_size and len(self._cache) > 1:
+            evicted_key, pickled = self._cache.popitem()
+            del self._expire_info[evicted_key]
+            size -= len(pickled)
+
+
+class ResponseCache:
+    def __init__(self):
+        self.cache = caches[settings.SV_ATLAS_GRAPHQL_CACHE_ALIAS]
+        self.max_response_size = settings.SV_ATLAS_GRAPHQL_CACHE_MAX_RESPONSE_SIZE
+
+    def get(self, key):
+        result = self.cache.get(key)
+        stats.increment("hits" if result is not None else "misses")
+        return result
+
+    def set(self, key, result):
+        # NOTE: Very large responses are not cached, so that a single response
+        # cannot evict most of the cache
+        if len(result) > self.max_response_size:
+            stats.increment("skipped")
+            return
+        self.cache.set(key, result)
+        stats.increment("stores")
@@ -0,0 +1,240 @@
+"""
+Static cost analysis for the ATLAS GraphQL endpoint
+
+Connections return up to `RELAY_CONNECTION_MAX_LIMIT` items each, so a single
+query could otherwise fetch thousands of tokens for each of thousands of text
+parts, along with annotations nested under each token.  Before a query is
+executed, its operation is walked (with its variables applied) to estimate the
+number of fields that would be resolved:
+
+- each field costs 1 per parent object
+- the selections of list fields (e.g. the `edges` of a connection) are
+  multiplied by the `first` / `last` argument of the connection, or by
+  SV_ATLAS_GRAPHQL_MAX_LIST_SIZE if neither is given
+- connections of the text parts within a passage (PASSAGE_CONNECTIONS) are
+  also bounded by the number of text parts in their `reference`
+
+Persisted queries are held to SV_ATLAS_GRAPHQL_PERSISTED_MAX_COST instead of
+SV_ATLAS_GRAPHQL_MAX_COST.
+
+The actual cost of a query is counted in the same units, by walking the
+operation along with the data of the response.
+"""
+from django.conf import settings
+
+from graphql.error import GraphQLError
+from graphql.execution.utils import get_operation_root_type
+from graphql.execution.values import get_argument_values, get_variable_values
+from graphql.language import ast
+from graphql.type.definition import GraphQLList, get_nullable_type
+from graphql.utils.get_field_def import get_field_def
+from graphql.utils.get_operation_ast import get_operation_ast
+from graphql.utils.type_from_ast import type_from_ast
+
+from scaife_viewer.atlas.utils import get_textparts_from_passage_reference
+
+from ..bundles.passage import get_passage
+
+
+PAGINATION_ARGS = ("first", "last")
+PASSAGE_CONNECTIONS = {"passageTextParts"}
+
+
+def get_page_size(field_def, field_ast, variables):
+    """
+    Returns the number of items requested from a connection, if it is bounded
+    """
+    if not any(name in field_def.args for name in PAGINATION_ARGS):
+        return None
+    args = get_argument_values(field_def.args, field_ast.arguments, variables)
+    sizes = [args[name] for name in PAGINATION_ARGS if args.get(name) is not None]
+    return min(sizes) if sizes else None
+
+
+def get_passage_size(reference):
+    """
+    Returns the number of text parts within the passage `reference`, if it can
+    be resolved
+    """
+    if not reference:
+        return None
+    try:
+        passage = get_passage(reference)
+    except Exception:
+        # NOTE: Invalid references are reported when the query is executed
+        return None
+    if passage is None:
+        return None
+    return get_textparts_from_passage_reference(
+        passage.reference, version=passage.version
+    ).count()
+
+
+class QueryCost:
+    def __init__(self, schema, document_ast, operation, variables, persisted=False):
+        self.schema = schema
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document_ast.definitions
+            if isinstance(definition, ast.FragmentDefinition)
+        }
+        self.operation = operation
+        self.variables = variables
+        self.persisted = persisted
+        self.depth = 0
+        self.estimated = self.get_estimated_cost(
+            get_operation_root_type(schema, operation), operation.selection_set
+        )
+
+    def iter_fields(self, parent_type, selection_set, visited=frozenset()):
+        """
+        Yields the fields of `selection_set` (including those of fragments),
+        along with their parent type
+        """
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                yield parent_type, selection
+            elif isinstance(selection, ast.InlineFragment):
+                fragment_type = parent_type
+                if selection.type_condition:
+                    fragment_type = type_from_ast(self.schema, selection.type_condition)
+                yield from self.iter_fields(
+                    fragment_type or parent_type, selection.selection_set, visited
+                )
+            elif isinstance(selection, ast.FragmentSpread):
+                # NOTE: Queries are analyzed before they are validated, so
+                # fragment cycles are skipped rather than followed
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                if fragment is None or name in visited:
+                    continue
+                fragment_type = type_from_ast(self.schema, fragment.type_condition)
+                yield from self.iter_fields(
+                    fragment_type or parent_type,
+                    fragment.selection_set,
+                    visited | {name},
+                )
+
+    def iter_subselections(self, parent_type, selection_set):
+        """
+        Yields each field of `selection_set`, along with its definition and
+        type if it has a selection set of its own
+        """
+        for parent, field_ast in self.iter_fields(parent_type, selection_set):
+            field_def = None
+            # NOTE: Introspection fields are not counted beyond the field itself
+            if field_ast.selection_set and not field_ast.name.value.startswith("__"):
+                field_def = get_field_def(self.schema, parent, field_ast)
+            if field_def is None:
+                yield field_ast, None, None
+            else:
+                yield field_ast, field_def, get_nullable_type(field_def.type)
+
+    def get_connection_size(self, field_def, field_ast):
+        """
+        Returns the number of items requested from a connection, if it is
+        bounded by its arguments
+        """
+        sizes = [get_page_size(field_def, field_ast, self.variables)]
+        if field_ast.name.value in PASSAGE_CONNECTIONS:
+            args = get_argument_values(
+                field_def.args, field_ast.arguments, self.variables
+            )
+            sizes.append(get_passage_size(args.get("reference")))
+        sizes = [size for size in sizes if size is not None]
+        return min(sizes) if sizes else None
+
+    def get_estimated_cost(self, parent_type, selection_set, page_size=None, depth=1):
+        self.depth = max(self.depth, depth)
+        cost = 0
+        for field_ast, field_def, field_type in self.iter_subselections(
+            parent_type, selection_set
+        ):
+            cost += 1
+            if field_def is None:
+                continue
+            if isinstance(field_type, GraphQLList):
+                size = page_size
+                if size is None:
+                    size = get_page_size(field_def, field_ast, self.variables)
+                max_size = settings.SV_ATLAS_GRAPHQL_MAX_LIST_SIZE
+                if size is None or (max_size and size > max_size):
+                    size = max_size
+                item_type = get_nullable_type(field_type.of_type)
+                cost += size * self.get_estimated_cost(
+                    item_type, field_ast.selection_set, depth=depth + 1
+                )
+            else:
+                cost += self.get_estimated_cost(
+                    field_type,
+                    field_ast.selection_set,
+                    page_size=self.get_connection_size(field_def, field_ast),
+                    depth=depth + 1,
+                )
+        return cost
+
+    def get_actual_cost(self, data, parent_type=None, selection_set=None):
+        if parent_type is None:
+            parent_type = get_operation_root_type(self.schema, self.operation)
+            selection_set = self.operation.selection_set
+        cost = 0
+        if not data:
+            return cost
+        for field_ast, field_def, field_type in self.iter_subselections(
+            parent_type, selection_set
+        ):
+            key = (field_ast.alias or field_ast.name).value
+            if key not in data:
+                continue
+            cost += 1
+            value = data[key]
+            if field_def is None or value is None:
+                continue
+            if isinstance(field_type, GraphQLList):
+                item_type = get_nullable_type(field_type.of_type)
+                for item in value:
+                    if item is not None:
+                        cost += self.get_actual_cost(
+                            item, item_type, field_ast.selection_set
+                        )
+            else:
+                cost += self.get_actual_cost(value, field_type, field_ast.selection_set)
+        return cost
+
+    def get_error(self):
+        """
+        Returns the reason the query should be rejected, if any
+        """
+        max_depth = settings.SV_ATLAS_GRAPHQL_MAX_DEPTH
+        if max_depth and self.depth > max_depth:
+            return GraphQLError(
+                f"Query depth {self.depth} exceeds the maximum depth of {max_depth}"
+            )
+        max_cost = settings.SV_ATLAS_GRAPHQL_MAX_COST
+        if self.persisted:
+            max_cost = settings.SV_ATLAS_GRAPHQL_PERSISTED_MAX_COST
+        if max_cost and self.estimated > max_cost:
+            return GraphQLError(
+                f"Query cost {self.estimated} exceeds the maximum cost of {max_cost}; "
+                "use `first` or `last` to paginate connections"
+            )
+        return None
+
+
+def get_query_cost(schema, document_ast, variables, operation_name, persisted=False):
+    """
+    Returns the QueryCost of an operation, or None if the operation cannot be
+    analyzed (in which case it will fail when executed)
+    """
+    operation = get_operation_ast(document_ast, operation_name)
+    if operation is None:
+        return None
+    try:
+        variables = get_variable_values(
+            schema, operation.variable_definitions or [], variables
+        )
+        return QueryCost(
+            schema, document_ast, operation, variables, persisted=persisted
+        )
+    except GraphQLError:
+        return None
@@ -0,0 +1,125 @@
+"""
+Per-request DataLoaders for the relationship fields that reader queries fan out
+over (e.g. the tokens of each text part, the annotations of each token or the
+alignment record of each relation)
+
+The upstream resolvers run (at least) one query per parent object; the resolvers
+installed by `install_batched_resolvers` instead collect the parents resolved
+at the same level of the query and fetch their related objects with a single
+`IN (...)` query.
+"""
+from collections import defaultdict
+
+from django.db.models import F
+
+from graphql.type.definition import get_nullable_type
+from promise import Promise
+from promise.dataloader import DataLoader
+
+
+# NOTE: Arguments handled when slicing the connection; any other argument is a
+# filter, which is applied by the upstream resolver instead
+CONNECTION_ARGS = {"first", "last", "before", "after", "offset"}
+
+BATCH_KEY = "_batch_key"
+
+
+def get_related_lookup(field):
+    """
+    Returns the lookup from the related model back to the model of `field`
+    """
+    if field.auto_created and not field.concrete:
+        # NOTE: Reverse foreign keys and many-to-many relations
+        return field.field.name
+    return field.related_query_name()
+
+
+class RelatedObjectsLoader(DataLoader):
+    """
+    Loads the objects related to each key (a primary key of `model`) via
+    `field_name`, in the order of `queryset`
+    """
+
+    def __init__(self, model, field_name, queryset):
+        super().__init__()
+        self.lookup = get_related_lookup(model._meta.get_field(field_name))
+        self.queryset = queryset
+
+    def batch_load_fn(self, keys):
+        queryset = self.queryset.filter(**{f"{self.lookup}__in": keys}).annotate(
+            **{BATCH_KEY: F(self.lookup)}
+        )
+        related = defaultdict(list)
+        for obj in queryset:
+            related[getattr(obj, BATCH_KEY)].append(obj)
+        return Promise.resolve([related[key] for key in keys])
+
+
+class ObjectLoader(DataLoader):
+    """
+    Loads the object for each key (a primary key within `queryset`)
+    """
+
+    def __init__(self, queryset):
+        super().__init__()
+        self.queryset = queryset
+
+    def batch_load_fn(self, keys):
+        objs = self.queryset.in_bulk(keys)
+        return Promise.resolve([objs.get(key) for key in keys])
+
+
+def get_loader(info, model, field_name):
+    """
+    Returns the loader for `field_name` on `model` for the current request
+    """
+    # NOTE: Loaders cache their results, so they must not outlive the request
+    loaders = info.context.__dict__.setdefault("atlas_loaders", {})
+    key = (model, field_name, info.return_type)
+    if key not in loaders:
+        field = model._meta.get_field(field_name)
+        if field.many_to_one and field.concrete:
+            queryset = field.related_model._default_manager.all()
+            loaders[key] = ObjectLoader(queryset)
+        else:
+            connection_type = get_nullable_type(info.return_type).graphene_type
+            node_type = connection_type._meta.node
+            queryset = node_type.get_queryset(
+                field.related_model._default_manager.all(), info
+            )
+            loaders[key] = RelatedObjectsLoader(model, field_name, queryset)
+    return loaders[key]
+
+
+def get_batched_resolver(field_name):
+    def resolver(root, info, **kwargs):
+        filters = {
+            name: value
+            for name, value in kwargs.items()
+            if name not in CONNECTION_ARGS and value is not None
+        }
+        if filters:
+            return getattr(root, field_name).all()
+        model = type(root)
+        field = model._meta.get_field(field_name)
+        if field.many_to_one and field.concrete:
+            # NOTE: Foreign keys are loaded by the key on `root`
+            pk = getattr(root, field.attname)
+            return pk and get_loader(info, model, field_name).load(pk)
+        return get_loader(info, model, field_name).load(root.pk)
+
+    return resolver
+
+
+def install_batched_resolvers(node_types, field_names):
+    """
+    Resolves each of `field_names` on `node_types` via a loader
+
+    Must be called before the schema is built, since resolvers are looked up
+    by graphene when the schema is created.
+    """
+    for node_type in node_types:
+        for field_name in field_names:
+            setattr(
+                node_type, f"resolve_{field_name}", get_batched_resolver(field_name)
+            )
@@ -0,0 +1,140 @@
+"""
+Persisted queries for the ATLAS GraphQL endpoint
+
+Documents are loaded from SV_ATLAS_GRAPHQL_PERSISTED_QUERIES_PATH, a JSON
+manifest emitted by the frontend build.  The manifest is either a mapping of
+SHA-256 hashes to query documents, or an Apollo persisted query manifest
+(`{"operations": [{"id": ..., "body": ...}]}`).
+
+Each document is parsed and validated once, when the registry is loaded; clients
+may then send only the hash of a document (via the Apollo `persistedQuery`
+extension) along with its variables.
+"""
+import functools
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+
+from graphene_django.settings import graphene_settings
+from graphql import parse, print_ast
+from graphql.backend.base import GraphQLDocument
+from graphql.backend.core import GraphQLCoreBackend, execute_and_validate
+from graphql.error import GraphQLError
+from graphql.validation import validate
+
+
+logger = logging.getLogger(__name__)
+
+PERSISTED_QUERY_NOT_FOUND = "PersistedQueryNotFound"
+
+
+def hash_query(query):
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+class PersistedQuery:
+    def __init__(self, schema, sha256, query):
+        self.sha256 = sha256
+        document_ast = parse(query)
+        errors = validate(schema, document_ast)
+        if errors:
+            raise ValueError(f"Persisted query {sha256} is invalid: {errors[0]}")
+        self.normalized_query = print_ast(document_ast)
+        # NOTE: The document was validated above, so it is not re-validated
+        # when it is executed
+        self.document = GraphQLDocument(
+            schema=schema,
+            document_string=query,
+            document_ast=document_ast,
+            execute=functools.partial(
+                execute_and_validate, schema, document_ast, validate=False
+            ),
+        )
+
+
+class PersistedQueryRegistry:
+    def __init__(self, schema):
+        self.schema = schema
+        self.queries = {}
+
+    def register(self, query, sha256=None):
+        digest = hash_query(query)
+        if sha256 and sha256 != digest:
+            raise ValueError(f"{sha256} is not the SHA-256 hash of its query")
+        self.queries[digest] = PersistedQuery(self.schema, digest, query)
+        return self.queries[digest]
+
+    def load(self, path):
+        try:
+            data = json.load(open(path))
+        except FileNotFoundError:
+            return
+        if "operations" in data:
+            data = {
+                operation["id"]: operation["body"] for operation in data["operations"]
+            }
+        for sha256, query in data.items():
+            # NOTE: A bad entry should not prevent the server from starting
+            try:
+                if not isinstance(query, str):
+                    raise ValueError("the query is not a string")
+                self.register(query, sha256=sha256)
+            except (GraphQLError, ValueError) as exc:
+                logger.error(f"Skipping persisted query {sha256}: {exc}")
+
+    def get(self, sha256):
+        return self.queries.get(sha256)
+
+    def get_for_query(self, query):
+        return self.queries.get(hash_query(query))
+
+
+@functools.lru_cache()
+def get_persisted_queries():
+    registry = PersistedQueryRegistry(graphene_settings.SCHEMA)
+    registry.load(settings.SV_ATLAS_GRAPHQL_PERSISTED_QUERIES_PATH)
+    return registry
+
+
+def get_persisted_query_hash(request, data):
+    """
+    Returns the hash sent via the Apollo `persistedQuery` extension, if any
+    """
+    extensions = request.GET.get("extensions") or data.get("extensions")
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            return None
+    persisted_query = (extensions or {}).get("persistedQuery") or {}
+    return persisted_query.get("sha256Hash")
+
+
+class PersistedQueryBackend(GraphQLCoreBackend):
+    """
+    Returns the pre-parsed (and pre-validated) document for persisted queries
+
+    Other documents are parsed once per backend; `CachedGraphQLView` uses a
+    backend per request, so that the cost check, the cache key and execution
+    share a single parse.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.documents = {}
+
+    def document_from_string(self, schema, document_string):
+        if not (
+            isinstance(document_string, str) and schema is graphene_settings.SCHEMA
+        ):
+            return super().document_from_string(schema, document_string)
+        persisted_query = get_persisted_queries().get_for_query(document_string)
+        if persisted_query:
+            return persisted_query.document
+        document = self.documents.get(document_string)
+        if document is None:
+            document = super().document_from_string(schema, document_string)
+            self.documents[document_string] = document
+        return document
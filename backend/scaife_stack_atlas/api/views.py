@@ -0,0 +1,149 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, JsonResponse
+
+from graphene_django.views import GraphQLView, HttpError
+
+from ..atlas_db import get_database_md5
+from .cache import ResponseCache, get_cache_key, stats
+from .cost import get_query_cost
+from .persisted import (
+    PERSISTED_QUERY_NOT_FOUND,
+    PersistedQueryBackend,
+    get_persisted_queries,
+    get_persisted_query_hash,
+)
+
+
+class CachedGraphQLView(GraphQLView):
+    """
+    Serves cached responses for GraphQL queries against the (read-only)
+    ATLAS database; see `scaife_stack_atlas.api.cache`.
+
+    Only successful, error-free query responses are cached.  The cache status
+    is returned in the `X-GraphQL-Cache` header.
+
+    Also resolves persisted queries (see `scaife_stack_atlas.api.persisted`),
+    and rejects queries whose estimated cost is over budget (see
+    `scaife_stack_atlas.api.cost`).  The estimated and actual costs are returned
+    in the `X-GraphQL-Cost-Estimated` and `X-GraphQL-Cost-Actual` headers.
+    """
+
+    cache_status = None
+    document_backend = None
+    execution_errors = None
+    query_cost = None
+    estimated_cost = None
+    actual_cost = None
+
+    def get_backend(self, request):
+        # NOTE: The view is instantiated for each request, so documents parsed
+        # by the backend are only re-used within a request
+        if self.document_backend is None:
+            self.document_backend = PersistedQueryBackend()
+        return self.document_backend
+
+    def get_graphql_params(self, request, data):
+        query, variables, operation_name, id = super().get_graphql_params(request, data)
+        sha256 = get_persisted_query_hash(request, data)
+        if sha256:
+            persisted_query = get_persisted_queries().get(sha256)
+            if persisted_query:
+                query = persisted_query.document.document_string
+            elif not query:
+                # NOTE: Apollo clients retry with the full query on this error
+                raise HttpError(HttpResponse(), PERSISTED_QUERY_NOT_FOUND)
+        return query, variables, operation_name, id
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if self.cache_status:
+            response["X-GraphQL-Cache"] = self.cache_status
+        if self.estimated_cost is not None:
+            response["X-GraphQL-Cost-Estimated"] = self.estimated_cost
+        if self.actual_cost is not None:
+            response["X-GraphQL-Cost-Actual"] = self.actual_cost
+        return response
+
+    def execute_graphql_request(self, *args, **kwargs):
+        execution_result = super().execute_graphql_request(*args, **kwargs)
+        self.execution_errors = execution_result and execution_result.errors
+        if self.query_cost and execution_result and not execution_result.invalid:
+            # NOTE: Batched operations are reported as a whole
+            actual_cost = self.query_cost.get_actual_cost(execution_result.data)
+            self.actual_cost = (self.actual_cost or 0) + actual_cost
+        return execution_result
+
+    def get_document(self, request, query):
+        """
+        Returns the parsed document for `query`, which is re-used when the
+        query is executed
+        """
+        if not query:
+            return None
+        try:
+            return self.get_backend(request).document_from_string(self.schema, query)
+        except Exception:
+            # NOTE: Invalid documents are reported when they are executed
+            return None
+
+    def get_response(self, request, data, show_graphiql=False):
+        query, variables, operation_name, _ = self.get_graphql_params(request, data)
+        document = None if show_graphiql else self.get_document(request, query)
+        self.query_cost = None
+        if document is not None:
+            # NOTE: Persisted queries are emitted by the frontend build, so they
+            # are given a larger budget (but their variables are still supplied
+            # by the client)
+            self.query_cost = get_query_cost(
+                self.schema,
+                document.document_ast,
+                variables,
+                operation_name,
+                persisted=get_persisted_queries().get_for_query(query) is not None,
+            )
+        if self.query_cost:
+            self.estimated_cost = (self.estimated_cost or 0) + self.query_cost.estimated
+            error = self.query_cost.get_error()
+            if error:
+                response = {"errors": [self.format_error(error)]}
+                if self.batch:
+                    response.update(id=data.get("id"), status=400)
+                return self.json_encode(request, response), 400
+
+        cache_key = None
+        if settings.SV_ATLAS_GRAPHQL_CACHE_ENABLED and not (
+            show_graphiql or self.batch
+        ):
+            cache_key = get_cache_key(document, variables, operation_name)
+        if cache_key is None:
+            return super().get_response(request, data, show_graphiql)
+
+        response_cache = ResponseCache()
+        result = response_cache.get(cache_key)
+        if result is not None:
+            self.cache_status = "HIT"
+            return result, 200
+
+        self.cache_status = "MISS"
+        result, status_code = super().get_response(request, data, show_graphiql)
+        if status_code == 200 and result and not self.execution_errors:
+            response_cache.set(cache_key, result)
+        return result, status_code
+
+
+def cache_stats(request):
+    if not (settings.DEBUG or request.user.is_staff):
+        raise PermissionDenied
+    cache_config = settings.CACHES[settings.SV_ATLAS_GRAPHQL_CACHE_ALIAS]
+    options = cache_config.get("OPTIONS", {})
+    return JsonResponse(
+        dict(
+            enabled=settings.SV_ATLAS_GRAPHQL_CACHE_ENABLED,
+            database_md5=get_database_md5(),
+            backend=cache_config["BACKEND"],
+            max_entries=options.get("MAX_ENTRIES"),
+            max_size=options.get("MAX_SIZE"),
+            **stats.as_dict(),
+        )
+    )
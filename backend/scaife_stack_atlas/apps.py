@@ -1,6 +1,31 @@
 from django.apps import AppConfig as BaseAppConfig
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
+from django.db.backends.signals import connection_created
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Applies the PRAGMA settings for the current SV_ATLAS_DB_PROFILE
+
+    Runs after `scaife_viewer.atlas.apps.tweak_sqlite_pragma`, so these take
+    precedence.
+    """
+    if connection.vendor != "sqlite" or connection.alias != settings.SV_ATLAS_DB_LABEL:
+        return
+    cursor = connection.cursor()
+    for pragma in settings.SV_ATLAS_DB_PRAGMAS:
+        cursor.execute(pragma)
 
 
 class AppConfig(BaseAppConfig):
 
     name = "scaife_stack_atlas"
+
+    def ready(self):
+        connection_created.connect(
+            apply_sqlite_pragmas, dispatch_uid="scaife_stack_atlas_sqlite_pragmas"
+        )
+        if settings.SV_ATLAS_DB_PROFILE == "serve":
+            # NOTE: The database is read-only, so logging in must not write to it
+            user_logged_in.disconnect(dispatch_uid="update_last_login")
@@ -0,0 +1,83 @@
+"""
+Helpers for the deployed (read-only) ATLAS database
+"""
+import functools
+import hashlib
+import logging
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def get_md5_sidecar_path(database_path):
+    return Path(f"{database_path}.md5")
+
+
+def compute_md5(path):
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_md5_sidecar(database_path, md5sha):
+    get_md5_sidecar_path(database_path).write_text(f"{md5sha}\n")
+
+
+@functools.lru_cache()
+def get_database_md5():
+    """
+    Returns the md5 of SV_ATLAS_DB_PATH, as computed by `upload_atlas_db_tarball`.
+
+    The value is read from the `db.sqlite.md5` sidecar written by
+    `optimize_atlas_db` and when a package is created or restored (and
+    rewritten by heroku.dockerfile once fixtures are loaded).  The
+    database is never hashed here, since this is called while serving requests;
+    if the sidecar is missing or older than the database, a fingerprint of the
+    database's size and mtime is returned instead.
+
+    The result is cached for the lifetime of the process, since the database
+    is only replaced on deploy.
+    """
+    database_path = Path(settings.SV_ATLAS_DB_PATH)
+    sidecar_path = get_md5_sidecar_path(database_path)
+    stat = database_path.stat()
+    try:
+        if sidecar_path.stat().st_mtime >= stat.st_mtime:
+            return sidecar_path.read_text().split()[0]
+    except (FileNotFoundError, IndexError):
+        pass
+
+    logger.warning(f"{sidecar_path} is missing or stale; using the database mtime")
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def optimize_atlas_db(reset=True):
+    """
+    Rebuilds the ATLAS database with SV_ATLAS_DB_PAGE_SIZE pages, then gathers
+    the statistics used by the query planner.
+
+    Run as the final step of the ingestion pipeline, so that the deployed file
+    is compact and its query plans do not depend on how it was built.  Also
+    writes the md5 sidecar read by `get_database_md5`.
+    """
+    size = os.path.getsize(settings.SV_ATLAS_DB_PATH)
+    with connections[settings.SV_ATLAS_DB_LABEL].cursor() as cursor:
+        cursor.execute(f"PRAGMA page_size={int(settings.SV_ATLAS_DB_PAGE_SIZE)}")
+        cursor.execute("VACUUM")
+        cursor.execute("ANALYZE")
+        cursor.execute("PRAGMA optimize")
+    print(
+        f"Optimized database: {size} -> {os.path.getsize(settings.SV_ATLAS_DB_PATH)} bytes"
+    )
+    # NOTE: Hashed here (rather than when the database is first served), since
+    # the database is not modified after this step
+    write_md5_sidecar(settings.SV_ATLAS_DB_PATH, compute_md5(settings.SV_ATLAS_DB_PATH))
@@ -0,0 +1,169 @@
+"""
+Passage bundles: everything the reader panels need for a passage in one payload
+
+A bundle is assembled from a fixed set of batched queries (text parts, tokens,
+token annotations, text annotations and alignment records), however long the
+passage is, and cached per passage for the current ATLAS database.
+"""
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from scaife_viewer.atlas.backports.scaife_viewer.cts import passage_heal
+from scaife_viewer.atlas.models import (
+    Node,
+    TextAlignment,
+    TextAlignmentRecord,
+    TextAnnotation,
+)
+from scaife_viewer.atlas.passage import PassageMetadata
+from scaife_viewer.atlas.utils import (
+    extract_version_urn_and_ref,
+    get_textparts_from_passage_reference,
+)
+
+from ..atlas_db import get_database_md5
+from ..exports.rows import get_alignment_record_rows, get_token_rows
+from ..tocs.index import Representation
+
+
+KEY_PREFIX = "passage-bundle"
+
+# NOTE: Bundles are compressed when they are built, so a faster brotli quality
+# is used than for TOC files
+BROTLI_QUALITY = 5
+
+
+class PassageBundle(Representation):
+    def __init__(self, data):
+        content = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        super().__init__(content.encode("utf-8"), brotli_quality=BROTLI_QUALITY)
+
+
+def get_passage(urn):
+    """
+    Returns the (healed) passage for `urn`, or None if its version does not exist
+    """
+    version_urn, ref = extract_version_urn_and_ref(urn)
+    if not ref or not Node.objects.filter(urn=version_urn, kind="version").exists():
+        return None
+    passage, _ = passage_heal(urn)
+    return passage
+
+
+def get_passage_metadata(passage):
+    previous_urn = next_urn = None
+    if passage.previous_objects:
+        previous_urn = PassageMetadata.generate_passage_urn(
+            passage.version, passage.previous_objects
+        )
+    if passage.next_objects:
+        next_urn = PassageMetadata.generate_passage_urn(
+            passage.version, passage.next_objects
+        )
+    return dict(
+        human_reference=passage.human_readable_reference,
+        previous_passage=previous_urn,
+        next_passage=next_urn,
+    )
+
+
+def get_text_annotation_rows(text_part_urns):
+    # NOTE: Syntax trees are linked to the text parts they annotate, which may
+    # not be the references in their data (e.g. Gorman trees reference a
+    # separate `-vgorman1-trees` version)
+    text_annotations = (
+        TextAnnotation.objects.filter(text_parts__urn__in=text_part_urns)
+        .distinct()
+        .order_by("kind", "idx")
+        .values_list("urn", "kind", "idx", "collection__urn", "data")
+    )
+    return [
+        dict(urn=urn, kind=kind, idx=idx, collection=collection_urn, data=data)
+        for urn, kind, idx, collection_urn, data in text_annotations
+    ]
+
+
+def get_alignment_rows(text_part_ids):
+    records = (
+        TextAlignmentRecord.objects.filter(
+            relations__tokens__text_part_id__in=text_part_ids
+        )
+        .distinct()
+        .order_by("alignment_id", "idx")
+        .values("pk", "urn", "idx", "metadata", "alignment_id")
+    )
+    records_by_alignment = defaultdict(list)
+    for record in records:
+        records_by_alignment[record["alignment_id"]].append(record)
+    alignments = TextAlignment.objects.filter(pk__in=records_by_alignment).order_by(
+        "pk"
+    )
+    return [
+        dict(
+            urn=alignment.urn,
+            label=alignment.label,
+            records=get_alignment_record_rows(records_by_alignment[alignment.pk]),
+        )
+        for alignment in alignments
+    ]
+
+
+def get_passage_bundle_data(passage):
+    text_parts = list(
+        get_textparts_from_passage_reference(
+            passage.reference, version=passage.version
+        ).values("pk", "urn", "ref", "text_content")
+    )
+    text_part_urns = {text_part["pk"]: text_part["urn"] for text_part in text_parts}
+
+    tokens = defaultdict(list)
+    for token in get_token_rows(text_part_urns):
+        tokens[token.pop("text_part")].append(token)
+
+    return dict(
+        urn=passage.reference,
+        version=passage.version.urn,
+        metadata=get_passage_metadata(passage),
+        text_parts=[
+            dict(
+                urn=text_part["urn"],
+                ref=text_part["ref"],
+                text_content=text_part["text_content"],
+                tokens=tokens.get(text_part["urn"], []),
+            )
+            for text_part in text_parts
+        ],
+        text_annotations=get_text_annotation_rows(list(text_part_urns.values())),
+        alignments=get_alignment_rows(list(text_part_urns)),
+    )
+
+
+def get_passage_bundle(urn):
+    """
+    Returns the PassageBundle for `urn` (None if the passage does not exist),
+    along with whether it was cached
+
+    Bundles are cached alongside GraphQL responses, when
+    SV_ATLAS_GRAPHQL_CACHE_ENABLED is set.
+    """
+    enabled = settings.SV_ATLAS_GRAPHQL_CACHE_ENABLED
+    cache = caches[settings.SV_ATLAS_GRAPHQL_CACHE_ALIAS]
+    key = f"{KEY_PREFIX}:{get_database_md5()}:{urn}"
+    bundle = cache.get(key) if enabled else None
+    if bundle is not None:
+        return bundle, True
+
+    passage = get_passage(urn)
+    if passage is None:
+        return None, False
+    bundle = PassageBundle(get_passage_bundle_data(passage))
+    # NOTE: Shares the bound on cached GraphQL responses
+    if (
+        enabled
+        and len(bundle.content) <= settings.SV_ATLAS_GRAPHQL_CACHE_MAX_RESPONSE_SIZE
+    ):
+        cache.set(key, bundle)
+    return bundle, False
@@ -0,0 +1,19 @@
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from ..tocs.views import get_validated_response
+from .passage import get_passage_bundle
+
+
+def serve_passage_bundle(request, urn):
+    bundle, cached = get_passage_bundle(urn)
+    if bundle is None:
+        raise Http404
+
+    body, encoding = bundle.get_body(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    response = HttpResponse(body, content_type="application/json")
+    if encoding:
+        response["Content-Encoding"] = encoding
+    response["X-Bundle-Cache"] = "HIT" if cached else "MISS"
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return get_validated_response(request, response, bundle.get_etag(encoding), None)
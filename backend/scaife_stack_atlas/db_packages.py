@@ -0,0 +1,352 @@
+"""
+Packaging for ATLAS database builds
+
+A package is made up of two files:
+
+- `db-<md5>.zst`: the database, split into CHUNK_SIZE chunks that are each
+  compressed as an independent zstd frame (so the file is also a valid zstd
+  stream, e.g. for `zstd -d`)
+- `db-<md5>.json`: the package manifest, recording the offset, sizes and SHA-256
+  of each chunk
+
+Chunks are compressed across threads as the database is read, and restored in
+parallel (fetching each chunk with an HTTP range request when restoring from a
+URL), verifying each chunk against the manifest.
+
+A patch (`db-<base md5>-<md5>.zst` / `.json`) rebuilds a database from a
+previous build.  Both databases are split into content-defined runs of pages
+(see `iter_page_chunks`), so that pages which were unchanged (or only moved)
+are copied from the previous build and only the remaining chunks are shipped.
+"""
+import collections
+import concurrent.futures
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+from pathlib import Path
+from urllib.parse import urljoin, urlparse
+
+from django.conf import settings
+
+import requests
+import zstandard
+
+from scaife_viewer.atlas.ingestion_pipeline import load_path_attr
+
+from .atlas_db import compute_md5, write_md5_sidecar
+
+
+CHUNK_SIZE = 8 * 1024 * 1024
+COMPRESSION_LEVEL = 10
+MANIFEST_VERSION = 1
+
+# NOTE: Patch chunks end after a page whose digest is divisible by
+# PATCH_CHUNK_PAGES (so chunks average that many pages), within these bounds
+PATCH_CHUNK_PAGES = 32
+PATCH_CHUNK_MIN_PAGES = 8
+PATCH_CHUNK_MAX_PAGES = 256
+
+# NOTE: (connect, read) timeouts in seconds for fetching manifests and chunks
+REQUEST_TIMEOUT = (10, 60)
+
+
+class PackageError(Exception):
+    pass
+
+
+def get_package_name(md5sha, base_md5sha=None):
+    if base_md5sha:
+        return f"db-{base_md5sha}-{md5sha}"
+    return f"db-{md5sha}"
+
+
+def compress_chunk(data):
+    compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL)
+    return compressor.compress(data)
+
+
+def iter_fixed_chunks(path, chunk_size):
+    with open(path, "rb") as f:
+        yield from iter(lambda: f.read(chunk_size), b"")
+
+
+def get_page_size(path):
+    with open(path, "rb") as f:
+        header = f.read(100)
+    if not header.startswith(b"SQLite format 3\x00"):
+        raise PackageError(f"{path} is not a SQLite database")
+    page_size = int.from_bytes(header[16:18], "big")
+    # NOTE: A value of 1 represents a page size of 65536
+    return 65536 if page_size == 1 else page_size
+
+
+def iter_page_chunks(path):
+    """
+    Yields content-defined chunks of the SQLite database at `path`
+
+    Chunk boundaries fall between pages and depend only on page contents, so
+    inserting or removing pages only affects the chunks around them.
+    """
+    page_size = get_page_size(path)
+    pages = []
+    with open(path, "rb") as f:
+        for page in iter(lambda: f.read(page_size), b""):
+            pages.append(page)
+            digest = hashlib.blake2b(page, digest_size=8).digest()
+            at_boundary = int.from_bytes(digest, "big") % PATCH_CHUNK_PAGES == 0
+            if (at_boundary and len(pages) >= PATCH_CHUNK_MIN_PAGES) or len(
+                pages
+            ) >= PATCH_CHUNK_MAX_PAGES:
+                yield b"".join(pages)
+                pages = []
+    if pages:
+        yield b"".join(pages)
+
+
+def iter_compressed_chunks(chunks, executor, window, md5):
+    """
+    Yields the manifest entry for each of `chunks` in order, along with its
+    compressed data (or None for entries that refer to the base database),
+    while up to `window` later chunks are compressed by `executor`
+    """
+    pending = collections.deque()
+    for chunk, data in chunks:
+        md5.update(data)
+        chunk.update(size=len(data), sha256=hashlib.sha256(data).hexdigest())
+        future = None
+        if "base_offset" not in chunk:
+            future = executor.submit(compress_chunk, data)
+        pending.append((chunk, future))
+        if len(pending) >= window:
+            chunk, future = pending.popleft()
+            yield chunk, future and future.result()
+    while pending:
+        chunk, future = pending.popleft()
+        yield chunk, future and future.result()
+
+
+def write_package(chunks, output_dir, workers=None, base_md5sha=None):
+    """
+    Compresses `chunks` (pairs of manifest entries and data) into a package
+    within `output_dir`; returns the paths of the package and manifest files,
+    along with the manifest.
+    """
+    workers = workers or os.cpu_count() or 1
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    partial_path = output_dir / "db.zst.partial"
+
+    md5 = hashlib.md5()
+    entries = []
+    offset = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        with partial_path.open("wb") as f:
+            for chunk, compressed in iter_compressed_chunks(
+                chunks, executor, workers * 2, md5
+            ):
+                if compressed is not None:
+                    f.write(compressed)
+                    chunk.update(offset=offset, compressed_size=len(compressed))
+                    offset += len(compressed)
+                entries.append(chunk)
+
+    md5sha = md5.hexdigest()
+    name = get_package_name(md5sha, base_md5sha)
+    package_path = output_dir / f"{name}.zst"
+    partial_path.rename(package_path)
+    manifest = dict(
+        version=MANIFEST_VERSION,
+        md5=md5sha,
+        size=sum(chunk["size"] for chunk in entries),
+        package=package_path.name,
+        chunks=entries,
+    )
+    if base_md5sha:
+        manifest["base_md5"] = base_md5sha
+    manifest_path = output_dir / f"{name}.json"
+    with manifest_path.open("w") as f:
+        json.dump(manifest, f, indent=2)
+    return package_path, manifest_path, manifest
+
+
+def create_package(database_path, output_dir, chunk_size=CHUNK_SIZE, workers=None):
+    """
+    Compresses `database_path` into a package within `output_dir`; returns the
+    paths of the package and manifest files, along with the manifest.
+    """
+    chunks = ((dict(), data) for data in iter_fixed_chunks(database_path, chunk_size))
+    return write_package(chunks, output_dir, workers=workers)
+
+
+def create_patch(base_path, database_path, output_dir, workers=None):
+    """
+    Creates a patch that rebuilds `database_path` from `base_path` within
+    `output_dir`; returns the paths of the patch and manifest files, along with
+    the manifest.
+    """
+    base_md5 = hashlib.md5()
+    base_chunks = {}
+    offset = 0
+    for data in iter_page_chunks(base_path):
+        base_md5.update(data)
+        base_chunks.setdefault(hashlib.sha256(data).hexdigest(), offset)
+        offset += len(data)
+
+    def get_chunks():
+        for data in iter_page_chunks(database_path):
+            base_offset = base_chunks.get(hashlib.sha256(data).hexdigest())
+            if base_offset is not None:
+                yield dict(base_offset=base_offset), data
+            else:
+                yield dict(), data
+
+    return write_package(
+        get_chunks(), output_dir, workers=workers, base_md5sha=base_md5.hexdigest()
+    )
+
+
+def is_url(location):
+    return urlparse(str(location)).scheme in {"http", "https"}
+
+
+def fetch(location, headers=None):
+    try:
+        response = requests.get(location, headers=headers, timeout=REQUEST_TIMEOUT)
+    except requests.Timeout:
+        raise PackageError(f"Timed out fetching {location}")
+    response.raise_for_status()
+    return response
+
+
+def read_manifest(location):
+    if is_url(location):
+        return fetch(location).json()
+    return json.load(open(location))
+
+
+def read_range(location, offset, size):
+    if is_url(location):
+        end = offset + size - 1
+        response = fetch(location, headers={"Range": f"bytes={offset}-{end}"})
+        if response.status_code != 206:
+            raise PackageError(f"{location} does not support range requests")
+        return response.content
+    with open(location, "rb") as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def restore_chunk(package_location, base_path, chunk, fd, position):
+    if "base_offset" in chunk:
+        data = read_range(base_path, chunk["base_offset"], chunk["size"])
+    else:
+        data = read_range(package_location, chunk["offset"], chunk["compressed_size"])
+        data = zstandard.ZstdDecompressor().decompress(
+            data, max_output_size=chunk["size"]
+        )
+    if len(data) != chunk["size"] or (
+        hashlib.sha256(data).hexdigest() != chunk["sha256"]
+    ):
+        if "base_offset" in chunk:
+            raise PackageError(
+                f"{base_path} does not match the base database of this patch"
+            )
+        raise PackageError(f"Chunk at offset {chunk['offset']} failed verification")
+    os.pwrite(fd, data, position)
+
+
+def write_chunks(manifest, package_location, base_path, path, workers):
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+    try:
+        os.ftruncate(fd, manifest["size"])
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            position = 0
+            for chunk in manifest["chunks"]:
+                futures.append(
+                    executor.submit(
+                        restore_chunk, package_location, base_path, chunk, fd, position
+                    )
+                )
+                position += chunk["size"]
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+    finally:
+        os.close(fd)
+
+
+def restore_package(manifest_location, database_path, workers=None, base_path=None):
+    """
+    Restores the package described by the manifest at `manifest_location` (a
+    URL or path) to `database_path`; returns the manifest.
+
+    Patches are applied to `base_path` (by default, the database currently at
+    `database_path`).
+    """
+    manifest = read_manifest(manifest_location)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise PackageError(f"Unsupported manifest version: {manifest.get('version')}")
+    if "base_md5" in manifest:
+        base_path = base_path or database_path
+        if not os.path.exists(base_path):
+            raise PackageError(f"Base database {base_path} was not found")
+    if is_url(manifest_location):
+        package_location = urljoin(manifest_location, manifest["package"])
+    else:
+        package_location = Path(manifest_location).parent / manifest["package"]
+
+    database_path = Path(database_path)
+    database_path.parent.mkdir(parents=True, exist_ok=True)
+    partial_path = database_path.with_name(f"{database_path.name}.partial")
+    try:
+        write_chunks(manifest, package_location, base_path, partial_path, workers)
+        # NOTE: Each chunk of a patch was verified, but the database is checked
+        # as a whole too, since it was assembled from two sources
+        if "base_md5" in manifest and compute_md5(partial_path) != manifest["md5"]:
+            raise PackageError("The patched database failed verification")
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+
+    partial_path.rename(database_path)
+    write_md5_sidecar(database_path, manifest["md5"])
+    return manifest
+
+
+class LocalStorage:
+    """
+    Copies packages to a local directory
+    """
+
+    def __init__(self, location):
+        self.location = Path(location)
+
+    def save(self, path):
+        self.location.mkdir(parents=True, exist_ok=True)
+        destination = self.location / Path(path).name
+        shutil.copyfile(path, destination)
+        return str(destination)
+
+
+class GCSStorage:
+    """
+    Uploads packages to a public Google Cloud Storage bucket via `gsutil`
+    """
+
+    def __init__(self, bucket, prefix):
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def save(self, path):
+        name = Path(path).name
+        gsutil_cmd = f"gsutil -m cp -a public-read {path} gs://{self.bucket}/{self.prefix}/{name}"
+        subprocess.check_output(shlex.split(gsutil_cmd))
+        return f"https://storage.googleapis.com/{self.bucket}/{self.prefix}/{name}"
+
+
+def get_package_storage():
+    config = settings.SV_ATLAS_DB_PACKAGE_STORAGE
+    return load_path_attr(config["BACKEND"])(**config.get("OPTIONS", {}))
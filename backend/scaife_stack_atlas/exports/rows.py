@@ -0,0 +1,170 @@
+"""
+Rows for the bulk (NDJSON) exports of ATLAS data
+
+Each export is read with keyset pagination (`iter_keyset_chunks`) rather than
+offsets, so every chunk is an indexed range scan and memory use is bounded by
+the chunk size.  The rows related to each chunk (e.g. the annotations of its
+tokens) are fetched with one query per chunk.
+"""
+from collections import defaultdict
+
+from scaife_viewer.atlas.constants import TEXT_ANNOTATION_KIND_SYNTAX_TREE
+from scaife_viewer.atlas.models import (
+    Node,
+    TextAlignmentRecord,
+    TextAlignmentRecordRelation,
+    TextAnnotation,
+    Token,
+    TokenAnnotation,
+)
+
+
+CHUNK_SIZE = 1000
+
+TOKEN_FIELDS = [
+    "ve_ref",
+    "value",
+    "word_value",
+    "subref_value",
+    "position",
+    "idx",
+    "space_after",
+]
+
+
+def iter_keyset_chunks(queryset, key="pk", chunk_size=CHUNK_SIZE):
+    """
+    Yields lists of up to `chunk_size` rows from `queryset` (a `values()`
+    queryset including `key`), ordered by `key`
+    """
+    queryset = queryset.order_by(key)
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(**{f"{key}__gt": last})
+        rows = list(chunk[:chunk_size].iterator())
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][key]
+
+
+def get_token_rows(text_part_urns, collection_urn=None):
+    """
+    Returns the tokens of the text parts in `text_part_urns` (a mapping of
+    primary keys to URNs, in reading order) along with their token annotations
+    (optionally, only those within `collection_urn`)
+    """
+    tokens = defaultdict(list)
+    token_values = (
+        Token.objects.filter(text_part_id__in=list(text_part_urns))
+        .order_by("idx")
+        .values("pk", "text_part_id", *TOKEN_FIELDS)
+    )
+    for token in token_values.iterator():
+        tokens[token.pop("text_part_id")].append(token)
+    if not tokens:
+        return []
+
+    annotations = defaultdict(list)
+    annotation_values = TokenAnnotation.objects.filter(
+        token__text_part_id__in=list(tokens)
+    )
+    if collection_urn:
+        annotation_values = annotation_values.filter(collection__urn=collection_urn)
+    annotation_values = annotation_values.order_by("pk").values_list(
+        "token_id", "collection__urn", "data"
+    )
+    for token_id, urn, data in annotation_values.iterator():
+        annotations[token_id].append(dict(collection=urn, data=data))
+
+    rows = []
+    for text_part_id, text_part_urn in text_part_urns.items():
+        for token in tokens.get(text_part_id, []):
+            token_id = token.pop("pk")
+            rows.append(
+                dict(
+                    text_part=text_part_urn,
+                    **token,
+                    annotations=annotations.get(token_id, []),
+                )
+            )
+    return rows
+
+
+def iter_version_token_rows(version, collection_urn=None):
+    """
+    Yields chunks of the tokens of `version` in reading order
+    """
+    text_parts = Node.objects.filter(
+        path__startswith=version.path, depth__gt=version.depth
+    ).values("pk", "path", "urn")
+    for text_part_chunk in iter_keyset_chunks(text_parts, key="path"):
+        text_part_urns = {
+            text_part["pk"]: text_part["urn"] for text_part in text_part_chunk
+        }
+        rows = get_token_rows(text_part_urns, collection_urn=collection_urn)
+        if rows:
+            yield rows
+
+
+def iter_syntax_tree_rows(collection):
+    """
+    Yields chunks of the syntax trees within `collection`
+    """
+    trees = TextAnnotation.objects.filter(
+        collection=collection, kind=TEXT_ANNOTATION_KIND_SYNTAX_TREE
+    ).values("pk", "urn", "idx", "data")
+    for chunk in iter_keyset_chunks(trees):
+        yield [
+            dict(urn=tree["urn"], idx=tree["idx"], data=tree["data"]) for tree in chunk
+        ]
+
+
+def get_alignment_record_rows(records):
+    """
+    Returns `records` (`values()` rows of TextAlignmentRecord) along with the
+    version and tokens of each of their relations
+    """
+    record_ids = [record["pk"] for record in records]
+    relations = {}
+    relations_by_record = defaultdict(list)
+    relation_values = (
+        TextAlignmentRecordRelation.objects.filter(record_id__in=record_ids)
+        .order_by("pk")
+        .values_list("pk", "record_id", "version__urn")
+    )
+    for relation_id, record_id, version_urn in relation_values.iterator():
+        relation = dict(version=version_urn, tokens=[])
+        relations[relation_id] = relation
+        relations_by_record[record_id].append(relation)
+
+    token_values = (
+        TextAlignmentRecordRelation.tokens.through.objects.filter(
+            textalignmentrecordrelation__record_id__in=record_ids
+        )
+        .order_by("token__idx")
+        .values_list("textalignmentrecordrelation_id", "token__ve_ref", "token__value")
+    )
+    for relation_id, ve_ref, value in token_values.iterator():
+        relations[relation_id]["tokens"].append(dict(ve_ref=ve_ref, value=value))
+
+    return [
+        dict(
+            urn=record["urn"],
+            idx=record["idx"],
+            metadata=record["metadata"],
+            relations=relations_by_record.get(record["pk"], []),
+        )
+        for record in records
+    ]
+
+
+def iter_alignment_record_rows(alignment):
+    """
+    Yields chunks of the records of `alignment`
+    """
+    records = TextAlignmentRecord.objects.filter(alignment=alignment).values(
+        "pk", "urn", "idx", "metadata"
+    )
+    for chunk in iter_keyset_chunks(records):
+        yield get_alignment_record_rows(chunk)
@@ -0,0 +1,42 @@
+import json
+
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+
+from scaife_viewer.atlas.models import Node, TextAlignment, TextAnnotationCollection
+
+from .rows import (
+    iter_alignment_record_rows,
+    iter_syntax_tree_rows,
+    iter_version_token_rows,
+)
+
+
+def iter_ndjson(chunks):
+    for rows in chunks:
+        lines = [json.dumps(row, ensure_ascii=False) for row in rows]
+        lines.append("")
+        yield "\n".join(lines).encode("utf-8")
+
+
+def get_ndjson_response(chunks):
+    return StreamingHttpResponse(
+        iter_ndjson(chunks), content_type="application/x-ndjson; charset=utf-8"
+    )
+
+
+def export_version_tokens(request, urn):
+    version = get_object_or_404(Node, urn=urn, kind="version")
+    return get_ndjson_response(
+        iter_version_token_rows(version, collection_urn=request.GET.get("collection"))
+    )
+
+
+def export_syntax_trees(request, urn):
+    collection = get_object_or_404(TextAnnotationCollection, urn=urn)
+    return get_ndjson_response(iter_syntax_tree_rows(collection))
+
+
+def export_alignment_records(request, urn):
+    alignment = get_object_or_404(TextAlignment, urn=urn)
+    return get_ndjson_response(iter_alignment_record_rows(alignment))
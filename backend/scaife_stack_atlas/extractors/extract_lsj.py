@@ -1,6 +1,8 @@
+import concurrent.futures
 import itertools
 import json
 import re
+import tempfile
 from functools import lru_cache
 from pathlib import Path
 
@@ -37,6 +39,8 @@ HYPHEN = "\u2010"
 HYPHEN_MINUS = "\u002d"
 
 DEBUG = False
+# NOTE: None uses one worker process per CPU
+CONCURRENCY = None
 XSL_STYLESHEET_PATH = Path("data/raw/lsj/lsj.xsl")
 
 
@@ -267,17 +271,18 @@ def extract_atlas_entry(entry, content, counters):
     )
 
 
-def get_lsj_paths():
+def get_lsj_paths(lsj_xml_dir=None):
     # FIXME: vendor data
-    lsj_xml_dir = Path(
-        "/Users/jwegner/Data/development/repos/PerseusDL/lexica/CTS_XML_TEI/perseus/pdllex/grc/lsj/"
-    )
-    return sorted(lsj_xml_dir.glob("*.xml"), key=lambda x: natural_keys(x.name))
+    if lsj_xml_dir is None:
+        lsj_xml_dir = Path(
+            "/Users/jwegner/Data/development/repos/PerseusDL/lexica/CTS_XML_TEI/perseus/pdllex/grc/lsj/"
+        )
+    return sorted(Path(lsj_xml_dir).glob("*.xml"), key=lambda x: natural_keys(x.name))
 
 
-def get_lsj_entry_free_elements():
+def get_lsj_paths_and_nattrs(lsj_xml_dir=None):
     if DEBUG:
-        paths_and_nattrs = [
+        return [
             (
                 # ἀείδω
                 Path("data/raw/lsj/grc.lsj.perseus-eng1.xml"),
@@ -289,19 +294,35 @@ def get_lsj_entry_free_elements():
                 "n67485",
             ),
         ]
-    else:
-        paths_and_nattrs = [(path, None) for path in get_lsj_paths()]
+    return [(path, None) for path in get_lsj_paths(lsj_xml_dir)]
 
-    for path, nattr in paths_and_nattrs:
-        with path.open("rb") as f:
-            root = etree.parse(f)
-            for element in get_entry_free_elements(root, nattr):
+
+def iter_entry_free_elements(path, nattr=None):
+    """
+    Streams entryFree elements from an LSJ volume, clearing each element
+    (and any preceding siblings) once the caller is done with it, so that
+    memory use does not grow with the size of the volume.
+    """
+    with path.open("rb") as f:
+        for _, element in etree.iterparse(f, events=("end",), tag="entryFree"):
+            if nattr is None or element.attrib.get("id") == nattr:
                 yield element
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
 
 
 class XSLTransformer:
-    def __init__(self, xml):
-        self.xml = xml
+    def __init__(self):
+        with XSL_STYLESHEET_PATH.open("rb") as f:
+            func_ns = "urn:python-funcs"
+            self.transform = etree.XSLT(
+                etree.XML(f.read()),
+                extensions={
+                    (func_ns, "beta_to_uni"): self.beta_to_uni,
+                    (func_ns, "canonical_urn_link"): self.canonical_urn_link,
+                },
+            )
 
     def beta_to_uni(self, ctx, text_selector):
         # NOTE: compare with https://stackoverflow.com/questions/16031673/get-the-non-empty-element-using-xpath
@@ -327,23 +348,21 @@ class XSLTransformer:
         return f"https://{CATALOG_API_HOST}/{urn}/canonical-url/"
 
     # TODO: Backported from scaife_viewer_core TEIRenderer
-    @lru_cache
-    def render(self):
-        with XSL_STYLESHEET_PATH.open("rb") as f:
-            func_ns = "urn:python-funcs"
-            transform = etree.XSLT(
-                etree.XML(f.read()),
-                extensions={
-                    (func_ns, "beta_to_uni"): self.beta_to_uni,
-                    (func_ns, "canonical_urn_link"): self.canonical_urn_link,
-                },
-            )
-            try:
-                return str(transform(self.xml))
-            except Exception:
-                for error in transform.error_log:
-                    print(error.message, error.line)
-                raise
+    def render(self, xml):
+        try:
+            return str(self.transform(xml))
+        except Exception:
+            for error in self.transform.error_log:
+                print(error.message, error.line)
+            raise
+
+
+@lru_cache(maxsize=None)
+def get_transformer():
+    """
+    Compiles the XSL stylesheet once per process
+    """
+    return XSLTransformer()
 
 
 def remove_spaces(match_obj):
@@ -357,9 +376,7 @@ def fix_whitespace(content):
 
 
 def extract_content(entry, debug=False):
-    # TODO: Revisit transformer instantiation
-    transformer = XSLTransformer(entry)
-    content = transformer.render().strip()
+    content = get_transformer().render(entry).strip()
     content = " ".join(content.split())
     content = fix_whitespace(content)
     if debug:
@@ -369,22 +386,78 @@ def extract_content(entry, debug=False):
     return content
 
 
-def extract_entries():
+def extract_volume(path, nattr, output_dir, debug=False):
+    """
+    Extracts the entries from a single LSJ volume to a JSONL file
+    within `output_dir`.
+
+    Entry and citation URNs are left blank, since they depend on the
+    entries in the preceding volumes; they are assigned by `renumber_entries`.
+    """
     counters = dict(
         sense=0,
         entry=0,
         citation=0,
     )
-    for pos, entry in enumerate(get_lsj_entry_free_elements()):
-        debug = DEBUG and pos == 0
-        content = extract_content(entry, debug=debug)
-        atlas_entry = extract_atlas_entry(entry, content, counters)
-        yield atlas_entry
+    output_path = Path(output_dir, f"{path.stem}.jsonl")
+    with output_path.open("w") as f:
+        writer = jsonlines.Writer(f)
+        for pos, entry in enumerate(iter_entry_free_elements(path, nattr)):
+            content = extract_content(entry, debug=debug and pos == 0)
+            atlas_entry = extract_atlas_entry(entry, content, counters)
+            atlas_entry["urn"] = None
+            for citation in atlas_entry["citations"]:
+                citation["urn"] = None
+            writer.write(atlas_entry)
+    return output_path
+
+
+def extract_volumes(output_dir, lsj_xml_dir=None):
+    paths_and_nattrs = get_lsj_paths_and_nattrs(lsj_xml_dir)
+    debug_flags = [DEBUG and pos == 0 for pos in range(len(paths_and_nattrs))]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=CONCURRENCY) as executor:
+        yield from executor.map(
+            extract_volume,
+            [path for path, _ in paths_and_nattrs],
+            [nattr for _, nattr in paths_and_nattrs],
+            itertools.repeat(output_dir),
+            debug_flags,
+        )
 
 
-def blob_entries():
+def renumber_entries(volume_paths):
+    """
+    Streams entries from each volume in order, assigning entry and citation
+    URNs from counters that span every volume.
+    """
+    counters = dict(
+        entry=0,
+        citation=0,
+    )
+    for volume_path in volume_paths:
+        with volume_path.open("rb") as f:
+            for entry in jsonlines.Reader(f):
+                counters["entry"] += 1
+                entry[
+                    "urn"
+                ] = f"urn:cite2:scafife-viewer:dictionary-entries.atlas_v1:lsj-{counters['entry']}"
+                for citation in entry["citations"]:
+                    counters["citation"] += 1
+                    citation[
+                        "urn"
+                    ] = f"urn:cite2:scaife-viewer:citations.atlas_v1:lsj-{counters['citation']}"
+                yield entry
+        volume_path.unlink()
+
+
+def extract_entries(lsj_xml_dir=None):
+    with tempfile.TemporaryDirectory() as output_dir:
+        yield from renumber_entries(extract_volumes(output_dir, lsj_xml_dir))
+
+
+def blob_entries(lsj_xml_dir=None):
     counter = 1
-    entries = extract_entries()
+    entries = extract_entries(lsj_xml_dir)
     CHUNK_SIZE = 10000
     chunk = peekable(itertools.islice(entries, CHUNK_SIZE))
     entry_paths = []
@@ -413,9 +486,9 @@ def blob_entries():
         json.dump(data, f, ensure_ascii=False, indent=2)
 
 
-def main():
+def main(lsj_xml_dir=None):
     DICTIONARY_PATH.mkdir(exist_ok=True, parents=True)
-    blob_entries()
+    blob_entries(lsj_xml_dir)
 
 
 if __name__ == "__main__":
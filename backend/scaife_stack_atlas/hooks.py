@@ -11,3 +11,8 @@ class ATLASHookSet(DefaultHookSet):
         #     csv_path = Path("killroy.csv")
         #     return get_tokens_from_csv(version_urn, csv_path)
         return super().get_prepared_tokens(version_urn)
+
+    def run_ingestion_pipeline(self, outf):
+        from .ingestion import run_ingestion_pipeline
+
+        return run_ingestion_pipeline(outf)
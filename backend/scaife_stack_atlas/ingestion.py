@@ -0,0 +1,748 @@
+"""
+Project-level runner for SV_ATLAS_INGESTION_PIPELINE
+
+Records a manifest of content hashes for the inputs read by each step, so that
+`update_atlas_db` can skip steps whose inputs are unchanged and only re-run the
+first stale step and the steps that follow it.
+
+Each step is also instrumented (wall time, SQL queries, rows written per model
+and peak RSS); see `StepMetrics`.
+
+With ATLAS_DB_PROFILE=build, SQLite is tuned for bulk loading while the
+pipeline runs; see `build_profile`.
+
+When SV_ATLAS_INGESTION_CHECKPOINT_DIR is set, the SQLite database is
+snapshotted after each step, so a failed or partial run can be resumed from any
+step; see `CheckpointStore`.
+
+Steps are run in order, from the current process, which is the only writer to
+the database.  Steps with a parse-only phase (see `PIPELINE_STEP_PREPARE`) have
+it run ahead of them in worker processes when SV_ATLAS_INGESTION_CONCURRENCY is
+greater than 1, overlapping with the steps before them; see `StepScheduler`.
+"""
+import ast
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import multiprocessing
+import re
+import resource
+import shutil
+import sqlite3
+import time
+import traceback
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from scaife_viewer.atlas.ingestion_pipeline import load_path_attr
+
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# NOTE: Patterns are relative to SV_ATLAS_DATA_DIR; steps that only read from
+# the database can be omitted, since the source of each step (see
+# `get_step_source`) is also hashed.
+PIPELINE_STEP_INPUTS = {
+    "scaife_viewer.atlas.importers.versions.import_versions": ["library/**/*"],
+    "scaife_viewer.atlas.importers.text_annotations.import_text_annotations": [
+        "annotations/text-annotations/**/*",
+        "annotations/commentaries/**/*",
+        "annotations/syntax-trees/**/*",
+    ],
+    "scaife_viewer.atlas.importers.attributions.import_attributions": [
+        "annotations/attributions/**/*"
+    ],
+    "scaife_viewer.atlas.importers.metrical_annotations.import_metrical_annotations": [
+        "annotations/metrical-annotations/**/*"
+    ],
+    "scaife_viewer.atlas.importers.image_annotations.import_image_annotations": [
+        "annotations/image-annotations/**/*"
+    ],
+    "scaife_viewer.atlas.importers.audio_annotations.import_audio_annotations": [
+        "annotations/audio-annotations/**/*"
+    ],
+    "scaife_viewer.atlas.tokenizers.tokenize_all_text_parts": ["library/**/*"],
+    "scaife_viewer.atlas.importers.token_annotations.apply_token_annotations": [
+        "annotations/token-annotations/**/*"
+    ],
+    "scaife_viewer.atlas.importers.named_entities.apply_named_entities": [
+        "annotations/named-entities/**/*"
+    ],
+    "scaife_viewer.atlas.importers.dictionaries.import_dictionaries": [
+        "annotations/dictionaries/**/*"
+    ],
+    "scaife_stack_atlas.temp.process_alignments": [
+        "annotations/text-alignments/*.json"
+    ],
+    "scaife_stack_atlas.temp.create_persian_greek_alignment": [
+        "annotations/text-alignments/iliad-greek-farsi-sentence-alignment.json"
+    ],
+    "scaife_stack_atlas.temp.import_grammatical_entries": [
+        "annotations/grammatical-entries/didakta/*"
+    ],
+    "scaife_stack_atlas.temp.ingest_balex_extras": [
+        "library/phi0428/phi001/*.xml",
+        "raw/balex/balex-styles.scss",
+    ],
+    "scaife_stack_atlas.temp.add_cgl_css": ["raw/cambridge/lexicon.css"],
+    "scaife_stack_atlas.temp.add_lexicon_thucydideum_css": [
+        "raw/lexicon-thucydideum/style.css"
+    ],
+}
+
+
+# NOTE: Resources written to the database by each step; see
+# `get_prepare_dependencies`.  Steps that are not listed are assumed to write
+# every resource.
+PIPELINE_STEP_WRITES = {
+    "scaife_viewer.atlas.importers.versions.import_versions": ["nodes"],
+    "scaife_viewer.atlas.importers.text_annotations.import_text_annotations": [
+        "text_annotations"
+    ],
+    "scaife_viewer.atlas.importers.attributions.import_attributions": ["attributions"],
+    "scaife_stack_atlas.temp.index_text_annotations": [
+        "text_annotations",
+        "attributions",
+        "reference_index",
+    ],
+    "scaife_viewer.atlas.importers.metrical_annotations.import_metrical_annotations": [
+        "metrical_annotations"
+    ],
+    "scaife_viewer.atlas.importers.image_annotations.import_image_annotations": [
+        "image_annotations"
+    ],
+    "scaife_viewer.atlas.importers.audio_annotations.import_audio_annotations": [
+        "audio_annotations"
+    ],
+    "scaife_viewer.atlas.tokenizers.tokenize_all_text_parts": ["tokens"],
+    "scaife_viewer.atlas.importers.token_annotations.apply_token_annotations": [
+        "token_annotations"
+    ],
+    "scaife_viewer.atlas.importers.named_entities.apply_named_entities": [
+        "named_entities"
+    ],
+    "scaife_viewer.atlas.importers.dictionaries.import_dictionaries": ["dictionaries"],
+    "scaife_stack_atlas.temp.process_alignments": ["alignments"],
+    "scaife_stack_atlas.temp.create_persian_greek_alignment": ["alignments"],
+    "scaife_stack_atlas.temp.add_translations_to_trees": ["text_annotations"],
+    "scaife_stack_atlas.temp.add_glosses_to_trees": ["text_annotations"],
+    "scaife_stack_atlas.temp.import_grammatical_entries": ["grammatical_entries"],
+    "scaife_stack_atlas.temp.stub_scholia_roi_text_annotations": [
+        "text_annotations",
+        "image_annotations",
+    ],
+    "scaife_stack_atlas.temp.add_anabasis_glosses_to_trees": ["text_annotations"],
+    "scaife_stack_atlas.temp.ingest_balex_extras": ["nodes", "assets"],
+    "scaife_stack_atlas.temp.update_balex_metadata": ["nodes"],
+    "scaife_stack_atlas.temp.add_cgl_css": ["dictionaries", "assets"],
+    "scaife_stack_atlas.temp.add_lexicon_thucydideum_css": ["dictionaries", "assets"],
+}
+
+# NOTE: Parse-only phases of steps, along with the resources they read from the
+# database.  A phase must not write to the database; what it returns (if
+# anything) is passed to its step as `prepared`.
+PIPELINE_STEP_PREPARE = {
+    "scaife_viewer.atlas.importers.dictionaries.import_dictionaries": dict(
+        func="scaife_stack_atlas.temp.prepare_lsj_entries",
+        reads=[],
+    ),
+    "scaife_stack_atlas.temp.process_alignments": dict(
+        func="scaife_stack_atlas.temp.prepare_alignments",
+        reads=["nodes", "tokens"],
+    ),
+}
+
+
+def get_input_paths(step):
+    data_dir = Path(settings.SV_ATLAS_DATA_DIR)
+    paths = set()
+    for pattern in PIPELINE_STEP_INPUTS.get(step, []):
+        paths.update(path for path in data_dir.glob(pattern) if path.is_file())
+    return sorted(paths)
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@functools.lru_cache()
+def get_module_definitions(module):
+    """
+    Returns the top-level functions, classes and assignments of `module`, as
+    (names, node, source) tuples in the order they are defined
+    """
+    source = inspect.getsource(module)
+    lines = source.splitlines()
+    definitions = []
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names = {node.name}
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            names = {
+                child.id
+                for target in targets
+                for child in ast.walk(target)
+                if isinstance(child, ast.Name)
+            }
+        else:
+            continue
+        start = min(
+            [node.lineno]
+            + [child.lineno for child in getattr(node, "decorator_list", [])]
+        )
+        definitions.append((names, node, "\n".join(lines[start - 1 : node.end_lineno])))
+    return definitions
+
+
+def get_step_source(func):
+    """
+    Returns the source of the step `func`, along with the functions, classes
+    and constants of its module that it refers to (directly or via the helpers
+    it calls).
+
+    Helpers imported from other modules are not included.
+    """
+    definitions = get_module_definitions(inspect.getmodule(func))
+    names = set()
+    pending = [func.__name__]
+    while pending:
+        name = pending.pop()
+        if name in names:
+            continue
+        names.add(name)
+        for defined_names, node, _ in definitions:
+            if name in defined_names:
+                pending.extend(
+                    child.id for child in ast.walk(node) if isinstance(child, ast.Name)
+                )
+    sources = [
+        source for defined_names, _, source in definitions if defined_names & names
+    ]
+    return "\n\n".join(sources) or inspect.getsource(func)
+
+
+class IngestionManifest:
+    """
+    Content hashes for each step of the ingestion pipeline.
+
+    File hashes are cached by size and mtime, so unchanged inputs are not
+    re-read on every run.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        try:
+            data = json.load(self.path.open())
+        except FileNotFoundError:
+            data = {}
+        self.steps = data.get("steps", [])
+        self.files = data.get("files", {})
+
+    def get_file_hash(self, path):
+        relpath = str(path.relative_to(settings.SV_ATLAS_DATA_DIR))
+        stat = path.stat()
+        cached = self.files.get(relpath)
+        if (
+            cached
+            and cached["size"] == stat.st_size
+            and cached["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return relpath, cached["sha256"]
+
+        sha256 = hash_file(path)
+        self.files[relpath] = dict(
+            size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=sha256
+        )
+        return relpath, sha256
+
+    def get_step_hash(self, step):
+        digest = hashlib.sha256()
+        func = load_path_attr(step)
+        # NOTE: The helpers a step calls are hashed along with it, so that
+        # changes to them also mark it as stale (but changes to unrelated
+        # steps in the same module do not)
+        digest.update(get_step_source(func).encode("utf-8"))
+        for path in get_input_paths(step):
+            relpath, sha256 = self.get_file_hash(path)
+            digest.update(f"{relpath}:{sha256}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def compute_steps(self, pipeline):
+        return [dict(step=step, hash=self.get_step_hash(step)) for step in pipeline]
+
+    def get_first_stale_index(self, steps):
+        """
+        Returns the index of the first step that differs from the manifest, or
+        the length of `steps` if every step is up to date.
+        """
+        for pos, step in enumerate(steps):
+            if pos >= len(self.steps) or self.steps[pos] != step:
+                return pos
+        return len(steps)
+
+    def save(self, steps):
+        self.steps = steps
+        with self.path.open("w") as f:
+            json.dump(dict(steps=self.steps, files=self.files), f, indent=2)
+
+
+INSERT_TABLE_RE = re.compile(r'^\s*INSERT\s+INTO\s+"?([\w]+)"?', re.IGNORECASE)
+UPDATE_TABLE_RE = re.compile(r'^\s*UPDATE\s+"?([\w]+)"?', re.IGNORECASE)
+
+
+def get_model_labels_by_table():
+    return {
+        model._meta.db_table: model._meta.label
+        for model in apps.get_models(include_auto_created=True)
+    }
+
+
+def reset_peak_rss():
+    """
+    Resets the peak RSS of the current process (Linux only), so that the
+    peak can be measured per step.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def get_peak_rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # NOTE: ru_maxrss is the peak for the lifetime of the process
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class StepMetrics:
+    """
+    Records wall time, SQL queries, rows inserted / updated per model and peak
+    RSS for a pipeline step.
+
+    Queries are counted via a database execute wrapper, so writes made outside
+    of the Django ORM connections (e.g. raw sqlite3 connections in worker
+    processes) are not included.
+    """
+
+    def __init__(self, step, model_labels):
+        self.step = step
+        self.model_labels = model_labels
+        self.queries = 0
+        self.rows_inserted = Counter()
+        self.rows_updated = Counter()
+        self.wall_time = None
+        self.peak_rss_kb = None
+        self.peak_rss_is_lifetime = False
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        result = execute(sql, params, many, context)
+        for regex, counter in [
+            (INSERT_TABLE_RE, self.rows_inserted),
+            (UPDATE_TABLE_RE, self.rows_updated),
+        ]:
+            match = regex.match(sql)
+            if match:
+                table = match.group(1)
+                label = self.model_labels.get(table, table)
+                counter[label] += max(context["cursor"].rowcount, 0)
+        return result
+
+    def __enter__(self):
+        self.peak_rss_is_lifetime = not reset_peak_rss()
+        self.exit_stack = ExitStack()
+        for connection in connections.all():
+            self.exit_stack.enter_context(connection.execute_wrapper(self))
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wall_time = time.perf_counter() - self.start
+        self.exit_stack.close()
+        self.peak_rss_kb = get_peak_rss_kb()
+
+    def as_dict(self):
+        return dict(
+            step=self.step,
+            wall_time=round(self.wall_time, 3),
+            queries=self.queries,
+            rows_inserted=dict(self.rows_inserted.most_common()),
+            rows_updated=dict(self.rows_updated.most_common()),
+            peak_rss_kb=self.peak_rss_kb,
+            peak_rss_is_lifetime=self.peak_rss_is_lifetime,
+        )
+
+
+def format_report_table(report):
+    rows = sorted(report["steps"], key=lambda x: x["wall_time"], reverse=True)
+    width = max([len(row["step"]) for row in rows] + [len("step")])
+    lines = [
+        f"{'step':<{width}}  {'wall (s)':>10}  {'queries':>9}  {'rows':>10}  {'updated':>10}  {'peak RSS (MB)':>13}"
+    ]
+    for row in rows:
+        rows_inserted = sum(row["rows_inserted"].values())
+        rows_updated = sum(row.get("rows_updated", {}).values())
+        peak_rss_mb = row["peak_rss_kb"] / 1024
+        lines.append(
+            f"{row['step']:<{width}}  {row['wall_time']:>10.2f}  {row['queries']:>9}  {rows_inserted:>10}  {rows_updated:>10}  {peak_rss_mb:>13.1f}"
+        )
+    lines.append(f"{'total':<{width}}  {report['wall_time']:>10.2f}")
+    return "\n".join(lines)
+
+
+def write_report(outf, report):
+    report_path = Path(settings.SV_ATLAS_INGESTION_REPORT_PATH)
+    with report_path.open("w") as f:
+        json.dump(report, f, indent=2)
+    outf.write(format_report_table(report))
+    outf.write(f"--[Wrote ingestion report to {report_path}]--")
+
+
+class IngestionError(Exception):
+    pass
+
+
+class CheckpointStore:
+    """
+    Snapshots of the ATLAS database taken between pipeline steps.
+
+    Checkpoint N holds the database after the first N steps of the pipeline
+    (checkpoint 0 is the freshly migrated database), along with the manifest
+    entries for those steps.
+    """
+
+    def __init__(self, path, db_label):
+        self.path = Path(path)
+        self.db_label = db_label
+
+    def get_path(self, pos):
+        return self.path / f"{pos:03d}.sqlite"
+
+    def get_steps_path(self, pos):
+        return self.path / f"{pos:03d}.json"
+
+    def exists(self, pos):
+        return self.get_path(pos).exists() and self.get_steps_path(pos).exists()
+
+    def clear(self):
+        if self.path.exists():
+            shutil.rmtree(self.path)
+
+    def prune(self, after):
+        """
+        Removes checkpoints taken after `after` steps, which no longer match
+        the database once those steps are re-run.
+        """
+        for path in self.path.glob("*.*"):
+            if path.stem.isdigit() and int(path.stem) > after:
+                path.unlink()
+
+    def save(self, pos, steps):
+        self.path.mkdir(parents=True, exist_ok=True)
+        checkpoint_path = self.get_path(pos)
+        if checkpoint_path.exists():
+            checkpoint_path.unlink()
+
+        connection = connections[self.db_label]
+        connection.ensure_connection()
+        if sqlite3.sqlite_version_info >= (3, 27):
+            with connection.cursor() as cursor:
+                cursor.execute("VACUUM INTO %s", [str(checkpoint_path)])
+        else:
+            destination = sqlite3.connect(str(checkpoint_path))
+            with destination:
+                connection.connection.backup(destination)
+            destination.close()
+
+        with self.get_steps_path(pos).open("w") as f:
+            json.dump(steps, f, indent=2)
+
+    def restore(self, pos):
+        """
+        Replaces the database with checkpoint `pos` and returns the manifest
+        entries for the steps it contains.
+        """
+        connections[self.db_label].close()
+        shutil.copyfile(self.get_path(pos), settings.SV_ATLAS_DB_PATH)
+        return json.load(self.get_steps_path(pos).open())
+
+
+def get_step_index(pipeline, step):
+    """
+    Returns the position of `step` in `pipeline`; `step` may be the full
+    dotted path or just the function name.
+    """
+    for pos, candidate in enumerate(pipeline):
+        if step in (candidate, candidate.rsplit(".", 1)[-1]):
+            return pos
+    raise IngestionError(f"{step} is not a step in SV_ATLAS_INGESTION_PIPELINE")
+
+
+def get_prepare_dependencies(pipeline):
+    """
+    Returns the position of the last step that each parse-only phase in
+    `pipeline` must wait for (or -1 if it can start straight away), keyed by
+    the position of its own step.
+    """
+    dependencies = {}
+    for pos, step in enumerate(pipeline):
+        prepare = PIPELINE_STEP_PREPARE.get(step)
+        if prepare is None:
+            continue
+        reads = set(prepare["reads"])
+        dependencies[pos] = max(
+            (
+                earlier
+                for earlier in range(pos)
+                if reads
+                and (
+                    pipeline[earlier] not in PIPELINE_STEP_WRITES
+                    or reads & set(PIPELINE_STEP_WRITES[pipeline[earlier]])
+                )
+            ),
+            default=-1,
+        )
+    return dependencies
+
+
+def _prepare_in_worker(func_path, conn):
+    if not apps.ready:
+        django.setup()
+    try:
+        start = time.perf_counter()
+        prepared = load_path_attr(func_path)()
+        conn.send(("ok", prepared, time.perf_counter() - start))
+    except BaseException:
+        conn.send(("error", traceback.format_exc(), None))
+    finally:
+        connections.close_all()
+        conn.close()
+
+
+class StepScheduler:
+    """
+    Runs the parse-only phases of pipeline steps (see `PIPELINE_STEP_PREPARE`)
+    ahead of their steps.
+
+    The steps themselves are run in order by the caller, from the current
+    process, which is the only writer to the database.  A phase is started in a
+    worker process (with at most `max_workers` running at once) as soon as
+    every earlier step that writes what it reads has completed; if
+    `max_workers` is 1, or the phase has not been started by the time its step
+    is reached, it is run in the current process instead.
+    """
+
+    def __init__(self, pipeline, positions, max_workers):
+        self.pipeline = pipeline
+        self.dependencies = get_prepare_dependencies(pipeline)
+        self.pending = [pos for pos in positions if pos in self.dependencies]
+        self.max_workers = max_workers if max_workers > 1 else 0
+        self.context = multiprocessing.get_context()
+        self.running = {}
+        self.results = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        for process, conn in self.running.values():
+            process.terminate()
+            process.join()
+            conn.close()
+        self.running.clear()
+
+    def get_func_path(self, pos):
+        return PIPELINE_STEP_PREPARE[self.pipeline[pos]]["func"]
+
+    def start_ready(self, next_pos, outf):
+        """
+        Starts the phases that only wait for steps before `next_pos`, which
+        have all completed.
+        """
+        self.collect()
+        for pos in list(self.pending):
+            if len(self.running) >= self.max_workers:
+                break
+            if self.dependencies[pos] >= next_pos:
+                continue
+            self.pending.remove(pos)
+            outf.write(f"--[{self.pipeline[pos]}] (preparing)--")
+            # NOTE: Connections are not shared with workers
+            connections.close_all()
+            parent_conn, child_conn = self.context.Pipe(duplex=False)
+            process = self.context.Process(
+                target=_prepare_in_worker, args=(self.get_func_path(pos), child_conn)
+            )
+            process.start()
+            child_conn.close()
+            self.running[pos] = (process, parent_conn)
+
+    def collect(self, wait_for=None):
+        """
+        Receives the results of the phases that have finished, along with that
+        of step `wait_for` (once it finishes).
+        """
+        for pos, (process, conn) in list(self.running.items()):
+            if pos != wait_for and not conn.poll():
+                continue
+            try:
+                self.results[pos] = conn.recv()
+            except EOFError:
+                self.results[pos] = ("error", f"exit code {process.exitcode}", None)
+            process.join()
+            conn.close()
+            del self.running[pos]
+
+    def get_prepared(self, pos):
+        """
+        Returns what the phase of step `pos` returned and how long it took, or
+        (None, None) if the step has no phase.
+        """
+        if pos in self.pending:
+            self.pending.remove(pos)
+            start = time.perf_counter()
+            prepared = load_path_attr(self.get_func_path(pos))()
+            return prepared, time.perf_counter() - start
+        self.collect(wait_for=pos)
+        if pos not in self.results:
+            return None, None
+        status, prepared, wall_time = self.results.pop(pos)
+        if status != "ok":
+            raise IngestionError(f"{self.get_func_path(pos)} failed:\n{prepared}")
+        return prepared, wall_time
+
+
+def apply_build_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite" or connection.alias != settings.SV_ATLAS_DB_LABEL:
+        return
+    cursor = connection.cursor()
+    for pragma in settings.SV_ATLAS_DB_BUILD_PRAGMAS:
+        cursor.execute(pragma)
+    concurrency = settings.SV_ATLAS_INGESTION_CONCURRENCY
+    if not (concurrency and concurrency > 1):
+        # NOTE: Holding the lock avoids re-acquiring it for each transaction;
+        # it would block the worker processes that prepare steps (see
+        # `StepScheduler`) and parse alignment files
+        cursor.execute("PRAGMA locking_mode=EXCLUSIVE")
+
+
+@contextmanager
+def build_profile():
+    """
+    Applies SV_ATLAS_DB_BUILD_PRAGMAS to the ATLAS database connection while
+    the pipeline runs, when ATLAS_DB_PROFILE=build.
+    """
+    if settings.SV_ATLAS_DB_PROFILE != "build":
+        yield
+        return
+    # NOTE: The connection is re-opened on entry, so that the pragmas apply to
+    # it, and closed on exit, which releases the exclusive lock
+    connections[settings.SV_ATLAS_DB_LABEL].close()
+    connection_created.connect(
+        apply_build_pragmas, dispatch_uid="scaife_stack_atlas_build_pragmas"
+    )
+    try:
+        yield
+    finally:
+        connection_created.disconnect(dispatch_uid="scaife_stack_atlas_build_pragmas")
+        connections[settings.SV_ATLAS_DB_LABEL].close()
+
+
+def run_ingestion_pipeline(
+    outf, incremental=False, dry_run=False, resume_from=None, until=None
+):
+    pipeline = settings.SV_ATLAS_INGESTION_PIPELINE
+    manifest = IngestionManifest(settings.SV_ATLAS_INGESTION_MANIFEST_PATH)
+    steps = manifest.compute_steps(pipeline)
+    checkpoints = None
+    if settings.SV_ATLAS_INGESTION_CHECKPOINT_DIR:
+        checkpoints = CheckpointStore(
+            settings.SV_ATLAS_INGESTION_CHECKPOINT_DIR, settings.SV_ATLAS_DB_LABEL
+        )
+
+    start = 0
+    end = len(pipeline)
+    if until is not None:
+        end = get_step_index(pipeline, until) + 1
+    if resume_from is not None:
+        start = get_step_index(pipeline, resume_from)
+        if checkpoints is None or not checkpoints.exists(start):
+            raise IngestionError(f"No checkpoint was found before {pipeline[start]}")
+        outf.write(f"--[Restoring checkpoint before {pipeline[start]}]--")
+        if not dry_run:
+            manifest.steps = checkpoints.restore(start)
+            if manifest.steps != steps[:start]:
+                outf.write(
+                    "--[WARNING: steps before the checkpoint have changed since it was taken]--"
+                )
+    elif incremental:
+        start = manifest.get_first_stale_index(steps)
+        for step in pipeline[:start]:
+            outf.write(f"--[{step}] (unchanged; skipped)--")
+        if start == len(pipeline):
+            outf.write("--[ATLAS data is up to date]--")
+    elif checkpoints is not None and not dry_run:
+        checkpoints.clear()
+        checkpoints.save(0, [])
+
+    if checkpoints is not None and not dry_run:
+        checkpoints.prune(after=start)
+
+    model_labels = get_model_labels_by_table()
+    report = dict(steps=[])
+    start_time = time.perf_counter()
+    max_workers = settings.SV_ATLAS_INGESTION_CONCURRENCY or 1
+    with build_profile(), StepScheduler(
+        pipeline, range(start, end), max_workers
+    ) as scheduler:
+        for pos in range(start, end):
+            step = pipeline[pos]
+            outf.write(f"--[{step}]--")
+            if dry_run:
+                continue
+            scheduler.start_ready(pos, outf)
+            prepared, prepare_time = scheduler.get_prepared(pos)
+            kwargs = {} if prepared is None else dict(prepared=prepared)
+            func = load_path_attr(step)
+            with StepMetrics(step, model_labels) as metrics:
+                func(reset=True, **kwargs)
+            step_report = metrics.as_dict()
+            if prepare_time is not None:
+                step_report["prepare_wall_time"] = round(prepare_time, 3)
+                # NOTE: The phase may have regenerated the inputs of the step
+                # (e.g. the LSJ entries read by import_dictionaries)
+                steps[pos] = dict(step=step, hash=manifest.get_step_hash(step))
+            report["steps"].append(step_report)
+            manifest.save(manifest.steps[:pos] + steps[pos : pos + 1])
+            if checkpoints is not None:
+                checkpoints.save(pos + 1, manifest.steps)
+    report["wall_time"] = round(time.perf_counter() - start_time, 3)
+
+    if not dry_run:
+        manifest.save(manifest.steps)
+    if report["steps"]:
+        write_report(outf, report)
@@ -0,0 +1,68 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+    Compares two ATLAS ingestion reports (as written by `prepare_atlas_db`)
+
+    Steps that got slower (or issued more queries) by more than `--threshold`
+    percent are flagged as regressions.
+    """
+
+    help = "Compares two ATLAS ingestion reports"
+
+    def add_arguments(self, parser):
+        parser.add_argument("before", help="Path to the baseline report")
+        parser.add_argument("after", help="Path to the report to compare")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=10.0,
+            help="Percent increase flagged as a regression (default: 10)",
+        )
+
+    @staticmethod
+    def load_steps(path):
+        with open(path) as f:
+            return {row["step"]: row for row in json.load(f)["steps"]}
+
+    @staticmethod
+    def percent_change(before, after):
+        if not before:
+            return 0.0 if not after else float("inf")
+        return (after - before) / before * 100
+
+    def handle(self, *args, **options):
+        before = self.load_steps(options["before"])
+        after = self.load_steps(options["after"])
+        threshold = options["threshold"]
+
+        regressions = 0
+        for step in list(dict.fromkeys(list(before) + list(after))):
+            if step not in before or step not in after:
+                status = "removed" if step not in after else "added"
+                self.stdout.write(f"{step}: {status}")
+                continue
+
+            changes = []
+            flagged = False
+            for field in ["wall_time", "queries", "peak_rss_kb"]:
+                change = self.percent_change(before[step][field], after[step][field])
+                flagged = flagged or (field != "peak_rss_kb" and change > threshold)
+                changes.append(
+                    f"{field}={before[step][field]}->{after[step][field]} ({change:+.1f}%)"
+                )
+            before_rows = sum(before[step]["rows_inserted"].values())
+            after_rows = sum(after[step]["rows_inserted"].values())
+            changes.append(f"rows_inserted={before_rows}->{after_rows}")
+
+            line = f"{step}: {' '.join(changes)}"
+            if flagged:
+                regressions += 1
+                self.stdout.write(self.style.WARNING(f"[regression] {line}"))
+            else:
+                self.stdout.write(line)
+
+        self.stdout.write(f"Regressions: {regressions}")
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from scaife_stack_atlas.db_packages import PackageError, restore_package
+
+
+class Command(BaseCommand):
+    """
+    Downloads / restores an ATLAS database package (or applies a patch)
+    """
+
+    help = "Downloads / restores an ATLAS database package (or applies a patch)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "manifest",
+            help="URL or path of the package (or patch) manifest",
+        )
+        parser.add_argument(
+            "--base",
+            help="Path of the database a patch is applied to (defaults to SV_ATLAS_DB_PATH)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Number of threads used to fetch and decompress chunks",
+        )
+
+    def handle(self, *args, **options):
+        database_path = settings.SV_ATLAS_DB_PATH
+        self.stdout.write(f"--[Restoring {options['manifest']} to {database_path}]--")
+        try:
+            manifest = restore_package(
+                options["manifest"],
+                database_path,
+                workers=options["workers"],
+                base_path=options["base"],
+            )
+        except PackageError as e:
+            raise CommandError(e)
+        self.stdout.write(
+            f"Restored {len(manifest['chunks'])} chunks; md5 sha: {manifest['md5']}"
+        )
+        self.stdout.write("--[Done!]--")
@@ -0,0 +1,74 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from scaife_stack_atlas.ingestion import IngestionError, run_ingestion_pipeline
+
+
+class Command(BaseCommand):
+    """
+    Incrementally updates an existing ATLAS database
+
+    Steps are skipped until the first step whose inputs (or source) have
+    changed since the last run; that step and every step after it are re-run.
+
+    With --resume-from, the database is instead restored from the checkpoint
+    taken before the given step, and the pipeline is run from that step.
+    """
+
+    help = "Incrementally updates an existing ATLAS database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Lists the steps that would be re-run without running them",
+        )
+        parser.add_argument(
+            "--resume-from",
+            metavar="STEP",
+            help="Restores the checkpoint taken before STEP and runs the pipeline from STEP",
+        )
+        parser.add_argument(
+            "--until",
+            metavar="STEP",
+            help="Stops the pipeline after STEP has been run",
+        )
+
+    def handle(self, *args, **options):
+        resume_from = options.get("resume_from")
+        until = options.get("until")
+        if resume_from:
+            self.stdout.write(f"--[Resuming ATLAS ingestion from {resume_from}]--")
+            try:
+                run_ingestion_pipeline(
+                    self.stdout,
+                    dry_run=options.get("dry_run"),
+                    resume_from=resume_from,
+                    until=until,
+                )
+            except IngestionError as e:
+                raise CommandError(str(e))
+            return
+
+        database_path = settings.SV_ATLAS_DB_PATH
+        if not os.path.exists(database_path):
+            raise CommandError(
+                f"{database_path} does not exist; run prepare_atlas_db first"
+            )
+        if not os.path.exists(settings.SV_ATLAS_INGESTION_MANIFEST_PATH):
+            raise CommandError(
+                "No ingestion manifest was found; run prepare_atlas_db --force first"
+            )
+
+        self.stdout.write("--[Updating ATLAS database]--")
+        try:
+            run_ingestion_pipeline(
+                self.stdout,
+                incremental=True,
+                dry_run=options.get("dry_run"),
+                until=until,
+            )
+        except IngestionError as e:
+            raise CommandError(str(e))
@@ -0,0 +1,52 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from scaife_stack_atlas.db_packages import (
+    PackageError,
+    create_patch,
+    get_package_storage,
+)
+
+
+class Command(BaseCommand):
+    """
+    Creates / uploads a patch from a previous ATLAS database build
+    """
+
+    help = "Creates / uploads a patch from a previous ATLAS database build"
+
+    def add_arguments(self, parser):
+        parser.add_argument("base", help="Path of the previous db.sqlite")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Number of threads used to compress the patch",
+        )
+
+    def handle(self, *args, **options):
+        database_path = settings.SV_ATLAS_DB_PATH
+        self.stdout.write("--[Creating / uploading database patch]--")
+
+        storage = get_package_storage()
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(database_path)) as tmp:
+            self.stdout.write(f"Comparing {database_path} with {options['base']}")
+            try:
+                patch_path, manifest_path, manifest = create_patch(
+                    options["base"], database_path, tmp, workers=options["workers"]
+                )
+            except PackageError as e:
+                raise CommandError(e)
+            patched = [c for c in manifest["chunks"] if "base_offset" not in c]
+            self.stdout.write(
+                f"{len(patched)} of {len(manifest['chunks'])} chunks changed; "
+                f"patch size: {patch_path.stat().st_size} bytes"
+            )
+
+            self.stdout.write(f"Uploading {patch_path.name}")
+            storage.save(patch_path)
+            url = storage.save(manifest_path)
+            self.stdout.write(f"Uploaded to {url}")
+        self.stdout.write("--[Done!]--")
@@ -1,23 +1,27 @@
 import os
-import shlex
-import subprocess
+import tempfile
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.core.management.base import BaseCommand
 
+from scaife_stack_atlas.atlas_db import write_md5_sidecar
+from scaife_stack_atlas.db_packages import create_package, get_package_storage
+
 
 class Command(BaseCommand):
     """
-    Compresses / uploads an ATLAS database tarball
+    Compresses / uploads an ATLAS database package
     """
 
-    help = "Compresses / uploads an ATLAS database tarball"
+    help = "Compresses / uploads an ATLAS database package"
 
-    @staticmethod
-    def do_shell_command(command_string):
-        result = subprocess.check_output(shlex.split(command_string))
-        return result.decode("utf-8")
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Number of threads used to compress the database",
+        )
 
     def handle(self, *args, **options):
         database_path = settings.SV_ATLAS_DB_PATH
@@ -26,33 +30,24 @@ class Command(BaseCommand):
             msg = "The SV_ATLAS_DB_PATH setting is missing and is required for this management command to work."
             raise ImproperlyConfigured(msg)
 
-        self.stdout.write("--[Creating / uploading database tarball]--")
-
-        database_file = os.path.basename(database_path)
-        result = self.do_shell_command(f"md5sum {database_path}")
-        md5sha = result.split(" ")[0]
-        self.stdout.write(f"{database_path} md5 sha: {md5sha}")
-
-        database_dir = os.path.dirname(database_path)
-        os.chdir(database_dir)
-
-        compressed_db_filename = f"db-{md5sha}.tgz"
-        self.stdout.write(f"Compressing {database_path} as {compressed_db_filename} ")
-        tar_cmd = f"tar -cvzf {compressed_db_filename} {database_file}"
-        self.do_shell_command(tar_cmd)
-
-        bucket = "atlas-db-tarballs"
-        site = "beyond-translation"
-        self.stdout.write(f"Uploading {compressed_db_filename} to {bucket}")
-        gsutil_cmd = f"gsutil -m cp -a public-read {compressed_db_filename} gs://{bucket}/{site}/{compressed_db_filename}"
-        self.do_shell_command(gsutil_cmd)
-
-        url = f"https://storage.googleapis.com/{bucket}/{site}/{compressed_db_filename}"
-        self.stdout.write(f"Uploaded to {url}")
-
-        self.stdout.write(f"Removing {compressed_db_filename}")
-        rm_cmd = f"rm {compressed_db_filename}"
-        self.do_shell_command(rm_cmd)
+        self.stdout.write("--[Creating / uploading database package]--")
+
+        storage = get_package_storage()
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(database_path)) as tmp:
+            self.stdout.write(f"Compressing {database_path}")
+            package_path, manifest_path, manifest = create_package(
+                database_path, tmp, workers=options["workers"]
+            )
+            md5sha = manifest["md5"]
+            self.stdout.write(f"{database_path} md5 sha: {md5sha}")
+            write_md5_sidecar(database_path, md5sha)
+
+            self.stdout.write(f"Uploading {package_path.name}")
+            storage.save(package_path)
+            # NOTE: The manifest is uploaded last, so that it is only
+            # available once the package is
+            url = storage.save(manifest_path)
+            self.stdout.write(f"Uploaded to {url}")
 
         self.stdout.write(f"Writing {url} to .atlas-db-url")
         atlas_db_url_path = os.path.join(settings.PROJECT_ROOT, ".atlas-db-url")
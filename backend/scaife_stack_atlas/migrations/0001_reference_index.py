@@ -0,0 +1,61 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("scaife_viewer_atlas", "0017_merge_20231228_0809"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TextAnnotationReference",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("urn", models.CharField(max_length=255)),
+                ("version_urn", models.CharField(max_length=255)),
+                (
+                    "collection",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="reference_index",
+                        to="scaife_viewer_atlas.TextAnnotationCollection",
+                    ),
+                ),
+                (
+                    "text_annotation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reference_index",
+                        to="scaife_viewer_atlas.TextAnnotation",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="textannotationreference",
+            index=models.Index(fields=["urn"], name="scaife_stac_urn_538029_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="textannotationreference",
+            index=models.Index(
+                fields=["version_urn", "text_annotation"],
+                name="scaife_stac_version_d83cd8_idx",
+            ),
+        ),
+    ]
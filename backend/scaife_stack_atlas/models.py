@@ -0,0 +1,97 @@
+import hashlib
+
+from django.db import models
+from django.urls import reverse
+
+
+class TextAnnotationReferenceQuerySet(models.QuerySet):
+    def for_passage(self, urn):
+        """
+        Returns references to `urn` or any of its descendants (e.g. the lines
+        of a book, or every text part of a version).
+
+        Uses a range over the indexed `urn` column rather than a LIKE query, so
+        that the lookup can be satisfied by the index.
+        """
+        # NOTE: The descendants of a version URN follow its trailing ":", and
+        # those of a passage URN follow a "."
+        prefix = urn if urn.endswith(":") else f"{urn}."
+        upper_bound = f"{prefix[:-1]}{chr(ord(prefix[-1]) + 1)}"
+        return self.filter(
+            models.Q(urn=urn) | models.Q(urn__gte=prefix, urn__lt=upper_bound)
+        )
+
+
+class TextAnnotationReference(models.Model):
+    """
+    One row per URN in `TextAnnotation.data["references"]`
+
+    Populated by `scaife_stack_atlas.temp.index_text_annotations`, which also
+    uses it to find the annotations of a collection by the source of their
+    references; see also `scaife_stack_atlas.views.passage_annotators`
+    """
+
+    text_annotation = models.ForeignKey(
+        "scaife_viewer_atlas.TextAnnotation",
+        related_name="reference_index",
+        on_delete=models.CASCADE,
+    )
+    urn = models.CharField(max_length=255)
+    # NOTE: The URN up to the version (e.g.
+    # urn:cts:greekLit:tlg0060.tlg001.perseus-grc3-vgorman1-trees:); identifies
+    # the source of the annotation
+    version_urn = models.CharField(max_length=255)
+    collection = models.ForeignKey(
+        "scaife_viewer_atlas.TextAnnotationCollection",
+        related_name="reference_index",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+    )
+
+    objects = TextAnnotationReferenceQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["urn"]),
+            models.Index(fields=["version_urn", "text_annotation"]),
+        ]
+
+    def __str__(self):
+        return f"{self.text_annotation_id}: {self.urn}"
+
+
+class AssetQuerySet(models.QuerySet):
+    def store(self, content, content_type):
+        """
+        Stores `content` once, keyed by its SHA-256 digest, and returns the
+        Asset.
+        """
+        sha256 = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        asset, _ = self.get_or_create(
+            sha256=sha256, defaults=dict(content=content, content_type=content_type)
+        )
+        return asset
+
+
+class Asset(models.Model):
+    """
+    A content-addressed blob (e.g. a stylesheet or TEI XML) shared by nodes and
+    dictionaries, which refer to it via `url`.
+
+    Only written when `SV_ATLAS_ASSETS_ENABLED` is set; see
+    `scaife_stack_atlas.temp.store_asset`.
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    content_type = models.CharField(max_length=255)
+    content = models.TextField()
+
+    objects = AssetQuerySet.as_manager()
+
+    def __str__(self):
+        return self.sha256
+
+    @property
+    def url(self):
+        return reverse("serve_asset", args=[self.sha256])
@@ -1,6 +1,34 @@
 import graphene
 
 import scaife_viewer.atlas.schema
+from scaife_viewer.atlas.schema import (
+    PassageTextPartNode,
+    TextAlignmentRecordNode,
+    TextAlignmentRecordRelationNode,
+    TextPartNode,
+    TokenNode,
+)
+
+from .api.loaders import install_batched_resolvers
+
+
+# NOTE: Batches the relationships that reader queries fan out over, so that a
+# passage is resolved with a constant number of queries; see
+# `scaife_stack_atlas.api.loaders`
+install_batched_resolvers(
+    [PassageTextPartNode, TextPartNode], ["tokens", "text_annotations"]
+)
+install_batched_resolvers(
+    [TokenNode],
+    [
+        "annotations",
+        "named_entities",
+        "grammatical_entries",
+        "alignment_record_relations",
+    ],
+)
+install_batched_resolvers([TextAlignmentRecordNode], ["relations"])
+install_batched_resolvers([TextAlignmentRecordRelationNode], ["tokens", "record"])
 
 
 class Query(scaife_viewer.atlas.schema.Query, graphene.ObjectType):
@@ -174,11 +174,60 @@ EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
 CORS_ORIGIN_ALLOW_ALL = True
 
+# NOTE: Connections without `first` or `last` return up to
+# SV_ATLAS_GRAPHQL_MAX_LIST_SIZE items, and queries are limited by their
+# estimated cost, with unbounded connections estimated at that size; see
+# `scaife_stack_atlas.api.cost`.  Persisted queries (such as the reader's
+# passage query, which nests tokens and their annotations under each text part)
+# have a larger budget, which admits passages of up to ~100 lines
+SV_ATLAS_GRAPHQL_MAX_LIST_SIZE = int(os.environ.get("GRAPHQL_MAX_LIST_SIZE", 1000))
+SV_ATLAS_GRAPHQL_MAX_COST = int(os.environ.get("GRAPHQL_MAX_COST", 250000))
+SV_ATLAS_GRAPHQL_PERSISTED_MAX_COST = int(
+    os.environ.get("GRAPHQL_PERSISTED_MAX_COST", 500000000)
+)
+SV_ATLAS_GRAPHQL_MAX_DEPTH = int(os.environ.get("GRAPHQL_MAX_DEPTH", 15))
+
 GRAPHENE = {
     "SCHEMA": "scaife_stack_atlas.schema.schema",
-    # setting RELAY_CONNECTION_MAX_LIMIT to None removes the limit; for backwards compatability with current API
-    # @@@ restore the limit
-    "RELAY_CONNECTION_MAX_LIMIT": None,
+    "RELAY_CONNECTION_MAX_LIMIT": SV_ATLAS_GRAPHQL_MAX_LIST_SIZE,
+}
+
+# NOTE: Responses are only cached by default when the database is served
+# read-only (ATLAS_DB_PROFILE=serve), since it may change while it is built
+SV_ATLAS_GRAPHQL_CACHE_ENABLED = (
+    os.environ.get(
+        "GRAPHQL_CACHE_ENABLED",
+        "1" if os.environ.get("ATLAS_DB_PROFILE") == "serve" else "0",
+    )
+    == "1"
+)
+SV_ATLAS_GRAPHQL_CACHE_ALIAS = "graphql"
+SV_ATLAS_GRAPHQL_CACHE_MAX_RESPONSE_SIZE = 1024 * 1024
+GRAPHQL_CACHE_MAX_ENTRIES = int(os.environ.get("GRAPHQL_CACHE_MAX_ENTRIES", 500))
+GRAPHQL_CACHE_MAX_SIZE = int(os.environ.get("GRAPHQL_CACHE_MAX_SIZE", 64 * 1024 * 1024))
+# NOTE: Emitted by the frontend build; see `scaife_stack_atlas.api.persisted`.
+# Kept outside of data/, which is removed from the deployed image (see
+# heroku.dockerfile)
+SV_ATLAS_GRAPHQL_PERSISTED_QUERIES_PATH = os.environ.get(
+    "GRAPHQL_PERSISTED_QUERIES_PATH",
+    os.path.join(PROJECT_ROOT, "persisted-queries.json"),
+)
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    SV_ATLAS_GRAPHQL_CACHE_ALIAS: {
+        "BACKEND": "scaife_stack_atlas.api.cache.BoundedLocMemCache",
+        "LOCATION": "graphql-responses",
+        # NOTE: Keys include the database md5, so entries never expire; the
+        # least recently used responses are evicted once either MAX_ENTRIES or
+        # MAX_SIZE (in bytes, per process) is exceeded
+        "TIMEOUT": None,
+        "OPTIONS": {
+            "MAX_ENTRIES": GRAPHQL_CACHE_MAX_ENTRIES,
+            "CULL_FREQUENCY": 3,
+            "MAX_SIZE": GRAPHQL_CACHE_MAX_SIZE,
+        },
+    },
 }
 
 
@@ -189,10 +238,16 @@ SV_ATLAS_DATA_DIR = os.path.join(PROJECT_ROOT, "data")
 if "SV_ATLAS_INGESTION_CONCURRENCY" in os.environ:
     SV_ATLAS_INGESTION_CONCURRENCY = int(os.environ["SV_ATLAS_INGESTION_CONCURRENCY"])
 
+# NOTE: Set LSJ_XML_DIR to the LSJ volumes (CTS_XML_TEI/perseus/pdllex/grc/lsj
+# within PerseusDL/lexica) to re-extract data/annotations/dictionaries/lsj ahead
+# of import_dictionaries; see `scaife_stack_atlas.temp.prepare_lsj_entries`
+SV_ATLAS_LSJ_XML_DIR = os.environ.get("LSJ_XML_DIR")
+
 SV_ATLAS_INGESTION_PIPELINE = [
     "scaife_viewer.atlas.importers.versions.import_versions",
     "scaife_viewer.atlas.importers.text_annotations.import_text_annotations",
     "scaife_viewer.atlas.importers.attributions.import_attributions",
+    "scaife_stack_atlas.temp.index_text_annotations",
     "scaife_viewer.atlas.importers.metrical_annotations.import_metrical_annotations",
     "scaife_viewer.atlas.importers.image_annotations.import_image_annotations",
     "scaife_viewer.atlas.importers.audio_annotations.import_audio_annotations",
@@ -202,11 +257,6 @@ SV_ATLAS_INGESTION_PIPELINE = [
     "scaife_viewer.atlas.importers.dictionaries.import_dictionaries",
     # TODO: Backport to scaife_viewer.atlas
     "scaife_stack_atlas.temp.process_alignments",
-    "scaife_stack_atlas.temp.set_text_annotation_collection",
-    "scaife_stack_atlas.temp.set_gorman_attributions",
-    "scaife_stack_atlas.temp.create_gorman_collection",
-    "scaife_stack_atlas.temp.set_glaux_attributions",
-    "scaife_stack_atlas.temp.create_glaux_collection",
     "scaife_stack_atlas.temp.create_persian_greek_alignment",
     "scaife_stack_atlas.temp.add_translations_to_trees",
     "scaife_stack_atlas.temp.add_glosses_to_trees",
@@ -216,19 +266,75 @@ SV_ATLAS_INGESTION_PIPELINE = [
     "scaife_stack_atlas.temp.ingest_balex_extras",
     "scaife_stack_atlas.temp.update_balex_metadata",
     "scaife_stack_atlas.temp.add_cgl_css",
+    "scaife_stack_atlas.atlas_db.optimize_atlas_db",
 ]
 DB_DATA_PATH = os.environ.get("DB_DATA_PATH", PROJECT_ROOT)
 SV_ATLAS_DB_PATH = os.path.join(DB_DATA_PATH, "db.sqlite")
+SV_ATLAS_INGESTION_MANIFEST_PATH = os.path.join(DB_DATA_PATH, "ingestion-manifest.json")
+SV_ATLAS_INGESTION_REPORT_PATH = os.path.join(DB_DATA_PATH, "ingestion-report.json")
+# NOTE: Set ATLAS_INGESTION_CHECKPOINTS=1 to snapshot the database after each
+# pipeline step
+SV_ATLAS_INGESTION_CHECKPOINT_DIR = None
+if os.environ.get("ATLAS_INGESTION_CHECKPOINTS", "0") == "1":
+    SV_ATLAS_INGESTION_CHECKPOINT_DIR = os.path.join(DB_DATA_PATH, "checkpoints")
+# NOTE: Set ATLAS_ASSETS_ENABLED=1 to store the BALEX edition XML and the
+# dictionary stylesheets once, as content-addressed assets served from
+# /assets/<sha256>, and refer to them via `content_url` and `css_url` instead of
+# embedding them as `content` and `css`.  Off until the frontend reads the URLs
+SV_ATLAS_ASSETS_ENABLED = os.environ.get("ATLAS_ASSETS_ENABLED", "0") == "1"
+
+# NOTE: With ATLAS_DB_PROFILE=build, SQLite is tuned for bulk loading the
+# ATLAS database while the ingestion pipeline runs (prepare_atlas_db and
+# update_atlas_db); see `scaife_stack_atlas.ingestion.build_profile`.  The
+# "serve" profile (used by the deployed site) opens it read-only, as an
+# immutable file; its pragmas are applied by `scaife_stack_atlas.apps`
+SV_ATLAS_DB_PROFILE = os.environ.get("ATLAS_DB_PROFILE", "default")
+SV_ATLAS_DB_BUILD_PRAGMAS = [
+    "PRAGMA cache_size=-262144",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA journal_mode=MEMORY",
+]
+if SV_ATLAS_DB_PROFILE == "serve":
+    DATABASE_NAME = f"file:{SV_ATLAS_DB_PATH}?mode=ro&immutable=1"
+    DATABASE_OPTIONS = {"uri": True}
+    SV_ATLAS_DB_PRAGMAS = [
+        "PRAGMA query_only=ON",
+        "PRAGMA mmap_size=1073741824",
+        "PRAGMA cache_size=-65536",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    # NOTE: The database is read-only, so sessions are kept in signed cookies
+    # (and `last_login` is not updated; see `scaife_stack_atlas.apps`)
+    SESSION_ENGINE = "django.contrib.sessions.backends.signed_cookies"
+else:
+    DATABASE_NAME = SV_ATLAS_DB_PATH
+    # @@@ this timeout may not be appropriate
+    # for all sites using scaife-viewer-atlas,
+    # but we will likely have an ATLAS specific
+    # database router / ingestion-specific
+    # config in the future anyways
+    DATABASE_OPTIONS = {"timeout": 5 * 60}
+    SV_ATLAS_DB_PRAGMAS = []
+# NOTE: Applied by the final `optimize_atlas_db` pipeline step
+SV_ATLAS_DB_PAGE_SIZE = 8192
+
+# NOTE: Where `upload_atlas_db_tarball` saves database packages; set
+# ATLAS_DB_PACKAGE_DIR to save them to a local directory instead
+SV_ATLAS_DB_PACKAGE_STORAGE = {
+    "BACKEND": "scaife_stack_atlas.db_packages.GCSStorage",
+    "OPTIONS": {"bucket": "atlas-db-tarballs", "prefix": "beyond-translation"},
+}
+if os.environ.get("ATLAS_DB_PACKAGE_DIR"):
+    SV_ATLAS_DB_PACKAGE_STORAGE = {
+        "BACKEND": "scaife_stack_atlas.db_packages.LocalStorage",
+        "OPTIONS": {"location": os.environ["ATLAS_DB_PACKAGE_DIR"]},
+    }
 
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": SV_ATLAS_DB_PATH,
-        # @@@ this timeout may not be appropriate
-        # for all sites using scaife-viewer-atlas,
-        # but we will likely have an ATLAS specific
-        # database router / ingestion-specific
-        # config in the future anyways
-        "OPTIONS": {"timeout": 5 * 60},
+        "NAME": DATABASE_NAME,
+        "OPTIONS": DATABASE_OPTIONS,
     }
 }
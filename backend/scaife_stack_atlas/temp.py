@@ -1,10 +1,17 @@
+import concurrent.futures
 import csv
+import heapq
 import json
 import logging
 import os
 from collections import defaultdict
+from itertools import islice
 from pathlib import Path
 
+import django
+from django.conf import settings as django_settings
+from django.db import connections
+
 import jsonlines
 import yaml
 
@@ -29,11 +36,15 @@ from scaife_viewer.atlas.models import (
 )
 from scaife_viewer.atlas.urn import URN
 from scaife_viewer.atlas.utils import (
+    CREATE_UPDATE_DELETE_BATCH_SIZE,
+    QUERY_BATCH_SIZE,
     chunked_bulk_create,
     get_lowest_citable_nodes,
     get_textparts_from_passage_reference,
 )
 
+from .models import Asset, TextAnnotationReference
+
 
 logger = logging.getLogger(__name__)
 
@@ -46,189 +57,419 @@ ANNOTATIONS_DATA_PATH = os.path.join(
 def get_paths():
     if not os.path.exists(ANNOTATIONS_DATA_PATH):
         return []
+    # NOTE: Paths are sorted so that alignments are written in the same order
+    # in both serial and parallel modes
     return [
         os.path.join(ANNOTATIONS_DATA_PATH, f)
-        for f in os.listdir(ANNOTATIONS_DATA_PATH)
+        for f in sorted(os.listdir(ANNOTATIONS_DATA_PATH))
         if f.endswith(".json")
     ]
 
 
-def process_file(path):
+TextAlignmentRecordRelationThroughModel = TextAlignmentRecordRelation.tokens.through
+
+
+class TokenResolver:
+    """
+    Resolves token URNs to Token primary keys.
+
+    A `(text_part_urn, ve_ref) -> token_id` lookup is loaded once per version
+    and re-used across alignment files; refs that can't be resolved are
+    collected rather than raising mid-file.
+    """
+
+    def __init__(self):
+        self.lookups = {}
+        self.unresolved = []
+
+    def get_lookup(self, version_urn):
+        lookup = self.lookups.get(version_urn)
+        if lookup is None:
+            logger.info(f"Building token lookup for {version_urn}")
+            tokens = Token.objects.filter(
+                text_part__urn__startswith=version_urn
+            ).values_list("text_part__urn", "ve_ref", "pk")
+            lookup = {
+                (text_part_urn, ve_ref): pk for text_part_urn, ve_ref, pk in tokens
+            }
+            self.lookups[version_urn] = lookup
+        return lookup
+
+    def lookup(self, version_urn, entry):
+        """
+        Returns the token id for `entry`, or None (without recording it as
+        unresolved)
+        """
+        ref = URN(entry).passage
+        # NOTE: this assumes we're always dealing with a tokenized exemplar, which
+        # may not be the case
+        text_part_ref, _ = ref.rsplit(".", maxsplit=1)
+        text_part_urn = f"{version_urn}{text_part_ref}"
+        return self.get_lookup(version_urn).get((text_part_urn, ref))
+
+    def resolve(self, version_urn, entry):
+        token_id = self.lookup(version_urn, entry)
+        if token_id is None:
+            self.unresolved.append(entry)
+        return token_id
+
+    def report(self):
+        if not self.unresolved:
+            return
+        logger.warning(f"Could not resolve {len(self.unresolved)} token reference(s)")
+        for entry in self.unresolved:
+            logger.warning(f'Unresolved token reference [urn="{entry}"]')
+
+
+def prepare_alignment(path, resolver):
+    """
+    Parses an alignment file and resolves its token references into plain
+    values that can be handed off to `write_alignment`.
+    """
     data = json.load(open(path))
 
-    versions = data["versions"]
-    version_objs = []
-    for version in versions:
-        version_objs.append(Node.objects.get(urn=version))
+    metadata = {}
+    if data.get("enable_prototype"):
+        metadata["enable_prototype"] = data["enable_prototype"]
+    if data.get("display_options"):
+        metadata["display_options"] = data["display_options"]
 
-    alignment = TextAlignment(
+    # TODO: review how we might make use of sort key from CEX
+    # TODO: sorting versions from Ducat too, especially since Ducat doesn't have 'em
+    # maybe something for CITE tools?
+    records = []
+    for idx, row in enumerate(data["records"]):
+        relations = []
+        for version_urn, relation in zip(data["versions"], row["relations"]):
+            token_ids = []
+            for entry in relation:
+                token_id = resolver.resolve(version_urn, entry)
+                if token_id is not None and token_id not in token_ids:
+                    token_ids.append(token_id)
+            relations.append((version_urn, token_ids))
+        records.append((idx, row["urn"], row.get("metadata", {}), relations))
+
+    return dict(
         label=data["label"],
         urn=data["urn"],
+        metadata=metadata,
+        versions=data["versions"],
+        records=records,
     )
-    if data.get("enable_prototype"):
-        alignment.metadata["enable_prototype"] = data["enable_prototype"]
-    if data.get("display_options"):
-        alignment.metadata["display_options"] = data["display_options"]
 
+
+def write_alignment(prepared):
+    version_objs = []
+    for version in prepared["versions"]:
+        version_objs.append(Node.objects.get(urn=version))
+    version_ids = {version_obj.urn: version_obj.pk for version_obj in version_objs}
+
+    alignment = TextAlignment(
+        label=prepared["label"],
+        urn=prepared["urn"],
+    )
+    alignment.metadata.update(prepared["metadata"])
     alignment.save()
     alignment.versions.set(version_objs)
 
-    idx = 0
-    # TODO: review how we might make use of sort key from CEX
-    # TODO: sorting versions from Ducat too, especially since Ducat doesn't have 'em
-    # maybe something for CITE tools?
-    for row in data["records"]:
-        record = TextAlignmentRecord(
-            idx=idx,
-            alignment=alignment,
-            urn=row["urn"],
-            metadata=row.get("metadata", {}),
+    records = []
+    token_ids_lookup = {}
+    for idx, urn, metadata, relations in prepared["records"]:
+        records.append(
+            TextAlignmentRecord(
+                idx=idx,
+                alignment=alignment,
+                urn=urn,
+                metadata=metadata,
+            )
         )
-        record.save()
-        idx += 1
-        for version_obj, relation in zip(version_objs, row["relations"]):
-            relation_obj = TextAlignmentRecordRelation(
-                version=version_obj, record=record
+        for version_urn, token_ids in relations:
+            token_ids_lookup[(idx, version_ids[version_urn])] = token_ids
+    chunked_bulk_create(TextAlignmentRecord, records)
+
+    record_ids = dict(alignment.records.values_list("idx", "pk"))
+    relations = []
+    for idx, version_id in token_ids_lookup:
+        relations.append(
+            TextAlignmentRecordRelation(
+                record_id=record_ids[idx], version_id=version_id
             )
-            relation_obj.save()
-            tokens = []
-            # TODO: Can we build up a veref map and validate?
-            for entry in relation:
-                entry_urn = URN(entry)
-                ref = entry_urn.passage
-                # NOTE: this assumes we're always dealing with a tokenized exemplar, which
-                # may not be the case
-                text_part_ref, _ = ref.rsplit(".", maxsplit=1)
-                text_part_urn = f"{version_obj.urn}{text_part_ref}"
-                # TODO: compound Q objects query to minimize round trips
-                tokens.append(
-                    Token.objects.get(text_part__urn=text_part_urn, ve_ref=ref)
-                )
-            relation_obj.tokens.set(tokens)
-
+        )
+    chunked_bulk_create(TextAlignmentRecordRelation, relations)
 
-def process_alignments(reset=False):
+    relation_values = TextAlignmentRecordRelation.objects.filter(
+        record__alignment=alignment
+    ).values_list("record__idx", "version_id", "pk")
+    to_create = []
+    for idx, version_id, relation_id in relation_values:
+        for token_id in token_ids_lookup[(idx, version_id)]:
+            to_create.append(
+                TextAlignmentRecordRelationThroughModel(
+                    textalignmentrecordrelation_id=relation_id, token_id=token_id
+                )
+            )
+    relation_label = TextAlignmentRecordRelationThroughModel._meta.verbose_name_plural
+    logger.info(f"Bulk creating {relation_label}")
+    chunked_bulk_create(TextAlignmentRecordRelationThroughModel, to_create)
+    return alignment
+
+
+def process_file(path, resolver=None):
+    if resolver is None:
+        resolver = TokenResolver()
+    return write_alignment(prepare_alignment(path, resolver))
+
+
+# NOTE: Each worker process keeps its own resolver so that version lookups
+# are re-used across the files it handles
+_worker_resolver = None
+
+
+def _prepare_alignment_in_worker(path):
+    global _worker_resolver
+    if _worker_resolver is None:
+        _worker_resolver = TokenResolver()
+    prepared = prepare_alignment(path, _worker_resolver)
+    unresolved, _worker_resolver.unresolved = _worker_resolver.unresolved, []
+    return prepared, unresolved
+
+
+def iter_prepared_alignments(paths, resolver):
+    """
+    Yields each alignment file in `paths`, parsed and resolved (see
+    `prepare_alignment`), in path order.
+
+    With SV_ATLAS_INGESTION_CONCURRENCY greater than 1, files are prepared
+    across worker processes, so that they are prepared in parallel while the
+    current process (the single SQLite writer) writes those already yielded.
+    """
+    concurrency = settings.SV_ATLAS_INGESTION_CONCURRENCY
+    if not (concurrency and concurrency > 1 and len(paths) > 1):
+        for path in paths:
+            yield prepare_alignment(path, resolver)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=concurrency,
+        initializer=django.setup,
+    ) as executor:
+        # NOTE: avoids locking protocol errors from SQLite
+        connections.close_all()
+        for prepared, unresolved in executor.map(_prepare_alignment_in_worker, paths):
+            resolver.unresolved.extend(unresolved)
+            yield prepared
+
+
+def prepare_alignments():
+    """
+    Parses and resolves every alignment file, without writing to the database;
+    the parse-only phase of `process_alignments` (see
+    `scaife_stack_atlas.ingestion.PIPELINE_STEP_PREPARE`)
+    """
+    resolver = TokenResolver()
+    alignments = list(iter_prepared_alignments(get_paths(), resolver))
+    return dict(alignments=alignments, unresolved=resolver.unresolved)
+
+
+def process_alignments(reset=False, prepared=None):
     if reset:
         TextAlignment.objects.all().delete()
 
-    created_count = 0
-    for path in get_paths():
-        process_file(path)
-        created_count += 1
-    print(f"Alignments created: {created_count}")
+    resolver = TokenResolver()
+    if prepared is None:
+        alignments = iter_prepared_alignments(get_paths(), resolver)
+    else:
+        alignments = prepared["alignments"]
+        resolver.unresolved.extend(prepared["unresolved"])
+    count = 0
+    for alignment in alignments:
+        write_alignment(alignment)
+        count += 1
+    print(f"Alignments created: {count}")
+    resolver.report()
+
+
+def prepare_lsj_entries():
+    """
+    Re-extracts the LSJ entries from SV_ATLAS_LSJ_XML_DIR, if it is set; the
+    parse-only phase of `import_dictionaries` (see
+    `scaife_stack_atlas.ingestion.PIPELINE_STEP_PREPARE`)
+    """
+    if not django_settings.SV_ATLAS_LSJ_XML_DIR:
+        return
+    # NOTE: Imported here, since lxml is only a development requirement
+    from .extractors import extract_lsj
+
+    extract_lsj.main(django_settings.SV_ATLAS_LSJ_XML_DIR)
+
+
+# NOTE: Each annotation is assigned to the last collection it matches, via
+# either a prefix of its URN (`urn_startswith` / `urn_istartswith`) or a source
+# marker (e.g. "vgorman1") within the version of one of its references
+TEXT_ANNOTATION_COLLECTIONS = [
+    dict(
+        urn="urn:cite2:beyond-translation:text_annotation_collection.atlas_v1:il_gregorycrane_gAGDT",
+        label="gregorycrane/gAGDT",
+        source=dict(
+            title="gregorycrane/gAGDT", url="https://github.com/gregorycrane/gAGDT"
+        ),
+        urn_istartswith="urn:cite2:exploreHomer:syntaxTree.v1:syntaxTree-tlg0012-",
+    ),
+    dict(
+        urn="urn:cite2:beyond-translation:text_annotation_collection.atlas_v1:gorman_trees",
+        label="perseids-publications/gorman-trees",
+        source=dict(
+            title="perseids-publications/gorman-trees",
+            url="https://github.com/perseids-publications/gorman-trees",
+        ),
+        reference_source="vgorman1",
+        attribution=dict(
+            person="Vanessa Gorman",
+            organization="University of Nebraska-Lincoln",
+            role="Annotator",
+        ),
+    ),
+    dict(
+        urn="urn:cite2:beyond-translation:text_annotation_collection.atlas_v1:glaux_trees",
+        label="gregorycrane/glaux-trees",
+        source=dict(
+            title="gregorycrane/glaux-trees",
+            url="https://github.com/gregorycrane/glaux-trees",
+        ),
+        urn_startswith="urn:cite2:beyond-translation:syntaxTree.atlas_v1:glaux-",
+        attribution=dict(
+            person="Toon Van Hal", organization="KU Leuven", role="Annotator"
+        ),
+    ),
+]
 
 
-def set_text_annotation_collection(reset=False):
-    # TODO: Reset is a no-op
-    collection_urn = "urn:cite2:beyond-translation:text_annotation_collection.atlas_v1:il_gregorycrane_gAGDT"
-    if reset:
-        TextAnnotation.objects.filter(collection__urn=collection_urn).update(
-            collection=None
-        )
-        TextAnnotationCollection.objects.filter(urn=collection_urn).delete()
+def get_reference_version_urn(urn):
+    return f"{urn.rsplit(':', 1)[0]}:"
 
-    tas = TextAnnotation.objects.filter(
-        urn__istartswith="urn:cite2:exploreHomer:syntaxTree.v1:syntaxTree-tlg0012-"
-    )
-    collection = TextAnnotationCollection.objects.create(
-        label="gregorycrane/gAGDT",
-        data={
-            "source": {
-                "title": "gregorycrane/gAGDT",
-                "url": "https://github.com/gregorycrane/gAGDT",
-            }
-        },
-        urn=collection_urn,
+
+def set_annotations_collection(tas, collection):
+    TextAnnotationReference.objects.filter(text_annotation__in=tas).update(
+        collection=collection
     )
     tas.update(collection=collection)
 
 
-def set_gorman_attributions(reset=False):
-    person, created = AttributionPerson.objects.get_or_create(name="Vanessa Gorman")
-    if not created or reset:
-        # FIXME: Actually create the proper attribution modeling for this
-        # TODO: Alias as records
-        person.attributionrecord_set.all().delete()
+def reset_text_annotation_collections():
+    collection_urns = [c["urn"] for c in TEXT_ANNOTATION_COLLECTIONS]
+    TextAnnotation.objects.filter(collection__urn__in=collection_urns).update(
+        collection=None
+    )
+    TextAnnotationCollection.objects.filter(urn__in=collection_urns).delete()
+    TextAnnotationReference.objects.all().delete()
+    for collection in TEXT_ANNOTATION_COLLECTIONS:
+        attribution = collection.get("attribution")
+        if attribution:
+            AttributionRecord.objects.filter(
+                person__name=attribution["person"]
+            ).delete()
+
+
+def create_attribution_record(attribution, tas):
+    person, _ = AttributionPerson.objects.get_or_create(name=attribution["person"])
     organization, _ = AttributionOrganization.objects.get_or_create(
-        name="University of Nebraska-Lincoln"
+        name=attribution["organization"]
     )
-
-    syntax_trees = TextAnnotation.objects.filter(data__references__icontains="vgorman1")
     AttributionRecord.objects.create(
         person=person,
         organization=organization,
-        role="Annotator",
-        data=dict(references=[list(syntax_trees.values_list("urn"))]),
+        role=attribution["role"],
+        data=dict(references=[list(tas.values_list("urn"))]),
     )
 
 
-def create_gorman_collection(reset=False):
-    collection_urn = (
-        "urn:cite2:beyond-translation:text_annotation_collection.atlas_v1:gorman_trees"
-    )
-    if reset:
-        TextAnnotation.objects.filter(collection__urn=collection_urn).update(
-            collection=None
+def iter_text_annotation_references():
+    last_pk = 0
+    while True:
+        annotation_values = list(
+            TextAnnotation.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", "collection_id", "data__references")[:QUERY_BATCH_SIZE]
         )
-        TextAnnotationCollection.objects.filter(urn=collection_urn).delete()
-
-    tas = TextAnnotation.objects.filter(data__references__icontains="vgorman1")
-    collection = TextAnnotationCollection.objects.create(
-        label="perseids-publications/gorman-trees",
-        data={
-            "source": {
-                "title": "perseids-publications/gorman-trees",
-                "url": "https://github.com/perseids-publications/gorman-trees",
-            }
-        },
-        urn=collection_urn,
-    )
-    tas.update(collection=collection)
-
+        if not annotation_values:
+            return
+        last_pk = annotation_values[-1][0]
+        for ta_id, collection_id, references in annotation_values:
+            for ref in dict.fromkeys(references or []):
+                yield TextAnnotationReference(
+                    text_annotation_id=ta_id,
+                    urn=ref,
+                    version_urn=get_reference_version_urn(ref),
+                    collection_id=collection_id,
+                )
 
-def set_glaux_attributions(reset=False):
-    person, created = AttributionPerson.objects.get_or_create(name="Toon Van Hal")
-    if not created or reset:
-        # FIXME: Actually create the proper attribution modeling for this
-        # TODO: Alias as records
-        person.attributionrecord_set.all().delete()
-    organization, _ = AttributionOrganization.objects.get_or_create(name="KU Leuven")
 
-    syntax_trees = TextAnnotation.objects.filter(
-        urn__startswith="urn:cite2:beyond-translation:syntaxTree.atlas_v1:glaux-"
-    )
-    AttributionRecord.objects.create(
-        person=person,
-        organization=organization,
-        role="Annotator",
-        data=dict(references=[list(syntax_trees.values_list("urn"))]),
+def get_collection_annotations(collection):
+    """
+    Returns the text annotations matched by an entry of
+    TEXT_ANNOTATION_COLLECTIONS
+    """
+    if collection.get("urn_startswith"):
+        return TextAnnotation.objects.filter(
+            urn__startswith=collection["urn_startswith"]
+        )
+    if collection.get("urn_istartswith"):
+        return TextAnnotation.objects.filter(
+            urn__istartswith=collection["urn_istartswith"]
+        )
+    # NOTE: Only the (few) distinct versions are searched for the source
+    # marker; annotations are then found via the reference index
+    reference_source = collection["reference_source"].lower()
+    version_urns = [
+        version_urn
+        for version_urn in TextAnnotationReference.objects.order_by()
+        .values_list("version_urn", flat=True)
+        .distinct()
+        if reference_source in version_urn.lower()
+    ]
+    return TextAnnotation.objects.filter(
+        pk__in=TextAnnotationReference.objects.filter(
+            version_urn__in=version_urns
+        ).values("text_annotation")
     )
 
 
-def create_glaux_collection(reset=False):
-    collection_urn = (
-        "urn:cite2:beyond-translation:text_annotation_collection.atlas_v1:glaux_trees"
-    )
+def index_text_annotations(reset=True):
+    """
+    Builds the reference index, then assigns text annotations to the
+    collections in TEXT_ANNOTATION_COLLECTIONS (creating their attribution
+    records)
+    """
     if reset:
-        TextAnnotation.objects.filter(collection__urn=collection_urn).update(
-            collection=None
-        )
-        TextAnnotationCollection.objects.filter(urn=collection_urn).delete()
+        reset_text_annotation_collections()
 
-    tas = TextAnnotation.objects.filter(
-        urn__startswith="urn:cite2:beyond-translation:syntaxTree.atlas_v1:glaux-"
-    )
-    collection = TextAnnotationCollection.objects.create(
-        label="gregorycrane/glaux-trees",
-        data={
-            "source": {
-                "title": "gregorycrane/glaux-trees",
-                "url": "https://github.com/gregorycrane/glaux-trees",
-            }
-        },
-        urn=collection_urn,
+    # NOTE: References are written in batches as the annotations are read
+    chunked_bulk_create(TextAnnotationReference, iter_text_annotation_references())
+    print(
+        f"Text annotation references indexed: {TextAnnotationReference.objects.count()}"
     )
-    tas.update(collection=collection)
+
+    collection_ids = []
+    for collection in TEXT_ANNOTATION_COLLECTIONS:
+        collection_obj = TextAnnotationCollection.objects.create(
+            label=collection["label"],
+            data=dict(source=collection["source"]),
+            urn=collection["urn"],
+        )
+        collection_ids.append(collection_obj.pk)
+        # NOTE: Later collections take precedence, as when each collection was
+        # assigned by its own pipeline step
+        tas = get_collection_annotations(collection)
+        count = tas.update(collection=collection_obj)
+        attribution = collection.get("attribution")
+        if attribution:
+            create_attribution_record(attribution, tas)
+        print(f"{collection['label']}: {count} annotations")
+
+    for collection_id in collection_ids:
+        TextAnnotationReference.objects.filter(
+            text_annotation__collection_id=collection_id
+        ).update(collection_id=collection_id)
 
 
 # TODO: English too?
@@ -241,192 +482,254 @@ def create_persian_greek_alignment(reset=True):
     path = Path(
         "data/annotations/text-alignments/iliad-greek-farsi-sentence-alignment.json"
     )
-    process_file(path)
-    ta = TextAlignment.objects.get(urn=alignment_urn)
+    prepared = prepare_alignment(path, TokenResolver())
 
     logger.info(f"Extracting tokens for {alignment_urn}")
     # NOTE: This assumes a whole lot of processing; eventually we want to make this a bit smarter
     record_lookup = defaultdict(list)
-    versions = list(ta.versions.all())
-    for version in versions:
+    for version in Node.objects.filter(urn__in=prepared["versions"]):
         text_parts = get_lowest_citable_nodes(version)
-        for idx, text_part in enumerate(text_parts):
-            record_lookup[idx].append(text_part.tokens.all().only("id"))
+        text_part_idxs = {
+            text_part_id: idx
+            for idx, text_part_id in enumerate(text_parts.values_list("pk", flat=True))
+        }
+        token_ids_by_text_part = {text_part_id: [] for text_part_id in text_part_idxs}
+        token_values = (
+            Token.objects.filter(text_part__in=text_parts)
+            .order_by("idx")
+            .values_list("text_part_id", "pk")
+        )
+        for text_part_id, token_id in token_values:
+            token_ids_by_text_part[text_part_id].append(token_id)
+        for text_part_id, idx in text_part_idxs.items():
+            record_lookup[idx].append(
+                (version.urn, token_ids_by_text_part[text_part_id])
+            )
 
     logger.info(f"Creating records for {alignment_urn}")
     base_record_urn = "urn:cite2:scaife-viewer:alignment-record.v1:iliad-greek-farsi-sentence-alignment"
-    for idx, row in record_lookup.items():
-        record = TextAlignmentRecord(
-            idx=idx,
-            alignment=ta,
-            urn=f"{base_record_urn}_{idx}",
+    for idx in sorted(record_lookup):
+        relations = sorted(
+            record_lookup[idx], key=lambda x: prepared["versions"].index(x[0])
         )
-        record.save()
-        for version_obj, tokens in zip(versions, row):
-            relation_obj = TextAlignmentRecordRelation(
-                version=version_obj, record=record
-            )
-            relation_obj.save()
-            relation_obj.tokens.set(tokens)
+        prepared["records"].append((idx, f"{base_record_urn}_{idx}", {}, relations))
+    write_alignment(prepared)
 
 
-def add_iliad_english_persian_translations():
-    collection_urn = "urn:cite2:beyond-translation:text_annotation_collection.atlas_v1:il_gregorycrane_gAGDT"
-    limit = 492
-    # TODO: Figure out why this query doesn't work as expected against
-    # text_parts__urn relation
-    trees = list(
-        TextAnnotation.objects.filter(
-            collection__urn=collection_urn,
-            urn__startswith="urn:cite2:exploreHomer:syntaxTree.v1:syntaxTree-tlg0012-tlg001-"
-            # text_parts__urn__startswith="urn:cts:greekLit:tlg0012.tlg001.perseus-grc2:"
-        ).order_by("idx")[0:limit]
-    )
+GAGDT_COLLECTION_URN = "urn:cite2:beyond-translation:text_annotation_collection.atlas_v1:il_gregorycrane_gAGDT"
+ILIAD_TREE_URN_PREFIX = (
+    "urn:cite2:exploreHomer:syntaxTree.v1:syntaxTree-tlg0012-tlg001-"
+)
+ODYSSEY_TREE_URN_PREFIX = (
+    "urn:cite2:exploreHomer:syntaxTree.v1:syntaxTree-tlg0012-tlg002-"
+)
 
-    persian_text = list(
-        get_textparts_from_passage_reference(
-            "urn:cts:greekLit:tlg0012.tlg001.shamsian-far1:1.s1-1.s492",
-            Node.objects.get(urn="urn:cts:greekLit:tlg0012.tlg001.shamsian-far1:"),
-        )
-    )
-    english_text = list(
-        get_textparts_from_passage_reference(
-            "urn:cts:greekLit:tlg0012.tlg001.parrish-eng1-sentences:1.s1-1.s492",
-            Node.objects.get(
-                urn="urn:cts:greekLit:tlg0012.tlg001.parrish-eng1-sentences:"
-            ),
+
+def get_sentence_texts(passage_reference, version_urn):
+    version = Node.objects.get(urn=version_urn)
+    return list(
+        get_textparts_from_passage_reference(passage_reference, version).values_list(
+            "text_content", flat=True
         )
     )
 
-    assert len(trees) == len(persian_text) == len(english_text)
-    to_update = []
-    for tree, persian, english in zip(trees, persian_text, english_text):
-        tree.data["translations"] = [
-            [english.text_content, "eng"],
-            [persian.text_content, "far"],
-        ]
-        to_update.append(tree)
-        TextAnnotation.objects.bulk_update(to_update, fields=["data"], batch_size=500)
 
+def get_alignment_sentences(alignment_urn):
+    """
+    Returns the English sentence of each record in a sentence alignment, keyed
+    by treebank id.
 
-def add_odyssey_english_translations():
-    # TODO: Load Odyssey 5 from Parrish
-    collection_urn = "urn:cite2:beyond-translation:text_annotation_collection.atlas_v1:il_gregorycrane_gAGDT"
-    trees = TextAnnotation.objects.filter(
-        collection__urn=collection_urn,
-        urn__startswith="urn:cite2:exploreHomer:syntaxTree.v1:syntaxTree-tlg0012-tlg002-",
-    )
-    od_sentence_alignment = TextAlignment.objects.get(
-        urn="urn:cite2:scaife-viewer:alignment.v1:odyssey-sentence-alignment-crane"
-    )
-    english_by_treebank_id = {}
-    for record in od_sentence_alignment.records.all():
-        sentence = record.metadata["items"][1][0][1]
-        treebank_id = record.metadata["treebank_id"]
-        english_by_treebank_id[treebank_id] = sentence
+    Only the two values needed are extracted from the record metadata.
+    """
+    values = TextAlignmentRecord.objects.filter(
+        alignment__urn=alignment_urn
+    ).values_list("metadata__treebank_id", "metadata__items__1__0")
+    # NOTE: JSON_EXTRACT unquotes scalar values, so treebank ids are compared
+    # as strings
+    return {str(treebank_id): item[1] for treebank_id, item in values}
 
-    to_update = []
-    for tree in trees:
-        treebank_id = tree.data["treebank_id"]
-        english = english_by_treebank_id.get(treebank_id, "")
-        tree.data["translations"] = [[english, "eng"]]
-        to_update.append(tree)
-
-    TextAnnotation.objects.bulk_update(to_update, fields=["data"], batch_size=500)
 
+def iter_translated_trees():
+    """
+    Streams the gAGDT Homer trees, attaching translations:
 
-def add_additional_iliad_translations():
-    collection_urn = "urn:cite2:beyond-translation:text_annotation_collection.atlas_v1:il_gregorycrane_gAGDT"
-    limit = 492
+    - the first 492 Iliad trees get the Parrish English and Shamsian Persian
+      sentences, in order
+    - the remaining Iliad trees and the Odyssey trees get the English
+      sentence from the matching Crane sentence alignment
+    """
     # TODO: Figure out why this query doesn't work as expected against
     # text_parts__urn relation
-    trees = TextAnnotation.objects.filter(
-        collection__urn=collection_urn,
-        urn__startswith="urn:cite2:exploreHomer:syntaxTree.v1:syntaxTree-tlg0012-tlg001-",
-    ).order_by("idx")[limit:]
-
-    il_sentence_alignment = TextAlignment.objects.get(
-        urn="urn:cite2:scaife-viewer:alignment.v1:iliad-sentence-alignment-crane"
+    english_text = get_sentence_texts(
+        "urn:cts:greekLit:tlg0012.tlg001.parrish-eng1-sentences:1.s1-1.s492",
+        "urn:cts:greekLit:tlg0012.tlg001.parrish-eng1-sentences:",
+    )
+    persian_text = get_sentence_texts(
+        "urn:cts:greekLit:tlg0012.tlg001.shamsian-far1:1.s1-1.s492",
+        "urn:cts:greekLit:tlg0012.tlg001.shamsian-far1:",
+    )
+    assert len(english_text) == len(persian_text)
+    english_persian = list(zip(english_text, persian_text))
+    iliad_english = get_alignment_sentences(
+        "urn:cite2:scaife-viewer:alignment.v1:iliad-sentence-alignment-crane"
+    )
+    # TODO: Load Odyssey 5 from Parrish
+    odyssey_english = get_alignment_sentences(
+        "urn:cite2:scaife-viewer:alignment.v1:odyssey-sentence-alignment-crane"
     )
-    english_by_treebank_id = {}
-    for record in il_sentence_alignment.records.all():
-        sentence = record.metadata["items"][1][0][1]
-        treebank_id = record.metadata["treebank_id"]
-        english_by_treebank_id[treebank_id] = sentence
-
-    to_update = []
-    for tree in trees:
-        treebank_id = tree.data["treebank_id"]
-        english = english_by_treebank_id.get(treebank_id, "")
-        tree.data["translations"] = [[english, "eng"]]
-        to_update.append(tree)
 
-    TextAnnotation.objects.bulk_update(to_update, fields=["data"], batch_size=500)
+    trees = TextAnnotation.objects.filter(collection__urn=GAGDT_COLLECTION_URN)
+    iliad_idx = 0
+    for tree in trees.order_by("idx").iterator(chunk_size=500):
+        treebank_id = str(tree.data.get("treebank_id"))
+        if tree.urn.startswith(ILIAD_TREE_URN_PREFIX):
+            if iliad_idx < len(english_persian):
+                english, persian = english_persian[iliad_idx]
+                translations = [[english, "eng"], [persian, "far"]]
+            else:
+                translations = [[iliad_english.get(treebank_id, ""), "eng"]]
+            iliad_idx += 1
+        elif tree.urn.startswith(ODYSSEY_TREE_URN_PREFIX):
+            translations = [[odyssey_english.get(treebank_id, ""), "eng"]]
+        else:
+            continue
+        tree.data["translations"] = translations
+        yield tree
+
+    # NOTE: Every English / Persian sentence must have been paired with a tree
+    assert iliad_idx >= len(english_persian)
+
+
+def chunked_bulk_update_with_count(
+    model, iterable, fields, batch_size=CREATE_UPDATE_DELETE_BATCH_SIZE
+):
+    """
+    Lazily bulk updates `iterable` in chunks, returning the number of rows
+    written.
+    """
+    written = 0
+    generator = iter(iterable)
+    while True:
+        subset = list(islice(generator, batch_size))
+        if not subset:
+            break
+        model.objects.bulk_update(subset, fields=fields, batch_size=batch_size)
+        written += len(subset)
+    return written
 
 
 def add_translations_to_trees(reset=None):
     # NOTE: Reset is a no-op
-    add_iliad_english_persian_translations()
-    add_additional_iliad_translations()
+    written = chunked_bulk_update_with_count(
+        TextAnnotation, iter_translated_trees(), fields=["data"]
+    )
+    print(f"Trees updated with translations: {written}")
 
-    add_odyssey_english_translations()
 
+TextAnnotationThroughModel = TextAnnotation.text_parts.through
 
-def add_glosses_to_trees(reset=None, debug=False):
-    # NOTE: Reset is a no-op
-    collection_urn = "urn:cite2:beyond-translation:text_annotation_collection.atlas_v1:il_gregorycrane_gAGDT"
-    # TODO: Figure out why this query doesn't work as expected against
-    # text_parts__urn relation
-    trees = TextAnnotation.objects.filter(
-        collection__urn=collection_urn,
-    ).order_by("idx")
+
+class GlossIndex:
+    """
+    Token annotation lookups for the text parts referenced by a set of trees.
+
+    Annotations are fetched with a single query and grouped by text part; each
+    tree then gets dicts keyed by lemma and by word value, which preserve the
+    "first annotation wins" behavior of a linear scan.
+    """
+
+    def __init__(self, trees):
+        self.text_part_ids = defaultdict(list)
+        through_values = TextAnnotationThroughModel.objects.filter(
+            textannotation__in=trees
+        ).values_list("textannotation_id", "node_id")
+        for tree_id, node_id in through_values:
+            self.text_part_ids[tree_id].append(node_id)
+
+        self.annotations = defaultdict(list)
+        annotations = (
+            TokenAnnotation.objects.filter(
+                token__text_part_id__in=TextAnnotationThroughModel.objects.filter(
+                    textannotation__in=trees
+                ).values("node_id")
+            )
+            .order_by("pk")
+            .values_list("pk", "token__text_part_id", "data")
+        )
+        for pk, text_part_id, data in annotations:
+            self.annotations[text_part_id].append((pk, data))
+
+    def get_tree_lookups(self, tree):
+        by_lemma = {}
+        by_word_value = {}
+        text_part_annotations = [
+            self.annotations[text_part_id]
+            for text_part_id in self.text_part_ids[tree.pk]
+        ]
+        for _, data in heapq.merge(*text_part_annotations, key=lambda x: x[0]):
+            by_lemma.setdefault(data.get("lemma"), data)
+            by_word_value.setdefault(data.get("word_value"), data)
+        return by_lemma, by_word_value
+
+
+def add_glosses_from_token_annotations(trees, gloss_fields, debug=False):
+    """
+    Copies glosses from token annotations onto the words of each tree.
+
+    `gloss_fields` maps word keys (e.g. "glossEng") to token annotation keys
+    (e.g. "gloss (eng)").
+    """
+    trees = trees.distinct()
+    gloss_index = GlossIndex(trees)
 
     to_update = []
+    unmapped_count = 0
     for tree in trees:
-        annotations = list(
-            TokenAnnotation.objects.filter(token__text_part__in=tree.text_parts.all())
-        )
+        by_lemma, by_word_value = gloss_index.get_tree_lookups(tree)
         words = tree.data["words"]
         for word in words:
-            annotation = next(
-                iter(filter(lambda x: x.data["lemma"] == word["lemma"], annotations)),
-                None,
-            )
-            if not annotation:
-                annotation = next(
-                    iter(
-                        filter(
-                            lambda x: x.data["word_value"] == word["value"], annotations
-                        )
-                    ),
-                    None,
-                )
-                if not annotation:
+            data = by_lemma.get(word["lemma"])
+            if data is None:
+                data = by_word_value.get(word["value"])
+                if data is None:
                     if word.get("tag") == "u--------":
                         pass
                     elif word.get("value") in ["[0]", "[1]"]:
                         pass
                     elif word.get("ref"):
+                        unmapped_count += 1
                         if debug:
                             print(f'{word["ref"]}@{word["value"]}')
                     else:
+                        unmapped_count += 1
                         if debug:
                             print(f'{word["value"]}')
-                    # ~40 words unmapped with this naive pass
-            data = annotation.data if annotation else {}
+            data = data or {}
             word.update(
-                {
-                    "glossEng": data.get("gloss (eng)", ""),
-                    # TODO: Revisit Farnoosh's glosses for Od.
-                    "glossFas": data.get("gloss (fas)", ""),
-                }
+                {key: data.get(field, "") for key, field in gloss_fields.items()}
             )
         to_update.append(tree)
 
     TextAnnotation.objects.bulk_update(to_update, fields=["data"], batch_size=500)
+    print(f"Words unmapped: {unmapped_count}")
+
+
+def add_glosses_to_trees(reset=None, debug=False):
+    # NOTE: Reset is a no-op
+    collection_urn = "urn:cite2:beyond-translation:text_annotation_collection.atlas_v1:il_gregorycrane_gAGDT"
+    # TODO: Figure out why this query doesn't work as expected against
+    # text_parts__urn relation
+    trees = TextAnnotation.objects.filter(
+        collection__urn=collection_urn,
+    ).order_by("idx")
+    gloss_fields = {
+        "glossEng": "gloss (eng)",
+        # TODO: Revisit Farnoosh's glosses for Od.
+        "glossFas": "gloss (fas)",
+    }
+    add_glosses_from_token_annotations(trees, gloss_fields, debug=debug)
 
 
-# FIXME: Refactor with add_glosses_to_trees
 def add_anabasis_glosses_to_trees(reset=None, debug=False):
     # NOTE: Reset is a no-op
     text_annotation_collection_urn = (
@@ -441,49 +744,14 @@ def add_anabasis_glosses_to_trees(reset=None, debug=False):
     # TODO: Why is this subselect so slow?
     trees = collection.annotations.filter(
         text_parts__in=text_parts.values_list("id", flat=True)
-    )
+    ).order_by("idx")
+    gloss_fields = {
+        "glossEng": "gloss (eng)",
+    }
+    add_glosses_from_token_annotations(trees, gloss_fields, debug=debug)
 
-    to_update = []
-    for tree in trees:
-        annotations = list(
-            TokenAnnotation.objects.filter(token__text_part__in=tree.text_parts.all())
-        )
-        words = tree.data["words"]
-        for word in words:
-            annotation = next(
-                iter(filter(lambda x: x.data["lemma"] == word["lemma"], annotations)),
-                None,
-            )
-            if not annotation:
-                annotation = next(
-                    iter(
-                        filter(
-                            lambda x: x.data["word_value"] == word["value"], annotations
-                        )
-                    ),
-                    None,
-                )
-                if not annotation:
-                    if word.get("tag") == "u--------":
-                        pass
-                    elif word.get("value") in ["[0]", "[1]"]:
-                        pass
-                    elif word.get("ref"):
-                        if debug:
-                            print(f'{word["ref"]}@{word["value"]}')
-                    else:
-                        if debug:
-                            print(f'{word["value"]}')
-                    # ~40 words unmapped with this naive pass
-            data = annotation.data if annotation else {}
-            word.update(
-                {
-                    "glossEng": data.get("gloss (eng)", ""),
-                }
-            )
-        to_update.append(tree)
 
-    TextAnnotation.objects.bulk_update(to_update, fields=["data"], batch_size=500)
+DIDAKTA_DEFAULT_VERSIONS = ["urn:cts:greekLit:tlg0012.tlg001.perseus-grc2:"]
 
 
 def import_grammatical_entries(reset=None):
@@ -522,33 +790,48 @@ def import_grammatical_entries(reset=None):
     GrammaticalEntry.objects.bulk_create(to_create)
 
     # Load token annotations
-    entry_lookup = {}
-    for entry in GrammaticalEntry.objects.all():
-        entry_lookup[entry.label] = entry
+    entry_lookup = dict(collection.entries.values_list("label", "pk"))
 
-    # FIXME: Improve bulk loading of tokens
+    # NOTE: Tokens are bound against each version listed in metadata.yml, unless
+    # a row in tokens.csv specifies its own `version`
+    version_urns = collection_data.get("versions", DIDAKTA_DEFAULT_VERSIONS)
     # FIXME: Prefer subref over ve_ref
-    tokens_lookup = defaultdict(list)
+    resolver = TokenResolver()
+    token_ids_lookup = defaultdict(dict)
     csv_path = DIDAKTA_ROOT / "tokens.csv"
     reader = csv.DictReader(csv_path.open())
     for row in reader:
-        tags = row["tags"].split(";")
-        for tag in tags:
-            entry = entry_lookup.get(tag)
-            if entry:
-                tokens_lookup[entry].append(row["ve_ref"])
-
-    # FIXME: Support more than just Iliad
-    tokens = Token.objects.filter(
-        text_part__urn__startswith="urn:cts:greekLit:tlg0012.tlg001.perseus-grc2:"
-    )
-    to_update = []
-    for entry, token_ve_refs in tokens_lookup.items():
-        tokens_qs = tokens.filter(ve_ref__in=token_ve_refs)
-        to_update.append((entry, tokens_qs))
-
-    for entry, tokens_qs in to_update:
-        entry.tokens.set(tokens_qs)
+        entry_ids = [
+            entry_lookup[tag] for tag in row["tags"].split(";") if tag in entry_lookup
+        ]
+        if not entry_ids:
+            continue
+        row_version_urns = [row["version"]] if row.get("version") else version_urns
+        token_ids = []
+        for version_urn in row_version_urns:
+            token_id = resolver.lookup(version_urn, f"{version_urn}{row['ve_ref']}")
+            if token_id is not None:
+                token_ids.append(token_id)
+        # NOTE: A row is only reported if it resolves in none of its versions
+        if not token_ids:
+            resolver.unresolved.append(f"{row_version_urns[0]}{row['ve_ref']}")
+            continue
+        for entry_id in entry_ids:
+            for token_id in token_ids:
+                token_ids_lookup[entry_id].setdefault(token_id, None)
+    resolver.report()
+
+    GrammaticalEntryThroughTokensModel = GrammaticalEntry.tokens.through
+    prepared_objs = [
+        GrammaticalEntryThroughTokensModel(
+            grammaticalentry_id=entry_id, token_id=token_id
+        )
+        for entry_id, token_ids in token_ids_lookup.items()
+        for token_id in token_ids
+    ]
+    relation_label = GrammaticalEntryThroughTokensModel._meta.verbose_name_plural
+    logger.info(f"Bulk creating {relation_label}")
+    chunked_bulk_create(GrammaticalEntryThroughTokensModel, prepared_objs)
 
 
 def stub_scholia_roi_to_token(reset=True):
@@ -608,6 +891,9 @@ def stub_scholia_roi_text_annotations(reset=True):
         "urn:cite2:beyond-translation:text_annotation_collection.atlas_v1:hmt_scholia"
     )
     if reset:
+        ImageROI.objects.filter(
+            text_annotations__collection__urn=collection_urn
+        ).delete()
         TextAnnotation.objects.filter(collection__urn=collection_urn).update(
             collection=None
         )
@@ -627,47 +913,77 @@ def stub_scholia_roi_text_annotations(reset=True):
         },
         urn=collection_urn,
     )
-    tas.update(collection=collection)
+    set_annotations_collection(tas, collection)
 
-    image_annotations = ImageAnnotation.objects.filter(
-        text_parts__in=version_obj.get_descendants()
+    text_parts_by_annotation = defaultdict(list)
+    through_values = (
+        TextAnnotationThroughModel.objects.filter(textannotation__in=tas)
+        .order_by("textannotation_id", "sort_value")
+        .values_list("textannotation_id", "node_id")
     )
+    for ta_id, text_part_id in through_values.iterator():
+        text_parts_by_annotation[ta_id].append(text_part_id)
+
+    image_annotations = {}
     image_annotations_by_urn = {}
-    for ia in image_annotations:
-        image_annotations_by_urn[ia.urn] = ia
+    ia_values = ImageAnnotation.objects.filter(
+        text_parts__in=version_obj.get_descendants()
+    ).values_list("pk", "urn", "image_identifier")
+    for ia_id, ia_urn, image_identifier in ia_values:
+        image_annotations[ia_id] = image_identifier
+        image_annotations_by_urn[ia_urn] = ia_id
+
+    dse_values = []
+    unmapped_text_part_ids = set()
+    for ta_id, data in tas.values_list("pk", "data").distinct():
+        dse_data = data["dse"]
+        image_annotation_urn, coordinates = dse_data["image_roi"].split("@")
+        if image_annotation_urn not in image_annotations_by_urn:
+            # NOTE: Some ROIs reference images that are not bound to the folio
+            # text parts (e.g. VA083RN-0255), so fall back to the image
+            # annotation for the first text part of the scholion
+            unmapped_text_part_ids.add(text_parts_by_annotation[ta_id][0])
+        dse_values.append((ta_id, image_annotation_urn, coordinates, dse_data["urn"]))
+
+    image_annotation_ids_by_text_part = defaultdict(set)
+    fallback_values = ImageAnnotation.text_parts.through.objects.filter(
+        node_id__in=unmapped_text_part_ids
+    ).values_list("node_id", "imageannotation_id")
+    for text_part_id, ia_id in fallback_values:
+        image_annotation_ids_by_text_part[text_part_id].add(ia_id)
+    missing_ia_ids = set().union(*image_annotation_ids_by_text_part.values())
+    image_annotations.update(
+        ImageAnnotation.objects.filter(
+            pk__in=missing_ia_ids.difference(image_annotations)
+        ).values_list("pk", "image_identifier")
+    )
 
     rois_to_create = {}
     thru_text_annotations_lu = defaultdict(set)
     thru_text_parts_lu = defaultdict(set)
-    for ta in tas:
-        dse_data = ta.data["dse"]
-        image_annotation_urn, coordinates = dse_data["image_roi"].split("@")
-
+    for ta_id, image_annotation_urn, coordinates, dse_urn in dse_values:
         try:
-            ia = image_annotations_by_urn[image_annotation_urn]
+            ia_id = image_annotations_by_urn[image_annotation_urn]
         except KeyError:
-            ia = ImageAnnotation.objects.filter(text_parts=ta.text_parts.first()).get()
-            image_annotations_by_urn[image_annotation_urn] = ia
-            # https://image.library.jhu.edu/iiif/homer%2FVA%2FVA083RN-0255/info.json exists
-            # https://image.library.jhu.edu/iiif/homer%2FVA%2FVA083RN-0255/full/1500,1500/0/default.jpg
-            # https://image.library.jhu.edu/iiif/homer%2FVA%2FVA083RN-0084/full/1500,1500/0/default.jpg
-            # break
-            # print(image_annotation_urn)
-            # continue
-        image_identifier = ia.image_identifier
-        dse_urn = dse_data["urn"]
+            ia_ids = image_annotation_ids_by_text_part[
+                text_parts_by_annotation[ta_id][0]
+            ]
+            if not ia_ids:
+                raise ImageAnnotation.DoesNotExist(image_annotation_urn)
+            if len(ia_ids) > 1:
+                raise ImageAnnotation.MultipleObjectsReturned(image_annotation_urn)
+            (ia_id,) = ia_ids
+            image_annotations_by_urn[image_annotation_urn] = ia_id
         roi = ImageROI(
-            image_annotation=ia,
-            image_identifier=image_identifier,
+            image_annotation_id=ia_id,
+            image_identifier=image_annotations[ia_id],
             coordinates_value=coordinates,
             urn=dse_urn,
         )
 
         rois_to_create.setdefault(dse_urn, roi)
-        thru_text_annotations_lu[dse_urn].add(ta.id)
-        thru_text_parts_lu[dse_urn].update(
-            ta.text_parts.all().values_list("id", flat=True)
-        )
+        thru_text_annotations_lu[dse_urn].add(ta_id)
+        thru_text_parts_lu[dse_urn].update(text_parts_by_annotation[ta_id])
 
     ImageROI.objects.bulk_create(rois_to_create.values(), batch_size=500)
     qs = ImageROI.objects.filter(urn__in=rois_to_create.keys())
@@ -695,6 +1011,53 @@ def stub_scholia_roi_text_annotations(reset=True):
     chunked_bulk_create(ImageROIThroughTextAnnotationsModel, prepared_objs)
 
 
+ASSET_CONTENT_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".scss": "text/x-scss; charset=utf-8",
+    ".xml": "application/xml; charset=utf-8",
+}
+
+
+def store_asset(path):
+    """
+    Stores the file at `path` in the content-addressed Asset table
+    """
+    return Asset.objects.store(path.read_text(), ASSET_CONTENT_TYPES[path.suffix])
+
+
+def get_asset_fields(**paths):
+    """
+    Returns the contents of each file in `paths`, keyed by name (e.g. `css`)
+
+    With SV_ATLAS_ASSETS_ENABLED, each file is stored as an Asset instead, and
+    its URL is keyed by `<name>_url` (e.g. `css_url`).
+    """
+    # NOTE: Off by default, since the frontend (@scaife-viewer/frontend ^0.6)
+    # still reads the embedded fields
+    if not django_settings.SV_ATLAS_ASSETS_ENABLED:
+        return {name: path.read_text() for name, path in paths.items()}
+    return {f"{name}_url": store_asset(path).url for name, path in paths.items()}
+
+
+def delete_unreferenced_assets():
+    """
+    Deletes the assets no longer referenced by a content node or dictionary
+    """
+    referenced = set()
+    for metadata in Node.objects.filter(kind="content").values_list(
+        "metadata", flat=True
+    ):
+        referenced.update([metadata.get("content_url"), metadata.get("css_url")])
+    for data in Dictionary.objects.values_list("data", flat=True):
+        referenced.add(data.get("css_url"))
+    unreferenced = [
+        asset.pk
+        for asset in Asset.objects.only("pk", "sha256")
+        if asset.url not in referenced
+    ]
+    Asset.objects.filter(pk__in=unreferenced).delete()
+
+
 def ingest_balex_extras(reset=True):
     # TODO: Update scaife-viewer-atlas package to support this use case;
     # we should resolve the XML from within a hint provided by metadata.json
@@ -765,6 +1128,12 @@ def ingest_balex_extras(reset=True):
             },
         ),
     ]
+    if reset:
+        for edition_node in Node.objects.filter(
+            urn__in=[edition["urn"] for _, edition in editions]
+        ):
+            edition_node.delete()
+
     work_urn = URN("urn:cts:latinLit:phi0428.phi001:")
     work_node = Node.objects.get(urn=work_urn)
     version = (
@@ -799,7 +1168,6 @@ def ingest_balex_extras(reset=True):
         )
         # TODO: Vendor assets within library?
         css_path = Path("data/raw/balex/balex-styles.scss")
-        content = xml_path.read_text()
         textpart_kwargs = dict(
             kind="content",
             urn=f"{edition['urn']}all",
@@ -808,10 +1176,13 @@ def ingest_balex_extras(reset=True):
             # @@@ idx vs path for ranged queries; could derive IDX
             # from path as well
             idx=0,
-            metadata=dict(content=content, css=css_path.read_text()),
+            metadata=get_asset_fields(content=xml_path, css=css_path),
         )
         edition_node.add_child(**textpart_kwargs)
 
+    if reset and django_settings.SV_ATLAS_ASSETS_ENABLED:
+        delete_unreferenced_assets()
+
 
 def update_balex_metadata(reset=True):
     balex_work_obj = Node.objects.get(urn="urn:cts:latinLit:phi0428.phi001:")
@@ -833,20 +1204,28 @@ def update_balex_metadata(reset=True):
     Node.objects.bulk_update(to_update, fields=["metadata"])
 
 
+def set_dictionary_css(dictionary, css_path, reset=True):
+    for key in ["css", "css_url"]:
+        dictionary.data.pop(key, None)
+    dictionary.data.update(get_asset_fields(css=css_path))
+    dictionary.save()
+    if reset and django_settings.SV_ATLAS_ASSETS_ENABLED:
+        delete_unreferenced_assets()
+
+
 def add_cgl_css(reset=True):
-    # NOTE: Reset is a no-op
     cgl = Dictionary.objects.get(
         urn="urn:cite2:scaife-viewer:dictionaries.v1:cambridge-greek-lexicon"
     )
-    cgl.data["css"] = Path("data/raw/cambridge/lexicon.css").read_text()
-    cgl.save()
+    set_dictionary_css(cgl, Path("data/raw/cambridge/lexicon.css"), reset=reset)
 
 
 def add_lexicon_thucydideum_css(reset=True):
     lexicon_thucydideum = Dictionary.objects.get(
         urn="urn:cite2:scaife-viewer:dictionaries.v1:lexicon-thucydideum"
     )
-    lexicon_thucydideum.data["css"] = Path(
-        "data/raw/lexicon-thucydideum/style.css"
-    ).read_text()
-    lexicon_thucydideum.save()
+    set_dictionary_css(
+        lexicon_thucydideum,
+        Path("data/raw/lexicon-thucydideum/style.css"),
+        reset=reset,
+    )
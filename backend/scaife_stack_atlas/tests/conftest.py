@@ -0,0 +1,93 @@
+from collections import Counter
+
+from django.core.cache import caches
+
+import pytest
+
+from scaife_stack_atlas.api import persisted
+from scaife_stack_atlas.atlas_db import get_database_md5, write_md5_sidecar
+from scaife_viewer.atlas.constants import TEXT_ANNOTATION_KIND_SYNTAX_TREE
+from scaife_viewer.atlas.models import (
+    Node,
+    TextAlignment,
+    TextAlignmentRecord,
+    TextAlignmentRecordRelation,
+    TextAnnotation,
+    TextAnnotationCollection,
+    Token,
+    TokenAnnotation,
+    TokenAnnotationCollection,
+)
+
+from . import constants
+
+
+@pytest.fixture
+def atlas_db_path(settings, tmp_path):
+    """
+    Points SV_ATLAS_DB_PATH at a stand-in database file (with an md5 sidecar)
+    """
+    database_path = tmp_path / "db.sqlite"
+    database_path.write_bytes(b"atlas")
+    write_md5_sidecar(database_path, constants.DATABASE_MD5)
+    settings.SV_ATLAS_DB_PATH = str(database_path)
+    get_database_md5.cache_clear()
+    yield database_path
+    get_database_md5.cache_clear()
+
+
+@pytest.fixture
+def graphql_cache(settings, atlas_db_path):
+    settings.SV_ATLAS_GRAPHQL_CACHE_ENABLED = True
+    caches[settings.SV_ATLAS_GRAPHQL_CACHE_ALIAS].clear()
+    persisted.get_persisted_queries.cache_clear()
+    yield
+    persisted.get_persisted_queries.cache_clear()
+
+
+@pytest.fixture
+def version(db):
+    """
+    A tokenized version, along with token annotations, a syntax tree per line
+    and an alignment record per line
+    """
+    Node.load_bulk(constants.LIBRARY_DATA)
+    version = Node.objects.get(urn=constants.VERSION_URN)
+    lines = list(Node.objects.filter(kind="line").order_by("path"))
+
+    counters = Counter()
+    for line in lines:
+        Token.objects.bulk_create(Token.tokenize(line, counters))
+    tokens = list(Token.objects.order_by("idx"))
+    collection = TokenAnnotationCollection.objects.create(
+        urn=constants.TOKEN_ANNOTATION_COLLECTION_URN, label="Lemmas"
+    )
+    TokenAnnotation.objects.bulk_create(
+        TokenAnnotation(token=token, collection=collection, data={"lemma": token.value})
+        for token in tokens
+    )
+
+    trees = TextAnnotationCollection.objects.create(
+        urn=constants.TREES_COLLECTION_URN, label="Trees", data={}
+    )
+    alignment = TextAlignment.objects.create(
+        urn=constants.ALIGNMENT_URN, label="Alignment"
+    )
+    alignment.versions.add(version)
+    for idx, line in enumerate(lines):
+        tree = TextAnnotation.objects.create(
+            urn=f"{constants.TREES_COLLECTION_URN}:{idx}",
+            kind=TEXT_ANNOTATION_KIND_SYNTAX_TREE,
+            collection=trees,
+            idx=idx,
+            data={"references": [line.urn]},
+        )
+        tree.text_parts.add(line)
+        record = TextAlignmentRecord.objects.create(
+            urn=f"{constants.ALIGNMENT_URN}:{idx}", alignment=alignment, idx=idx
+        )
+        relation = TextAlignmentRecordRelation.objects.create(
+            version=version, record=record
+        )
+        relation.tokens.add(*line.tokens.all())
+    return version
@@ -0,0 +1,124 @@
+DATABASE_MD5 = "0123456789abcdef0123456789abcdef"
+
+VERSION_URN = "urn:cts:greekLit:tlg0012.tlg001.test-grc1:"
+TOKEN_ANNOTATION_COLLECTION_URN = "urn:cite2:test:token_annotation_collection:lemmas"
+TREES_COLLECTION_URN = "urn:cite2:test:text_annotation_collection:trees"
+ALIGNMENT_URN = "urn:cite2:test:text_alignment:alignment"
+
+LINES = {
+    "1.1": "μῆνιν ἄειδε θεὰ",
+    "1.2": "οὐλομένην ἣ μυρί᾽",
+    "1.3": "πολλὰς δ᾽ ἰφθίμους",
+    "2.1": "ἄλλοι μέν ῥα θεοί",
+    "2.2": "εὗδον παννύχιοι",
+}
+
+LIBRARY_DATA = [
+    {
+        "data": {"urn": "urn:cts:", "kind": "nid"},
+        "children": [
+            {
+                "data": {"urn": "urn:cts:greekLit:", "kind": "namespace"},
+                "children": [
+                    {
+                        "data": {
+                            "urn": "urn:cts:greekLit:tlg0012:",
+                            "kind": "textgroup",
+                        },
+                        "children": [
+                            {
+                                "data": {
+                                    "urn": "urn:cts:greekLit:tlg0012.tlg001:",
+                                    "kind": "work",
+                                },
+                                "children": [
+                                    {
+                                        "data": {
+                                            "urn": VERSION_URN,
+                                            "kind": "version",
+                                            "idx": 0,
+                                            "metadata": {
+                                                "citation_scheme": ["book", "line"]
+                                            },
+                                        },
+                                        "children": [
+                                            {
+                                                "data": {
+                                                    "urn": f"{VERSION_URN}{book}",
+                                                    "kind": "book",
+                                                    "ref": book,
+                                                    "rank": 1,
+                                                    "idx": int(book) - 1,
+                                                },
+                                                "children": [
+                                                    {
+                                                        "data": {
+                                                            "urn": f"{VERSION_URN}{ref}",
+                                                            "kind": "line",
+                                                            "ref": ref,
+                                                            "rank": 2,
+                                                            "idx": idx,
+                                                            "text_content": text,
+                                                        }
+                                                    }
+                                                    for idx, (ref, text) in enumerate(
+                                                        LINES.items()
+                                                    )
+                                                    if ref.startswith(f"{book}.")
+                                                ],
+                                            }
+                                            for book in ["1", "2"]
+                                        ],
+                                    }
+                                ],
+                            }
+                        ],
+                    }
+                ],
+            }
+        ],
+    }
+]
+
+# NOTE: The passage query sent by the reader (without `first` or `last`)
+PASSAGE_QUERY = """
+query Passage($reference: String!) {
+  passageTextParts(reference: $reference) {
+    edges {
+      node {
+        urn
+        tokens {
+          edges {
+            node {
+              value
+              annotations {
+                edges {
+                  node {
+                    data
+                  }
+                }
+              }
+              alignmentRecordRelations {
+                edges {
+                  node {
+                    record {
+                      urn
+                    }
+                  }
+                }
+              }
+            }
+          }
+        }
+        textAnnotations {
+          edges {
+            node {
+              urn
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
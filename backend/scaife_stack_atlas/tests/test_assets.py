@@ -0,0 +1,57 @@
+import pytest
+
+from scaife_stack_atlas import temp
+from scaife_stack_atlas.models import Asset
+
+
+CSS = "body { color: black; }"
+
+
+@pytest.fixture
+def css_path(tmp_path):
+    path = tmp_path / "style.css"
+    path.write_text(CSS)
+    return path
+
+
+@pytest.mark.django_db
+def test_asset_fields_are_embedded_by_default(css_path):
+    assert temp.get_asset_fields(css=css_path) == {"css": CSS}
+    assert not Asset.objects.exists()
+
+
+@pytest.mark.django_db
+def test_asset_fields_refer_to_stored_assets(settings, css_path):
+    settings.SV_ATLAS_ASSETS_ENABLED = True
+    fields = temp.get_asset_fields(css=css_path)
+    asset = Asset.objects.get()
+    assert fields == {"css_url": asset.url}
+    assert asset.content == CSS
+    assert asset.content_type == "text/css; charset=utf-8"
+
+    # NOTE: Identical content is only stored once
+    assert temp.get_asset_fields(css=css_path) == fields
+    assert Asset.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_delete_unreferenced_assets():
+    Asset.objects.store(CSS, "text/css; charset=utf-8")
+    temp.delete_unreferenced_assets()
+    assert not Asset.objects.exists()
+
+
+@pytest.mark.django_db
+def test_serve_asset(client):
+    asset = Asset.objects.store(CSS, "text/css; charset=utf-8")
+    response = client.get(asset.url)
+    assert response.status_code == 200
+    assert response.content.decode("utf-8") == CSS
+    assert response["Content-Type"] == "text/css; charset=utf-8"
+    assert "immutable" in response["Cache-Control"]
+
+    response = client.get(asset.url, HTTP_IF_NONE_MATCH=response["ETag"])
+    assert response.status_code == 304
+
+    response = client.get(f"/assets/{'0' * 64}")
+    assert response.status_code == 404
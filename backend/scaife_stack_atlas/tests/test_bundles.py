@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from scaife_viewer.atlas.constants import TEXT_ANNOTATION_KIND_SYNTAX_TREE
+from scaife_viewer.atlas.models import Node, TextAnnotation, TextAnnotationCollection
+
+from . import constants
+
+
+GORMAN_COLLECTION_URN = "urn:cite2:test:text_annotation_collection:gorman"
+GORMAN_TREE_URN = f"{GORMAN_COLLECTION_URN}:0"
+
+
+@pytest.fixture
+def gorman_tree(version):
+    """
+    A syntax tree whose references point at a separate trees version, rather
+    than the line it annotates
+    """
+    collection = TextAnnotationCollection.objects.create(
+        urn=GORMAN_COLLECTION_URN, label="Gorman Trees", data={}
+    )
+    tree = TextAnnotation.objects.create(
+        urn=GORMAN_TREE_URN,
+        kind=TEXT_ANNOTATION_KIND_SYNTAX_TREE,
+        collection=collection,
+        idx=0,
+        data={
+            "references": ["urn:cts:greekLit:tlg0012.tlg001.test-vgorman1-trees:1.1"]
+        },
+    )
+    # NOTE: Spans two lines, so it must only be returned once per passage
+    tree.text_parts.add(
+        *Node.objects.filter(
+            urn__in=[f"{constants.VERSION_URN}1.1", f"{constants.VERSION_URN}1.2"]
+        )
+    )
+    return tree
+
+
+def get_bundle(client, urn, **extra):
+    return client.get(f"/passages/{urn}/bundle.json", **extra)
+
+
+@pytest.mark.django_db
+def test_passage_bundle(client, gorman_tree, atlas_db_path):
+    response = get_bundle(client, f"{constants.VERSION_URN}1.1-1.2")
+    assert response.status_code == 200
+    assert response["X-Bundle-Cache"] == "MISS"
+    data = json.loads(response.content)
+
+    assert data["version"] == constants.VERSION_URN
+    assert [text_part["urn"] for text_part in data["text_parts"]] == [
+        f"{constants.VERSION_URN}1.1",
+        f"{constants.VERSION_URN}1.2",
+    ]
+    assert [token["value"] for token in data["text_parts"][0]["tokens"]] == (
+        constants.LINES["1.1"].split()
+    )
+    assert [annotation["urn"] for annotation in data["text_annotations"]] == [
+        f"{constants.TREES_COLLECTION_URN}:0",
+        GORMAN_TREE_URN,
+        f"{constants.TREES_COLLECTION_URN}:1",
+    ]
+    assert [record["urn"] for record in data["alignments"][0]["records"]] == [
+        f"{constants.ALIGNMENT_URN}:0",
+        f"{constants.ALIGNMENT_URN}:1",
+    ]
+
+    response = get_bundle(
+        client, f"{constants.VERSION_URN}1.1-1.2", HTTP_IF_NONE_MATCH=response["ETag"]
+    )
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db
+def test_passage_bundle_excludes_other_passages(client, gorman_tree, atlas_db_path):
+    response = get_bundle(client, f"{constants.VERSION_URN}2.1")
+    data = json.loads(response.content)
+    assert [annotation["urn"] for annotation in data["text_annotations"]] == [
+        f"{constants.TREES_COLLECTION_URN}:3"
+    ]
+
+
+@pytest.mark.django_db
+def test_passage_bundles_are_cached(client, version, graphql_cache):
+    urn = f"{constants.VERSION_URN}1.1"
+    assert get_bundle(client, urn)["X-Bundle-Cache"] == "MISS"
+    assert get_bundle(client, urn)["X-Bundle-Cache"] == "HIT"
+
+
+@pytest.mark.django_db
+def test_passage_bundle_not_found(client, version, atlas_db_path):
+    response = get_bundle(client, "urn:cts:greekLit:tlg0012.tlg001.missing:1.1")
+    assert response.status_code == 404
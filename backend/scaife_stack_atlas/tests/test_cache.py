@@ -0,0 +1,109 @@
+import graphql.backend.core
+import pytest
+
+from scaife_stack_atlas import atlas_db
+from scaife_stack_atlas.api.cache import BoundedLocMemCache, stats
+
+from . import constants
+
+
+QUERY = """
+{
+  textParts(urn_Startswith: "%s", rank: 2) {
+    edges {
+      node {
+        urn
+      }
+    }
+  }
+}
+""" % (
+    constants.VERSION_URN
+)
+
+
+def post_query(client, query=QUERY):
+    return client.post("/graphql/", {"query": query}, content_type="application/json")
+
+
+def test_bounded_locmem_cache_evicts_least_recently_used_by_size():
+    cache = BoundedLocMemCache(
+        "test-bounded", {"TIMEOUT": None, "OPTIONS": {"MAX_SIZE": 5000}}
+    )
+    cache.clear()
+    cache.set("a", b"a" * 2000)
+    cache.set("b", b"b" * 2000)
+    assert cache.get("a") is not None
+
+    cache.set("c", b"c" * 2000)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_get_database_md5_reads_sidecar(atlas_db_path):
+    assert atlas_db.get_database_md5() == constants.DATABASE_MD5
+
+
+def test_get_database_md5_does_not_hash_the_database(atlas_db_path, monkeypatch):
+    atlas_db.get_md5_sidecar_path(atlas_db_path).unlink()
+
+    def compute_md5(path):
+        raise AssertionError("the database should not be hashed")
+
+    monkeypatch.setattr(atlas_db, "compute_md5", compute_md5)
+    md5 = atlas_db.get_database_md5()
+    assert md5 and md5 != constants.DATABASE_MD5
+
+
+@pytest.mark.django_db
+def test_graphql_responses_are_cached(client, version, graphql_cache):
+    response = post_query(client)
+    assert response.status_code == 200
+    assert response["X-GraphQL-Cache"] == "MISS"
+
+    cached = post_query(client)
+    assert cached["X-GraphQL-Cache"] == "HIT"
+    assert cached.content == response.content
+
+    # NOTE: Formatting does not affect the cache key
+    reformatted = post_query(client, " ".join(QUERY.split()))
+    assert reformatted["X-GraphQL-Cache"] == "HIT"
+
+
+@pytest.mark.django_db
+def test_queries_are_parsed_once_per_request(
+    client, version, graphql_cache, monkeypatch
+):
+    parsed = []
+    parse = graphql.backend.core.parse
+
+    def counting_parse(source, *args, **kwargs):
+        parsed.append(source)
+        return parse(source, *args, **kwargs)
+
+    monkeypatch.setattr(graphql.backend.core, "parse", counting_parse)
+    response = post_query(client)
+    assert response.status_code == 200
+    assert response["X-GraphQL-Cache"] == "MISS"
+    assert "X-GraphQL-Cost-Estimated" in response
+    # NOTE: The cost check, the cache key and execution share a single parse
+    assert parsed == [QUERY]
+
+
+@pytest.mark.django_db
+def test_graphql_cache_is_disabled_by_default(client, version, atlas_db_path):
+    response = post_query(client)
+    assert response.status_code == 200
+    assert not response.has_header("X-GraphQL-Cache")
+
+
+@pytest.mark.django_db
+def test_cache_stats_requires_staff(client, admin_client, settings, atlas_db_path):
+    settings.DEBUG = False
+    stats.reset()
+    assert client.get("/graphql/cache-stats/").status_code == 403
+
+    response = admin_client.get("/graphql/cache-stats/")
+    assert response.status_code == 200
+    assert response.json()["database_md5"] == constants.DATABASE_MD5
@@ -0,0 +1,136 @@
+import json
+
+import pytest
+
+from scaife_stack_atlas.api import persisted
+from scaife_stack_atlas.api.persisted import hash_query
+
+from . import constants
+
+
+PASSAGE_TOKENS_QUERY = """
+{
+  passageTextParts(reference: "%s1.1-2.2"%s) {
+    edges {
+      node {
+        urn
+        tokens%s {
+          edges {
+            node {
+              value
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+TOKENS_QUERY = """
+query Tokens($urn: String!, $first: Int) {
+  tokens(textPart_Urn_Startswith: $urn, first: $first) {
+    edges {
+      node {
+        value
+        annotations {
+          edges {
+            node {
+              data
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+def post_query(client, query, variables=None):
+    return client.post(
+        "/graphql/",
+        {"query": query, "variables": variables or {}},
+        content_type="application/json",
+    )
+
+
+@pytest.fixture
+def persist(settings, tmp_path):
+    """
+    Registers queries as persisted queries
+    """
+    path = tmp_path / "persisted-queries.json"
+    settings.SV_ATLAS_GRAPHQL_PERSISTED_QUERIES_PATH = str(path)
+
+    def persist(*queries):
+        path.write_text(json.dumps({hash_query(query): query for query in queries}))
+        persisted.get_persisted_queries.cache_clear()
+
+    yield persist
+    persisted.get_persisted_queries.cache_clear()
+
+
+@pytest.mark.django_db
+def test_unbounded_connections_are_refused(client, version, atlas_db_path):
+    # NOTE: Every token of the version, along with its annotations
+    response = post_query(client, TOKENS_QUERY, {"urn": constants.VERSION_URN})
+    assert response.status_code == 400
+    error = response.json()["errors"][0]["message"]
+    assert "exceeds the maximum cost" in error
+    assert "use `first` or `last`" in error
+
+
+@pytest.mark.django_db
+def test_bounded_connections_are_executed(client, version, atlas_db_path):
+    query = PASSAGE_TOKENS_QUERY % (constants.VERSION_URN, ", first: 10", "(first: 20)")
+    response = post_query(client, query)
+    assert response.status_code == 200
+    edges = response.json()["data"]["passageTextParts"]["edges"]
+    assert len(edges) == len(constants.LINES)
+    assert int(response["X-GraphQL-Cost-Actual"]) <= int(
+        response["X-GraphQL-Cost-Estimated"]
+    )
+
+
+@pytest.mark.django_db
+def test_passage_connections_are_estimated_from_their_reference(
+    client, version, atlas_db_path
+):
+    query = PASSAGE_TOKENS_QUERY % (constants.VERSION_URN, "", "(first: 20)")
+    response = post_query(client, query)
+    assert response.status_code == 200
+    # NOTE: Each of the five lines costs 4 (`node`, `urn`, `tokens` and `edges`),
+    # plus 2 (`node` and `value`) for each of up to 20 tokens
+    assert int(response["X-GraphQL-Cost-Estimated"]) == 2 + 5 * (4 + 20 * 2)
+
+
+@pytest.mark.django_db
+def test_reader_passage_query_is_executed(persist, client, version, atlas_db_path):
+    persist(constants.PASSAGE_QUERY)
+    variables = {"reference": f"{constants.VERSION_URN}1.1-2.2"}
+    response = post_query(client, constants.PASSAGE_QUERY, variables)
+    assert response.status_code == 200
+    assert "errors" not in response.json()
+    edges = response.json()["data"]["passageTextParts"]["edges"]
+    assert len(edges) == len(constants.LINES)
+
+    # NOTE: The reader's query is still refused unless it is persisted
+    persist()
+    response = post_query(client, constants.PASSAGE_QUERY, variables)
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_persisted_queries_are_estimated_with_their_variables(
+    settings, persist, client, version, atlas_db_path
+):
+    persist(TOKENS_QUERY)
+    settings.SV_ATLAS_GRAPHQL_PERSISTED_MAX_COST = 100000
+    variables = {"urn": constants.VERSION_URN, "first": 10}
+    response = post_query(client, TOKENS_QUERY, variables)
+    assert response.status_code == 200
+
+    for first in [settings.SV_ATLAS_GRAPHQL_MAX_LIST_SIZE, None]:
+        response = post_query(client, TOKENS_QUERY, dict(variables, first=first))
+        assert response.status_code == 400
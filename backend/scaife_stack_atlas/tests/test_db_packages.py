@@ -0,0 +1,139 @@
+import shutil
+import socket
+import sqlite3
+
+import pytest
+import zstandard
+
+from scaife_stack_atlas import db_packages
+from scaife_stack_atlas.atlas_db import compute_md5, get_md5_sidecar_path
+from scaife_stack_atlas.db_packages import (
+    LocalStorage,
+    PackageError,
+    create_package,
+    create_patch,
+    restore_package,
+)
+
+
+def create_database(path, rows=5000):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA page_size=1024")
+    conn.execute("CREATE TABLE token (id INTEGER PRIMARY KEY, value TEXT)")
+    conn.executemany(
+        "INSERT INTO token (value) VALUES (?)",
+        ((f"token-{idx}" * 4,) for idx in range(rows)),
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def update_database(path, sql):
+    conn = sqlite3.connect(path)
+    conn.execute(sql)
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    return create_database(tmp_path / "build" / "db.sqlite")
+
+
+def test_package_round_trip(tmp_path, database_path):
+    package_path, manifest_path, manifest = create_package(
+        database_path, tmp_path / "packages", chunk_size=16 * 1024, workers=2
+    )
+    assert manifest["md5"] == compute_md5(database_path)
+    assert package_path.name == f"db-{manifest['md5']}.zst"
+    assert len(manifest["chunks"]) > 1
+
+    restored_path = tmp_path / "restored" / "db.sqlite"
+    restore_package(manifest_path, restored_path, workers=2)
+    assert restored_path.read_bytes() == database_path.read_bytes()
+    assert get_md5_sidecar_path(restored_path).read_text().strip() == manifest["md5"]
+
+
+def test_restore_package_verifies_chunks(tmp_path, database_path):
+    package_path, manifest_path, _ = create_package(
+        database_path, tmp_path / "packages", chunk_size=16 * 1024
+    )
+    data = bytearray(package_path.read_bytes())
+    data[-8] ^= 0xFF
+    package_path.write_bytes(bytes(data))
+
+    restored_path = tmp_path / "restored" / "db.sqlite"
+    with pytest.raises((PackageError, zstandard.ZstdError)):
+        restore_package(manifest_path, restored_path)
+    assert not restored_path.exists()
+    assert not restored_path.with_name("db.sqlite.partial").exists()
+
+
+def test_patch_round_trip(tmp_path, database_path):
+    base_path = tmp_path / "base.sqlite"
+    shutil.copyfile(database_path, base_path)
+    update_database(
+        database_path, "UPDATE token SET value = 'changed' WHERE id % 1000 = 0"
+    )
+    update_database(database_path, "INSERT INTO token (value) VALUES ('added')")
+
+    package_path, manifest_path, manifest = create_patch(
+        base_path, database_path, tmp_path / "packages", workers=2
+    )
+    assert manifest["base_md5"] == compute_md5(base_path)
+    assert package_path.name == f"db-{manifest['base_md5']}-{manifest['md5']}.zst"
+    # NOTE: Only the chunks that changed are shipped in the patch
+    shipped = [chunk for chunk in manifest["chunks"] if "base_offset" not in chunk]
+    assert 0 < len(shipped) < len(manifest["chunks"])
+
+    restored_path = tmp_path / "restored.sqlite"
+    restore_package(manifest_path, restored_path, base_path=base_path)
+    assert restored_path.read_bytes() == database_path.read_bytes()
+
+    # NOTE: By default, a patch is applied to the database it replaces
+    shutil.copyfile(base_path, restored_path)
+    restore_package(manifest_path, restored_path)
+    assert restored_path.read_bytes() == database_path.read_bytes()
+
+
+def test_patch_requires_its_base(tmp_path, database_path):
+    base_path = tmp_path / "base.sqlite"
+    shutil.copyfile(database_path, base_path)
+    update_database(
+        database_path, "UPDATE token SET value = 'changed' WHERE id % 1000 = 0"
+    )
+    _, manifest_path, _ = create_patch(base_path, database_path, tmp_path / "packages")
+
+    other_path = tmp_path / "other.sqlite"
+    shutil.copyfile(base_path, other_path)
+    update_database(other_path, "UPDATE token SET value = 'other'")
+    with pytest.raises(PackageError):
+        restore_package(
+            manifest_path, tmp_path / "restored.sqlite", base_path=other_path
+        )
+    with pytest.raises(PackageError):
+        restore_package(manifest_path, tmp_path / "missing.sqlite")
+
+
+def test_local_storage(tmp_path, database_path):
+    _, manifest_path, _ = create_package(database_path, tmp_path / "packages")
+    storage = LocalStorage(tmp_path / "storage")
+    location = storage.save(manifest_path)
+    assert location == str(tmp_path / "storage" / manifest_path.name)
+
+
+def test_stalled_remote_times_out(tmp_path, monkeypatch):
+    # NOTE: Connections to the socket are accepted by the kernel, but nothing
+    # is ever sent back
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    monkeypatch.setattr(db_packages, "REQUEST_TIMEOUT", (1, 0.1))
+    url = f"http://127.0.0.1:{server.getsockname()[1]}/db-0123.json"
+    try:
+        with pytest.raises(PackageError, match="Timed out"):
+            restore_package(url, tmp_path / "restored.sqlite")
+    finally:
+        server.close()
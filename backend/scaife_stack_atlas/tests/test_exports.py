@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from scaife_stack_atlas.exports.rows import iter_keyset_chunks
+from scaife_viewer.atlas.models import (
+    Node,
+    Token,
+    TokenAnnotation,
+    TokenAnnotationCollection,
+)
+
+from . import constants
+
+
+def get_rows(response):
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("application/x-ndjson")
+    content = b"".join(response.streaming_content).decode("utf-8")
+    assert content.endswith("\n")
+    return [json.loads(line) for line in content.splitlines()]
+
+
+@pytest.mark.django_db
+def test_iter_keyset_chunks(version):
+    lines = Node.objects.filter(kind="line").values("pk", "path", "urn")
+    chunks = list(iter_keyset_chunks(lines, key="path", chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [line["urn"] for chunk in chunks for line in chunk] == [
+        f"{constants.VERSION_URN}{ref}" for ref in constants.LINES
+    ]
+
+
+@pytest.mark.django_db
+def test_export_version_tokens(client, version):
+    other = TokenAnnotationCollection.objects.create(
+        urn="urn:cite2:test:token_annotation_collection:other", label="Other"
+    )
+    TokenAnnotation.objects.create(
+        token=Token.objects.order_by("idx").first(), collection=other, data={}
+    )
+    url = f"/exports/versions/{constants.VERSION_URN}/tokens.ndjson"
+
+    rows = get_rows(client.get(url))
+    values = [value for text in constants.LINES.values() for value in text.split()]
+    assert [row["value"] for row in rows] == values
+    assert rows[0]["text_part"] == f"{constants.VERSION_URN}1.1"
+    assert rows[-1]["text_part"] == f"{constants.VERSION_URN}2.2"
+    assert [row["annotations"][0]["data"] for row in rows] == [
+        {"lemma": value} for value in values
+    ]
+    assert len(rows[0]["annotations"]) == 2
+
+    rows = get_rows(
+        client.get(url, {"collection": constants.TOKEN_ANNOTATION_COLLECTION_URN})
+    )
+    assert rows[0]["annotations"] == [
+        {
+            "collection": constants.TOKEN_ANNOTATION_COLLECTION_URN,
+            "data": {"lemma": rows[0]["value"]},
+        }
+    ]
+
+
+@pytest.mark.django_db
+def test_export_syntax_trees(client, version):
+    rows = get_rows(
+        client.get(
+            f"/exports/text-annotation-collections/{constants.TREES_COLLECTION_URN}/syntax-trees.ndjson"
+        )
+    )
+    assert rows == [
+        {
+            "urn": f"{constants.TREES_COLLECTION_URN}:{idx}",
+            "idx": idx,
+            "data": {"references": [f"{constants.VERSION_URN}{ref}"]},
+        }
+        for idx, ref in enumerate(constants.LINES)
+    ]
+
+
+@pytest.mark.django_db
+def test_export_alignment_records(client, version):
+    rows = get_rows(
+        client.get(f"/exports/alignments/{constants.ALIGNMENT_URN}/records.ndjson")
+    )
+    assert [row["urn"] for row in rows] == [
+        f"{constants.ALIGNMENT_URN}:{idx}" for idx in range(len(constants.LINES))
+    ]
+    for row, text in zip(rows, constants.LINES.values()):
+        (relation,) = row["relations"]
+        assert relation["version"] == constants.VERSION_URN
+        assert [token["value"] for token in relation["tokens"]] == text.split()
+
+
+@pytest.mark.django_db
+def test_export_not_found(client, version):
+    response = client.get("/exports/alignments/urn:cite2:test:missing/records.ndjson")
+    assert response.status_code == 404
@@ -0,0 +1,257 @@
+import io
+import os
+import sqlite3
+
+import pytest
+
+from django.conf import settings as django_settings
+
+from scaife_stack_atlas import ingestion
+from scaife_viewer.atlas.models import TextAnnotationCollection
+
+
+CALLS = []
+
+
+def import_library(reset=False):
+    CALLS.append("import_library")
+
+
+def import_annotations(reset=False):
+    CALLS.append("import_annotations")
+
+
+def import_alignments(reset=False, prepared=None):
+    CALLS.append("import_alignments")
+    if prepared is not None:
+        CALLS.append(prepared)
+
+
+def prepare_alignments():
+    return dict(pid=os.getpid())
+
+
+PIPELINE = [
+    f"{__name__}.{func.__name__}"
+    for func in [import_library, import_annotations, import_alignments]
+]
+
+
+@pytest.fixture
+def pipeline(settings, tmp_path, monkeypatch):
+    """
+    Points the ingestion pipeline at the steps above, each of which reads one
+    file from a stand-in SV_ATLAS_DATA_DIR
+    """
+    data_dir = tmp_path / "data"
+    for name in ["library", "annotations", "alignments"]:
+        (data_dir / name).mkdir(parents=True)
+        (data_dir / name / f"{name}.json").write_text("{}")
+    monkeypatch.setattr(
+        ingestion,
+        "PIPELINE_STEP_INPUTS",
+        {
+            PIPELINE[0]: ["library/*"],
+            PIPELINE[1]: ["annotations/*"],
+            PIPELINE[2]: ["alignments/*"],
+        },
+    )
+    settings.SV_ATLAS_DATA_DIR = str(data_dir)
+    settings.SV_ATLAS_INGESTION_PIPELINE = PIPELINE
+    settings.SV_ATLAS_INGESTION_MANIFEST_PATH = str(tmp_path / "manifest.json")
+    settings.SV_ATLAS_INGESTION_REPORT_PATH = str(tmp_path / "report.json")
+    settings.SV_ATLAS_INGESTION_CHECKPOINT_DIR = None
+    settings.SV_ATLAS_DB_PATH = str(tmp_path / "db.sqlite")
+    CALLS.clear()
+    yield data_dir
+    CALLS.clear()
+
+
+def update_input(data_dir, name):
+    # NOTE: Changes the size of the file, since hashes are cached by size and
+    # mtime
+    (data_dir / name / f"{name}.json").write_text('{"updated": true}')
+
+
+def test_get_first_stale_index(settings, pipeline):
+    manifest = ingestion.IngestionManifest(settings.SV_ATLAS_INGESTION_MANIFEST_PATH)
+    steps = manifest.compute_steps(PIPELINE)
+    assert manifest.get_first_stale_index(steps) == 0
+
+    manifest.save(steps)
+    manifest = ingestion.IngestionManifest(settings.SV_ATLAS_INGESTION_MANIFEST_PATH)
+    assert manifest.get_first_stale_index(manifest.compute_steps(PIPELINE)) == 3
+
+    update_input(pipeline, "annotations")
+    changed = manifest.compute_steps(PIPELINE)
+    assert [a == b for a, b in zip(steps, changed)] == [True, False, True]
+    assert manifest.get_first_stale_index(changed) == 1
+
+
+def test_upstream_step_marks_later_steps_as_stale(settings, pipeline):
+    manifest = ingestion.IngestionManifest(settings.SV_ATLAS_INGESTION_MANIFEST_PATH)
+    manifest.save(manifest.compute_steps(PIPELINE))
+
+    update_input(pipeline, "library")
+    assert manifest.get_first_stale_index(manifest.compute_steps(PIPELINE)) == 0
+
+    # NOTE: Steps after a step that was added (or moved) are also stale
+    reordered = [PIPELINE[0], PIPELINE[2], PIPELINE[1]]
+    manifest.save(manifest.compute_steps(PIPELINE))
+    assert manifest.get_first_stale_index(manifest.compute_steps(reordered)) == 1
+
+
+def test_step_source_includes_helpers():
+    source = ingestion.get_step_source(import_library)
+    assert "def import_library" in source
+    # NOTE: Referred to by the step
+    assert "CALLS = []" in source
+    assert "def import_annotations" not in source
+
+    source = ingestion.get_step_source(create_collections)
+    assert "def create_collections" in source
+    assert "CALLS = []" not in source
+
+
+@pytest.mark.django_db
+def test_incremental_run_reruns_stale_steps(pipeline):
+    ingestion.run_ingestion_pipeline(io.StringIO())
+    assert CALLS == ["import_library", "import_annotations", "import_alignments"]
+
+    CALLS.clear()
+    update_input(pipeline, "annotations")
+    ingestion.run_ingestion_pipeline(io.StringIO(), incremental=True)
+    assert CALLS == ["import_annotations", "import_alignments"]
+
+    CALLS.clear()
+    outf = io.StringIO()
+    ingestion.run_ingestion_pipeline(outf, incremental=True)
+    assert CALLS == []
+    assert "--[ATLAS data is up to date]--" in outf.getvalue()
+
+
+def create_collections(reset=False):
+    TextAnnotationCollection.objects.bulk_create(
+        TextAnnotationCollection(urn=f"urn:cite2:test:collection:{idx}", data={})
+        for idx in range(3)
+    )
+    TextAnnotationCollection.objects.update(label="Trees")
+
+
+@pytest.mark.django_db
+def test_step_metrics():
+    step = f"{__name__}.create_collections"
+    with ingestion.StepMetrics(step, ingestion.get_model_labels_by_table()) as metrics:
+        create_collections()
+
+    label = TextAnnotationCollection._meta.label
+    report = metrics.as_dict()
+    assert report["step"] == step
+    assert report["queries"] == 2
+    assert report["rows_inserted"] == {label: 3}
+    assert report["rows_updated"] == {label: 3}
+    assert report["wall_time"] >= 0
+    assert report["peak_rss_kb"] > 0
+
+
+def count_collections(database_path):
+    conn = sqlite3.connect(database_path)
+    table = TextAnnotationCollection._meta.db_table
+    (count,) = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+    conn.close()
+    return count
+
+
+# NOTE: VACUUM INTO cannot be run within a transaction
+@pytest.mark.django_db(transaction=True)
+def test_checkpoint_round_trip(settings, tmp_path, pipeline):
+    settings.SV_ATLAS_INGESTION_CHECKPOINT_DIR = str(tmp_path / "checkpoints")
+    manifest = ingestion.IngestionManifest(settings.SV_ATLAS_INGESTION_MANIFEST_PATH)
+    steps = manifest.compute_steps(PIPELINE)
+    checkpoints = ingestion.CheckpointStore(
+        settings.SV_ATLAS_INGESTION_CHECKPOINT_DIR, settings.SV_ATLAS_DB_LABEL
+    )
+
+    TextAnnotationCollection.objects.create(urn="urn:cite2:test:collection:1")
+    checkpoints.save(1, steps[:1])
+    TextAnnotationCollection.objects.create(urn="urn:cite2:test:collection:2")
+    assert checkpoints.exists(1)
+    assert not checkpoints.exists(2)
+
+    assert checkpoints.restore(1) == steps[:1]
+    assert count_collections(settings.SV_ATLAS_DB_PATH) == 1
+
+    outf = io.StringIO()
+    ingestion.run_ingestion_pipeline(outf, resume_from="import_annotations")
+    assert CALLS == ["import_annotations", "import_alignments"]
+    assert "WARNING" not in outf.getvalue()
+    manifest = ingestion.IngestionManifest(settings.SV_ATLAS_INGESTION_MANIFEST_PATH)
+    assert manifest.steps == steps
+    assert checkpoints.exists(2)
+    assert checkpoints.exists(3)
+
+
+@pytest.fixture
+def prepare_phases(monkeypatch):
+    """
+    Gives import_alignments a parse-only phase, which reads the annotations
+    """
+    monkeypatch.setattr(
+        ingestion,
+        "PIPELINE_STEP_WRITES",
+        {PIPELINE[0]: ["library"], PIPELINE[1]: ["annotations"]},
+    )
+    monkeypatch.setattr(
+        ingestion,
+        "PIPELINE_STEP_PREPARE",
+        {
+            PIPELINE[2]: dict(
+                func=f"{__name__}.prepare_alignments", reads=["annotations"]
+            )
+        },
+    )
+
+
+def test_get_prepare_dependencies():
+    pipeline = django_settings.SV_ATLAS_INGESTION_PIPELINE
+    dictionaries = "scaife_viewer.atlas.importers.dictionaries.import_dictionaries"
+    alignments = "scaife_stack_atlas.temp.process_alignments"
+    tokens = "scaife_viewer.atlas.tokenizers.tokenize_all_text_parts"
+    # NOTE: The LSJ entries are extracted without reading from the database, so
+    # they can be extracted while every earlier step is written
+    assert ingestion.get_prepare_dependencies(pipeline) == {
+        pipeline.index(dictionaries): -1,
+        pipeline.index(alignments): pipeline.index(tokens),
+    }
+
+
+def test_undeclared_steps_are_waited_for(prepare_phases):
+    pipeline = [PIPELINE[1], "undeclared", PIPELINE[0], PIPELINE[2]]
+    assert ingestion.get_prepare_dependencies(pipeline) == {3: 1}
+
+
+def test_step_scheduler_prepares_in_workers(prepare_phases):
+    outf = io.StringIO()
+    with ingestion.StepScheduler(PIPELINE, range(3), 2) as scheduler:
+        scheduler.start_ready(1, outf)
+        assert not scheduler.running
+        scheduler.start_ready(2, outf)
+        assert list(scheduler.running) == [2]
+        prepared, wall_time = scheduler.get_prepared(2)
+    assert prepared["pid"] != os.getpid()
+    assert wall_time >= 0
+    assert f"--[{PIPELINE[2]}] (preparing)--" in outf.getvalue()
+
+    with ingestion.StepScheduler(PIPELINE, range(3), 1) as scheduler:
+        scheduler.start_ready(2, outf)
+        assert not scheduler.running
+        prepared, _ = scheduler.get_prepared(2)
+    assert prepared["pid"] == os.getpid()
+
+
+@pytest.mark.django_db
+def test_prepared_steps_are_written_in_order(settings, pipeline, prepare_phases):
+    settings.SV_ATLAS_INGESTION_CONCURRENCY = 2
+    ingestion.run_ingestion_pipeline(io.StringIO())
+    assert CALLS[:3] == ["import_library", "import_annotations", "import_alignments"]
+    assert CALLS[3]["pid"] != os.getpid()
@@ -0,0 +1,84 @@
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+
+from scaife_stack_atlas.schema import schema
+from scaife_viewer.atlas.models import Node
+
+from . import constants
+
+
+def execute(reference):
+    with CaptureQueriesContext(connection) as context:
+        result = schema.execute(
+            constants.PASSAGE_QUERY,
+            variables={"reference": reference},
+            context=RequestFactory().post("/graphql/"),
+        )
+    assert not result.errors
+    return result.data, len(context.captured_queries)
+
+
+def get_expected_data(lines):
+    edges = []
+    for line in lines:
+        tokens = [
+            {
+                "node": {
+                    "value": value,
+                    "annotations": {"edges": [{"node": {"data": {"lemma": value}}}]},
+                    "alignmentRecordRelations": {
+                        "edges": [
+                            {
+                                "node": {
+                                    "record": {
+                                        "urn": f"{constants.ALIGNMENT_URN}:{line['idx']}"
+                                    }
+                                }
+                            }
+                        ]
+                    },
+                }
+            }
+            for value in line["text"].split()
+        ]
+        edges.append(
+            {
+                "node": {
+                    "urn": line["urn"],
+                    "tokens": {"edges": tokens},
+                    "textAnnotations": {
+                        "edges": [
+                            {
+                                "node": {
+                                    "urn": f"{constants.TREES_COLLECTION_URN}:{line['idx']}"
+                                }
+                            }
+                        ]
+                    },
+                }
+            }
+        )
+    return {"passageTextParts": {"edges": edges}}
+
+
+@pytest.mark.django_db
+def test_passage_relationships_are_batched(version):
+    lines = [
+        dict(urn=urn, text=text, idx=idx)
+        for idx, (urn, text) in enumerate(
+            Node.objects.filter(kind="line")
+            .order_by("path")
+            .values_list("urn", "text_content")
+        )
+    ]
+
+    data, query_count = execute(f"{constants.VERSION_URN}1.1-1.2")
+    assert data == get_expected_data(lines[:2])
+
+    data, passage_query_count = execute(f"{constants.VERSION_URN}1.1-2.2")
+    assert data == get_expected_data(lines)
+    # NOTE: The number of queries does not depend on the length of the passage
+    assert passage_query_count == query_count
@@ -0,0 +1,100 @@
+import json
+import logging
+
+import pytest
+
+from scaife_stack_atlas.api import persisted
+from scaife_stack_atlas.api.persisted import PersistedQueryRegistry, hash_query
+from scaife_stack_atlas.schema import schema
+
+from . import constants
+
+
+QUERY = """
+query TextParts($urn: String!) {
+  textParts(urn_Startswith: $urn, rank: 2) {
+    edges {
+      node {
+        urn
+      }
+    }
+  }
+}
+"""
+INVALID_QUERY = "{ textParts { edges { node { unknownField } } } }"
+MALFORMED_QUERY = "{ textParts {"
+
+
+@pytest.fixture
+def persisted_queries(settings, tmp_path):
+    path = tmp_path / "persisted-queries.json"
+    path.write_text(json.dumps({hash_query(QUERY): QUERY}))
+    settings.SV_ATLAS_GRAPHQL_PERSISTED_QUERIES_PATH = str(path)
+    persisted.get_persisted_queries.cache_clear()
+    yield path
+    persisted.get_persisted_queries.cache_clear()
+
+
+def test_registry_skips_invalid_entries(tmp_path, caplog):
+    path = tmp_path / "persisted-queries.json"
+    path.write_text(
+        json.dumps(
+            {
+                hash_query(QUERY): QUERY,
+                hash_query(INVALID_QUERY): INVALID_QUERY,
+                hash_query(MALFORMED_QUERY): MALFORMED_QUERY,
+                "not-the-hash": "{ versions { edges { node { urn } } } }",
+            }
+        )
+    )
+    registry = PersistedQueryRegistry(schema)
+    with caplog.at_level(logging.ERROR):
+        registry.load(path)
+
+    assert list(registry.queries) == [hash_query(QUERY)]
+    assert len(caplog.records) == 3
+
+
+def test_registry_loads_apollo_manifests(tmp_path):
+    path = tmp_path / "persisted-queries.json"
+    path.write_text(
+        json.dumps(
+            {"operations": [{"id": hash_query(QUERY), "body": QUERY, "name": "q"}]}
+        )
+    )
+    registry = PersistedQueryRegistry(schema)
+    registry.load(path)
+    assert registry.get_for_query(QUERY).sha256 == hash_query(QUERY)
+
+
+def test_registry_ignores_missing_files(tmp_path):
+    registry = PersistedQueryRegistry(schema)
+    registry.load(tmp_path / "missing.json")
+    assert registry.queries == {}
+
+
+@pytest.mark.django_db
+def test_persisted_query_by_hash(client, version, persisted_queries):
+    extensions = {"persistedQuery": {"version": 1, "sha256Hash": hash_query(QUERY)}}
+    response = client.get(
+        "/graphql/",
+        {
+            "extensions": json.dumps(extensions),
+            "variables": json.dumps({"urn": constants.VERSION_URN}),
+        },
+        HTTP_ACCEPT="application/json",
+    )
+    assert response.status_code == 200
+    edges = response.json()["data"]["textParts"]["edges"]
+    assert [edge["node"]["urn"] for edge in edges] == [
+        f"{constants.VERSION_URN}{ref}" for ref in constants.LINES
+    ]
+
+
+@pytest.mark.django_db
+def test_unknown_persisted_query(client, persisted_queries):
+    extensions = {"persistedQuery": {"version": 1, "sha256Hash": "0" * 64}}
+    response = client.post(
+        "/graphql/", {"extensions": extensions}, content_type="application/json"
+    )
+    assert response.json()["errors"][0]["message"] == "PersistedQueryNotFound"
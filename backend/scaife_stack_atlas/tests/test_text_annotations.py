@@ -0,0 +1,126 @@
+import pytest
+
+from scaife_stack_atlas.models import TextAnnotationReference
+from scaife_stack_atlas.temp import TEXT_ANNOTATION_COLLECTIONS, index_text_annotations
+from scaife_viewer.atlas.constants import TEXT_ANNOTATION_KIND_SYNTAX_TREE
+from scaife_viewer.atlas.models import AttributionRecord, TextAnnotation
+
+from . import constants
+
+
+GAGDT_URN, GORMAN_URN, GLAUX_URN = [c["urn"] for c in TEXT_ANNOTATION_COLLECTIONS]
+GORMAN_VERSION_URN = "urn:cts:greekLit:tlg0012.tlg001.perseus-grc2-vgorman1-trees:"
+
+
+def create_tree(urn, references, idx=0):
+    return TextAnnotation.objects.create(
+        urn=urn,
+        kind=TEXT_ANNOTATION_KIND_SYNTAX_TREE,
+        idx=idx,
+        data={"references": references},
+    )
+
+
+@pytest.mark.django_db
+def test_index_text_annotations(version):
+    line_urn = f"{constants.VERSION_URN}1.1"
+    gagdt = create_tree(
+        "urn:cite2:exploreHomer:syntaxTree.v1:syntaxTree-tlg0012-1", [line_urn]
+    )
+    # NOTE: Matches both the gAGDT and Gorman collections; the last one wins
+    gorman = create_tree(
+        "urn:cite2:exploreHomer:syntaxTree.v1:syntaxTree-tlg0012-2",
+        [f"{GORMAN_VERSION_URN}1.1", line_urn],
+    )
+    glaux = create_tree(
+        "urn:cite2:beyond-translation:syntaxTree.atlas_v1:glaux-1", [line_urn]
+    )
+    other = create_tree("urn:cite2:test:syntaxTree:1", [line_urn])
+
+    index_text_annotations(reset=True)
+
+    collections = dict(
+        TextAnnotation.objects.filter(
+            pk__in=[gagdt.pk, gorman.pk, glaux.pk, other.pk]
+        ).values_list("pk", "collection__urn")
+    )
+    assert collections == {
+        gagdt.pk: GAGDT_URN,
+        gorman.pk: GORMAN_URN,
+        glaux.pk: GLAUX_URN,
+        other.pk: None,
+    }
+    assert set(
+        TextAnnotationReference.objects.filter(text_annotation=gorman).values_list(
+            "urn", "version_urn", "collection__urn"
+        )
+    ) == {
+        (f"{GORMAN_VERSION_URN}1.1", GORMAN_VERSION_URN, GORMAN_URN),
+        (line_urn, constants.VERSION_URN, GORMAN_URN),
+    }
+
+    record = AttributionRecord.objects.get(person__name="Vanessa Gorman")
+    assert record.data["references"] == [[[gorman.urn]]]
+    assert not record.urns.exists()
+
+    # NOTE: Re-indexing replaces the previous index and attributions
+    reference_count = TextAnnotationReference.objects.count()
+    index_text_annotations(reset=True)
+    assert AttributionRecord.objects.filter(person__name="Vanessa Gorman").count() == 1
+    assert TextAnnotationReference.objects.count() == reference_count
+
+
+@pytest.mark.django_db
+def test_for_passage(version):
+    tree = create_tree(
+        "urn:cite2:test:syntaxTree:1",
+        [f"{constants.VERSION_URN}{ref}" for ref in ["1.1", "1.10", "2.1"]],
+    )
+    index_text_annotations(reset=True)
+
+    def get_refs(urn):
+        references = TextAnnotationReference.objects.filter(text_annotation=tree)
+        return sorted(
+            urn.rsplit(":", 1)[1]
+            for urn in references.for_passage(urn).values_list("urn", flat=True)
+        )
+
+    assert get_refs(constants.VERSION_URN) == ["1.1", "1.10", "2.1"]
+    assert get_refs(f"{constants.VERSION_URN}1") == ["1.1", "1.10"]
+    assert get_refs(f"{constants.VERSION_URN}1.1") == ["1.1"]
+    assert get_refs(f"{constants.VERSION_URN}3") == []
+
+
+@pytest.mark.django_db
+def test_passage_annotators(client, version):
+    line_urn = f"{constants.VERSION_URN}1.1"
+    for idx in range(2):
+        create_tree(
+            f"urn:cite2:beyond-translation:syntaxTree.atlas_v1:glaux-{idx}", [line_urn]
+        )
+    create_tree(
+        "urn:cite2:exploreHomer:syntaxTree.v1:syntaxTree-tlg0012-1",
+        [f"{constants.VERSION_URN}2.1"],
+    )
+    index_text_annotations(reset=True)
+
+    response = client.get(f"/passages/{constants.VERSION_URN}1/annotators.json")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["urn"] == f"{constants.VERSION_URN}1"
+    # NOTE: Includes the syntax trees of the `version` fixture (one per line)
+    assert [(c["urn"], c["text_annotations"]) for c in data["collections"]] == [
+        (GLAUX_URN, 2),
+        (constants.TREES_COLLECTION_URN, 3),
+    ]
+    assert data["collections"][0]["source"] == {
+        "title": "gregorycrane/glaux-trees",
+        "url": "https://github.com/gregorycrane/glaux-trees",
+    }
+
+    response = client.get(f"/passages/{constants.VERSION_URN}/annotators.json")
+    assert [c["urn"] for c in response.json()["collections"]] == [
+        GLAUX_URN,
+        GAGDT_URN,
+        constants.TREES_COLLECTION_URN,
+    ]
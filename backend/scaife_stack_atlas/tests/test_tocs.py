@@ -0,0 +1,78 @@
+import gzip
+import json
+
+import pytest
+
+from scaife_stack_atlas.tocs import views
+from scaife_stack_atlas.tocs.index import TocIndex, get_accepted_encodings
+
+
+TOC_DATA = {
+    "@id": "urn:cite:scaife-viewer:toc.iliad",
+    "title": "Iliad",
+    "items": [
+        {"title": f"Book {book}", "uri": f"urn:cts:greekLit:tlg0012.tlg001:{book}"}
+        for book in range(1, 25)
+    ],
+}
+
+
+@pytest.fixture
+def toc_index(tmp_path, monkeypatch):
+    (tmp_path / "toc.iliad.json").write_text(json.dumps(TOC_DATA, indent=2))
+    (tmp_path / "README.md").write_text("Not a TOC")
+    toc_index = TocIndex(str(tmp_path))
+    monkeypatch.setattr(views, "get_toc_index", lambda: toc_index)
+    return toc_index
+
+
+def test_get_accepted_encodings():
+    assert get_accepted_encodings("gzip, br;q=0, deflate;q=0.5") == {
+        "gzip",
+        "deflate",
+    }
+
+
+def test_toc_index(toc_index):
+    assert list(toc_index.files) == ["toc.iliad.json"]
+
+
+def test_tocs_index(client, toc_index):
+    response = client.get("/tocs/")
+    assert response.status_code == 200
+    assert response.json() == {"tocs": ["/tocs/toc.iliad.json"]}
+
+    response = client.get("/tocs/", HTTP_IF_NONE_MATCH=response["ETag"])
+    assert response.status_code == 304
+
+
+def test_serve_toc(client, toc_index):
+    response = client.get("/tocs/toc.iliad.json")
+    assert response.status_code == 200
+    assert not response.has_header("Content-Encoding")
+    assert json.loads(response.content) == TOC_DATA
+    assert "Accept-Encoding" in response["Vary"]
+    assert "no-cache" in response["Cache-Control"]
+
+    response = client.get("/tocs/toc.iliad.json", HTTP_IF_NONE_MATCH=response["ETag"])
+    assert response.status_code == 304
+
+
+def test_serve_toc_compressed(client, toc_index):
+    response = client.get("/tocs/toc.iliad.json", HTTP_ACCEPT_ENCODING="gzip")
+    assert response["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(response.content)) == TOC_DATA
+
+    uncompressed = client.get("/tocs/toc.iliad.json")
+    assert response["ETag"] != uncompressed["ETag"]
+
+    response = client.get(
+        "/tocs/toc.iliad.json",
+        HTTP_ACCEPT_ENCODING="gzip",
+        HTTP_IF_NONE_MATCH=response["ETag"],
+    )
+    assert response.status_code == 304
+
+
+def test_serve_toc_not_found(client, toc_index):
+    assert client.get("/tocs/README.md").status_code == 404
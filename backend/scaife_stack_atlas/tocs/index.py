@@ -0,0 +1,112 @@
+"""
+In-memory index of the TOC files in `data/tocs`
+
+The directory is scanned once per process; each entry holds the file contents,
+a strong ETag, the modification time and (optionally) pre-compressed bodies.
+"""
+import gzip
+import hashlib
+import os
+import re
+from datetime import datetime, timezone
+
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# NOTE: Bodies are only kept pre-compressed if that saves at least this many
+# bytes
+MIN_COMPRESSION_SAVING = 64
+
+ACCEPT_ENCODING_RE = re.compile(r"^\s*([^\s;]+)\s*(?:;\s*q=([0-9.]+))?\s*$")
+
+
+def compress_body(content, brotli_quality=11):
+    bodies = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(content, quality=brotli_quality)
+    return {
+        encoding: body
+        for encoding, body in bodies.items()
+        if len(body) + MIN_COMPRESSION_SAVING <= len(content)
+    }
+
+
+def get_accepted_encodings(accept_encoding):
+    encodings = set()
+    for value in accept_encoding.split(","):
+        match = ACCEPT_ENCODING_RE.match(value)
+        if not match:
+            continue
+        encoding, quality = match.groups()
+        try:
+            if quality is not None and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        encodings.add(encoding.lower())
+    return encodings
+
+
+class Representation:
+    """
+    A response body, along with its strong ETag and pre-compressed bodies
+    """
+
+    def __init__(self, content, brotli_quality=11):
+        self.content = content
+        self.etag = f'"{hashlib.sha256(content).hexdigest()}"'
+        self.compressed = compress_body(content, brotli_quality=brotli_quality)
+
+    def get_etag(self, encoding=None):
+        # NOTE: Each content encoding is a distinct representation, so it needs
+        # its own strong ETag
+        if encoding is None:
+            return self.etag
+        return f'{self.etag[:-1]}-{encoding}"'
+
+    def get_body(self, accept_encoding):
+        """
+        Returns the best body for the given Accept-Encoding header, along with
+        its content encoding (None if uncompressed).
+        """
+        accepted = get_accepted_encodings(accept_encoding)
+        for encoding in ["br", "gzip"]:
+            if encoding in accepted and encoding in self.compressed:
+                return self.compressed[encoding], encoding
+        return self.content, None
+
+
+class TocFile(Representation):
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            super().__init__(f.read())
+        stat = os.stat(path)
+        self.filename = os.path.basename(path)
+        self.size = stat.st_size
+        self.last_modified = datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc)
+
+
+class TocIndex:
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        if os.path.isdir(path):
+            for filename in sorted(os.listdir(path)):
+                if filename.count(".json"):
+                    self.files[filename] = TocFile(os.path.join(path, filename))
+
+        digest = hashlib.sha256()
+        for toc_file in self.files.values():
+            digest.update(f"{toc_file.filename}:{toc_file.etag}".encode("utf-8"))
+        self.etag = f'"{digest.hexdigest()}"'
+        self.last_modified = max(
+            (toc_file.last_modified for toc_file in self.files.values()),
+            default=None,
+        )
+
+    def get(self, filename):
+        return self.files.get(filename)
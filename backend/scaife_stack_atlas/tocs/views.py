@@ -1,29 +1,64 @@
+import functools
 import os
 
 from django.conf import settings
-from django.core.cache import cache
-from django.http import FileResponse, Http404, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.urls import reverse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
+
+from .index import TocIndex
 
 
 TOC_DATA_PATH = os.path.join(settings.PROJECT_ROOT, "data", "tocs")
-CACHE_FOREVER = None
+
+
+@functools.lru_cache()
+def get_toc_index():
+    return TocIndex(TOC_DATA_PATH)
+
+
+def get_validated_response(request, response, etag, last_modified):
+    """
+    Sets validators on `response` and returns a 304 if the client already has
+    the current representation.
+    """
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    # NOTE: Clients may cache TOCs, but must revalidate them on each use
+    patch_cache_control(response, public=True, no_cache=True)
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+        response=response,
+    )
 
 
 def tocs_index(request):
-    key = "tocs-index"
-    data = cache.get(key)
-    if data is None:
-        data = []
-        files = [f for f in os.listdir(TOC_DATA_PATH) if f.count(".json")]
-        for filename in files:
-            data.append(reverse("serve_toc", args=[filename]))
-        cache.set(key, data, CACHE_FOREVER)
-    return JsonResponse({"tocs": data})
+    toc_index = get_toc_index()
+    data = [reverse("serve_toc", args=[filename]) for filename in toc_index.files]
+    response = JsonResponse({"tocs": data})
+    return get_validated_response(
+        request, response, toc_index.etag, toc_index.last_modified
+    )
 
 
 def serve_toc(request, filename):
-    path = os.path.join(TOC_DATA_PATH, filename)
-    if not os.path.exists(path):
+    toc_file = get_toc_index().get(filename)
+    if toc_file is None:
         raise Http404
-    return FileResponse(open(path, "rb"))
+
+    body, encoding = toc_file.get_body(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    response = HttpResponse(body, content_type="application/json")
+    if encoding:
+        response["Content-Encoding"] = encoding
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return get_validated_response(
+        request, response, toc_file.get_etag(encoding), toc_file.last_modified
+    )
@@ -1,15 +1,56 @@
 from django.urls import include, path, re_path
+from django.views.decorators.csrf import csrf_exempt
 
 from django.contrib import admin
 
 from . import views
+from .api.views import CachedGraphQLView, cache_stats
+from .bundles.views import serve_passage_bundle
+from .exports.views import (
+    export_alignment_records,
+    export_syntax_trees,
+    export_version_tokens,
+)
 from .tocs.views import serve_toc, tocs_index
 
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    # NOTE: Shadows the `graphql/` endpoint from `scaife_viewer.atlas.urls`
+    path(
+        "graphql/",
+        csrf_exempt(CachedGraphQLView.as_view(graphiql=True)),
+        name="graphql_endpoint",
+    ),
+    path("graphql/cache-stats/", cache_stats, name="graphql_cache_stats"),
     path("", include("scaife_viewer.atlas.urls")),
+    path("assets/<sha256>", views.serve_asset, name="serve_asset"),
     path("tocs/<filename>", serve_toc, name="serve_toc"),
     path("tocs/", tocs_index, name="tocs_index"),
+    path(
+        "passages/<urn>/bundle.json",
+        serve_passage_bundle,
+        name="serve_passage_bundle",
+    ),
+    path(
+        "passages/<urn>/annotators.json",
+        views.passage_annotators,
+        name="passage_annotators",
+    ),
+    path(
+        "exports/versions/<urn>/tokens.ndjson",
+        export_version_tokens,
+        name="export_version_tokens",
+    ),
+    path(
+        "exports/text-annotation-collections/<urn>/syntax-trees.ndjson",
+        export_syntax_trees,
+        name="export_syntax_trees",
+    ),
+    path(
+        "exports/alignments/<urn>/records.ndjson",
+        export_alignment_records,
+        name="export_alignment_records",
+    ),
     re_path(r"^", views.FrontendAppView.as_view()),
 ]
@@ -2,11 +2,18 @@ import logging
 import os
 
 from django.conf import settings
-from django.http import HttpResponse
+from django.db.models import Count
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.decorators import method_decorator
 from django.views.decorators.clickjacking import xframe_options_exempt
 from django.views.generic import View
 
+from scaife_viewer.atlas.models import TextAnnotationCollection
+
+from .models import Asset, TextAnnotationReference
+
 
 @method_decorator(xframe_options_exempt, name="dispatch")
 class FrontendAppView(View):
@@ -31,3 +38,50 @@ class FrontendAppView(View):
                 """,
                 status=501,
             )
+
+
+def serve_asset(request, sha256):
+    """
+    Serves a content-addressed Asset; since the URL changes whenever the
+    content does, responses can be cached indefinitely.
+    """
+    etag = f'"{sha256}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        asset = get_object_or_404(Asset, sha256=sha256)
+        response = HttpResponse(asset.content, content_type=asset.content_type)
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+    return response
+
+
+def passage_annotators(request, urn):
+    """
+    Returns the text annotation collections with annotations that reference
+    `urn` (or any of its descendants), via the reference index
+
+    `urn` is a version or a single passage (e.g. a book or a line), rather than
+    a range.
+    """
+    counts = dict(
+        TextAnnotationReference.objects.for_passage(urn)
+        .filter(collection__isnull=False)
+        .order_by()
+        .values_list("collection")
+        .annotate(count=Count("text_annotation", distinct=True))
+    )
+    collections = TextAnnotationCollection.objects.filter(pk__in=counts).order_by("urn")
+    return JsonResponse(
+        dict(
+            urn=urn,
+            collections=[
+                dict(
+                    urn=collection.urn,
+                    label=collection.label,
+                    source=(collection.data or {}).get("source"),
+                    text_annotations=counts[collection.pk],
+                )
+                for collection in collections
+            ],
+        )
+    )
@@ -15,3 +15,16 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "scaife_stack_atlas.settings")
 
 application = get_wsgi_application()
+
+
+def warm_caches():
+    # NOTE: Scans data/tocs and parses / validates persisted GraphQL queries
+    # before the first request is served
+    from scaife_stack_atlas.api.persisted import get_persisted_queries
+    from scaife_stack_atlas.tocs.views import get_toc_index
+
+    get_toc_index()
+    get_persisted_queries()
+
+
+warm_caches()
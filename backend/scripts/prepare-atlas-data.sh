@@ -1,19 +1,29 @@
 #!/bin/bash
 set -e
 
-if [ $1 ]
-then
+case "$1" in
+*.json)
+    # NOTE: Package manifests written by `upload_atlas_db_tarball`
+    echo "Restoring database"
+    python manage.py restore_atlas_db $1
+    ;;
+?*)
     echo "Downloading database"
     curl $1 > db.tgz
     tar -zxvf db.tgz
     mkdir -p ${DB_DATA_PATH}
     mv db.sqlite ${DB_DATA_PATH}/db.sqlite
+    # NOTE: Used to key the GraphQL response cache
+    md5sum ${DB_DATA_PATH}/db.sqlite | cut -d " " -f 1 > ${DB_DATA_PATH}/db.sqlite.md5
     rm db.tgz
-else
+    ;;
+*)
     echo "[Running migrations and populating the ATLAS database]"
     # TODO: Ensure DB_DATA_PATH exists in `scaife-viewer-atlas`
     # command
     # TODO: Support loading data from a tarball upstream too
     mkdir -p $DB_DATA_PATH
-    python manage.py prepare_atlas_db --force
-fi
+    # NOTE: Checkpoints are only useful when iterating on the pipeline locally
+    ATLAS_DB_PROFILE=build ATLAS_INGESTION_CHECKPOINTS=0 python manage.py prepare_atlas_db --force
+    ;;
+esac